@@ -0,0 +1,160 @@
+# ==========================================
+#       BENCHMARKS
+# ==========================================
+import os.path
+import subprocess
+import sys
+import time
+from getopt import gnu_getopt
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# modules which `import sudoku` must not load: they are only needed by some commands
+HEAVY_MODULES = ('numpy', 'pulp', 'scipy', 'requests', 'readline', 'concurrent.futures', 'session')
+PUZZLE = '008000603020009000000800450856070000004000500000060897087006000000300080203000100'
+
+def _wall_time(args, runs):
+    '''The best wall time of `runs` runs of a new Python process with the command line arguments `args`.'''
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def startup_benchmark(runs=10):
+    '''Measures the startup of short-lived solver processes. Returns a `dict` with the best wall time (in seconds) of starting Python
+    (`'python'`), of importing `sudoku` (`'import'`) and of a passive solve from the command line (`'passive'`), and the list of
+    `HEAVY_MODULES` which importing `sudoku` loaded (`'heavy'`).'''
+    result = {
+        'python': _wall_time(['-c', 'pass'], runs),
+        'import': _wall_time(['-c', 'import sudoku'], runs),
+        'passive': _wall_time(['sudoku.py', '--passive', '--board', PUZZLE], runs),
+    }
+    loaded = subprocess.run([sys.executable, '-c', 'import sys, sudoku; print(*(m for m in sys.argv[1:] if m in sys.modules))',
+        *HEAVY_MODULES], cwd=HERE, check=True, capture_output=True, text=True).stdout.split()
+    result['heavy'] = loaded
+    return result
+
+def replay_benchmark(path, runs=3):
+    '''Replays the session recording `path` (see `recording.replay()`) `runs` times. Returns the report of the fastest replay, with the
+    number of replays which diverged from the recording (`'diverged_runs'`), and the indices of the commands which diverged in any of the
+    replays (`'diverged_commands'`, as the fastest replay may not be one of them).'''
+    from recording import replay
+    best = None
+    diverged = 0
+    diverged_commands = set()
+    for _ in range(runs):
+        report = replay(path)
+        diverged += len(report['diverged']) > 0
+        diverged_commands.update(report['diverged'])
+        if best is None or report['wall_time'] < best['wall_time']:
+            best = report
+    best['diverged_runs'] = diverged
+    best['diverged_commands'] = sorted(diverged_commands)
+    return best
+
+def random_puzzle(box, rng, clues=0.45):
+    '''A random board with `box`×`box` sections, with about `clues` of its cells filled from a complete grid. (The grid is a shuffled
+    pattern grid, so the puzzle always has a solution, but not always a unique one: it is only meant for timing the deduction rules.)'''
+    size = box*box
+    def lines():
+        bands = rng.sample(range(box), box)
+        return [band*box + line for band in bands for line in rng.sample(range(box), box)]
+    rows, cols, values = lines(), lines(), rng.sample(range(1, size+1), size)
+    grid = [[values[(box*(r%box) + r//box + c) % size] for c in cols] for r in rows]
+    return [[v if rng.random() < clues else 0 for v in row] for row in grid]
+
+def rules_benchmark(boxes=(3, 4, 5), runs=3, seed=0, clues=0.45):
+    '''Measures how the deduction rules scale with the size of the board: each rule of `sudoku.SINGLE_RULES` and
+    `sudoku.DEDUCTION_RULES` is applied once to a new sudoku made from a random puzzle (see `random_puzzle()`) of each size in `boxes`.
+    Returns a `dict`: `(rule name, box)` -> the best time of `runs` runs in seconds (the puzzle is the same in every run).'''
+    import random
+    from sinks import NullSink
+    from sudoku import Sudoku, SINGLE_RULES, DEDUCTION_RULES
+    result = {}
+    for box in boxes:
+        puzzle = random_puzzle(box, random.Random(seed), clues)
+        for rule in SINGLE_RULES + DEDUCTION_RULES:
+            best = float('inf')
+            for _ in range(runs):
+                sudoku = Sudoku(board=puzzle, greedy=False, sink=NullSink())
+                start = time.perf_counter()
+                rule(sudoku)
+                best = min(best, time.perf_counter() - start)
+            result[rule.__name__, box] = best
+    return result
+
+def _startup_main(opts):
+    runs = int(opts.get('-n', opts.get('--runs', 10)))
+    max_import = float(opts.get('--max-import', 250))
+    result = startup_benchmark(runs)
+    overhead = 1000 * (result['import'] - result['python'])
+    print(f"python:                    {1000*result['python']:.1f} ms")
+    print(f"import sudoku:             {1000*result['import']:.1f} ms (+{overhead:.1f} ms)")
+    print(f"passive solve:             {1000*result['passive']:.1f} ms")
+    print(f"heavy modules imported:    {', '.join(result['heavy']) or '-'}")
+    failed = False
+    if result['heavy']:
+        print(f"FAILED: importing sudoku loads {', '.join(result['heavy'])}")
+        failed = True
+    if overhead > max_import:
+        print(f"FAILED: importing sudoku takes {overhead:.1f} ms, more than {max_import:g} ms")
+        failed = True
+    return failed
+
+def _replay_main(opts, paths):
+    runs = int(opts.get('-n', opts.get('--runs', 3)))
+    failed = False
+    for path in paths:
+        report = replay_benchmark(path, runs)
+        steps = [c for c in report['commands'] if c['recorded'] is not None]
+        speedup = report['recorded_time'] / report['replayed_time'] if report['replayed_time'] > 0 else float('inf')
+        print(f"{path}: {len(report['commands'])} commands, {len(steps)} steps/solves, recorded {report['recorded_time']:.3f} s, "
+            f"replayed {report['replayed_time']:.3f} s ({speedup:.2f}x), whole replay {report['wall_time']:.3f} s")
+        if '-v' in opts or '--verbose' in opts:
+            for c in steps:
+                print(f"    #{c['index']:<4} {c['command']:<20} {c['recorded']:>9.4f} s {c['replayed']:>9.4f} s {'' if c['same'] else ' DIVERGED'}")
+        if report['diverged_runs'] > 0:
+            print(f"FAILED: {report['diverged_runs']} of {runs} replays diverged from the recording, first at command "
+                f"#{report['diverged_commands'][0]}")
+            if report['warm_cache']:
+                print("(The k-optimization cache was not empty when the recording started, so cached proofs may have been chosen"
+                    " then, which the replay cannot do.)")
+            failed = True
+    return failed
+
+def _rules_main(opts):
+    runs = int(opts.get('-n', opts.get('--runs', 3)))
+    boxes = tuple(int(box) for box in opts.get('--boxes', '3,4,5').split(','))
+    if any(not 2 <= box <= 5 for box in boxes):
+        print("ERROR: the sizes of the sections (--boxes) must be between 2 and 5")
+        return True
+    result = rules_benchmark(boxes, runs, int(opts.get('--seed', 0)))
+    names = list(dict.fromkeys(name for name, _ in result))
+    print(f"{'rule':<16}" + ''.join(f"{f'{box*box}×{box*box} (ms)':>16}" for box in boxes))
+    for name in names:
+        print(f"{name:<16}" + ''.join(f"{1000*result[name, box]:>16.2f}" for box in boxes))
+    print(f"{'total':<16}" + ''.join(f"{1000*sum(result[name, box] for name in names):>16.2f}" for box in boxes))
+    return False
+
+if __name__ == "__main__":
+    _opts, args = gnu_getopt(sys.argv[1:], "hn:v", ["runs=", "max-import=", "verbose", "boxes=", "seed="])
+    opts = dict(_opts)
+    if '-h' in opts or len(args) == 0 or args[0] not in ('startup', 'replay', 'rules') or \
+        (args[0] in ('startup', 'rules')) != (len(args) == 1):
+        print("python benchmark.py startup {--runs <n>} {--max-import <ms>}")
+        print("\tstartup: time of starting Python, importing sudoku and a passive solve, each in a new process. Fails if importing sudoku")
+        print("\t         loads a heavy module, or takes more than --max-import milliseconds (default: 250) on top of starting Python.")
+        print("python benchmark.py replay <recording> {<recording> ...} {--runs <n>} {--verbose}")
+        print("\treplay:  replays session recordings (made with 'record <file>' or --record <file>) --runs times (default: 3), and")
+        print("\t         compares the time of their steps and solves with the recorded one. Fails if a replay fills other cells or")
+        print("\t         gives another proof than the recording. --verbose prints the time of each step and solve.")
+        print("python benchmark.py rules {--boxes 3,4,5} {--runs <n>} {--seed <n>}")
+        print("\trules:   the time of applying each deduction rule once to a random 9×9, 16×16 and 25×25 puzzle (boards with")
+        print("\t         --boxes×--boxes sections), the best of --runs runs (default: 3).")
+        sys.exit(0 if '-h' in opts else 2)
+    if args[0] == 'startup':
+        sys.exit(1 if _startup_main(opts) else 0)
+    if args[0] == 'rules':
+        sys.exit(1 if _rules_main(opts) else 0)
+    sys.exit(1 if _replay_main(opts, args[1:]) else 0)
@@ -4,66 +4,88 @@
 #                 DRAWING PRETTY OUTPUT
 # ======================================================
 import re
-import numpy as np
-import requests
-import bs4 # type: ignore
-import sys
-import builtins
+import os
+import mmap
+import hashlib
+import threading
+import collections
+import functools
+import math
+import shutil
 
 from Getch import getch
 from consolestyle import bclr
+from sinks import OutputRouter
+# numpy, requests and concurrent.futures are imported by the functions using them, so importing this module stays fast.
 
 headers = {'User-Agent' : 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/71.0.3578.98 Safari/537.36'}
 
-# >>> Custom print to make printing to files easier.
-class MyPrint:
-    '''Wrapper for the print funtcion to make printing to files with it easier.'''
-    def __init__(self):
-        self.file = sys.stdout
-    
-    def set_file(self, path):
-        '''From now on print into this file! (None or '': print to console.)'''
-        if self.file != sys.stdout:
-            self.file.close()
-        if path is None or path == '':
-            self.file = sys.stdout
-        else:
-            self.file = open(path, 'w', encoding='utf-8')
-    
-    def reset(self):
-        '''Return to printing to the console.'''
-        if self.file != sys.stdout:
-            self.file.close()
-            self.file = sys.stdout
-    
-    def __call__(self, *args, **kwargs):
-        builtins.print(*args,**kwargs,file=self.file) # noqa
-
-print = MyPrint()
+# >>> All output goes through this print, see sinks.OutputRouter.
+print = OutputRouter()
 
 # >>> MANAGING INPUT FROM TEXT/LISTS
-def init_tuples_from_text(s):
+# The values of a board with `box`×`box` sections are written with the first `box*box` symbols: digits on a 9×9 board, then letters.
+SYMBOLS = '123456789ABCDEFGHIJKLMNOP'
+
+def init_tuples_from_text(s, box=3):
     '''Given a text with 9 rows, each containing 9 characters, create a list of `(row, col, value)` tuples for the characters in the text
-    which are in `{1,2,3,4,5,6,7,8,9}`.'''
-    nums=set(map(str,range(1,10)))
+    which are in `{1,2,3,4,5,6,7,8,9}`. (For other values of `box`, the text has `box*box` rows of `box*box` characters, and the values
+    are the first `box*box` characters of `SYMBOLS`, in either case.)'''
+    size = box*box
+    nums = {symbol: v for v, symbol in enumerate(SYMBOLS[:size], 1)}
+    nums.update({symbol.lower(): v for symbol, v in nums.items()})
     ret=[]
-    rows = re.findall(r'(\S{9})(?!(?=\S))', s) # finds all occurences of exactly-9-non-whitespace characters
-    if len(rows) != 9:
+    rows = re.findall(rf'(\S{{{size}}})(?!(?=\S))', s) # finds all occurences of exactly-`size`-non-whitespace characters
+    if len(rows) != size:
         raise ValueError(f"Could not interpret input as a sudoku table: number of rows were {len(rows)}")
     for r, row in enumerate(rows):
-        for c in range(9):
+        for c in range(size):
             if row[c] in nums:
-                ret.append((r,c,int(row[c])))
+                ret.append((r,c,nums[row[c]]))
     return ret
 
+def line_box(s):
+    '''The size of the sections of the board written in the single line `s` (see `init_tuples_from_line()`): 2, 3, 4 or 5 if it has
+    16, 81, 256 or 625 characters, and 3 otherwise.'''
+    return next((box for box in (2, 3, 4, 5) if len(s.strip()) == box**4), 3)
+
+def init_tuples_from_line(s):
+    '''Like `init_tuples_from_text()`, but the 81 characters of the board may also be written in a single line, row by row (e.g.
+    `'008000603020009000...'`). A line of 16, 256 or 625 characters is read as a 4×4, 16×16 or 25×25 board (see `line_box()`).'''
+    s = s.strip()
+    box = line_box(s)
+    size = box*box
+    if len(s) == size*size:
+        s = '\n'.join(s[i:i+size] for i in range(0, size*size, size))
+    return init_tuples_from_text(s, box)
+
+def init_board_from_line(s):
+    '''Like `init_tuples_from_line()`, but returns the board as a `list` of `list`s, which has the size of the board in `s`.'''
+    size = line_box(s)**2
+    board = [[0 for _ in range(size)] for _ in range(size)]
+    for row, col, val in init_tuples_from_line(s):
+        board[row][col] = val
+    return board
+
+def board_to_line(board):
+    '''The board in a single line, row by row, with 0s in the empty cells: the inverse of `init_board_from_line()`.'''
+    return ''.join(SYMBOLS[v-1] if v != 0 else '0' for row in board for v in row)
+
 def init_tuples_from_array(a):
     ret = []
     for r, row in enumerate(a):
-        for c in range(9):
+        for c in range(len(row)):
             if 0 < row[c]:
                 ret.append((r,c,row[c]))
     return ret
 
+def init_tuples_from_numpy(a):
+    '''Like `init_tuples_from_array()`, but for a 9×9 numpy array (e.g. a row of the array returned by `decode_puzzles()`): the filled
+    cells are found with one `np.nonzero` call, and the values are converted to `int`s at once.'''
+    import numpy as np
+    rows, cols = np.nonzero(a)
+    return list(zip(rows.tolist(), cols.tolist(), a[rows, cols].tolist()))
+
 def gridtext_to_arraytext(s):
     '''Given a text with 9 rows, each containing 9 digits, create a repr of a list of lists containing these numbers.'''
     return '['+',\n '.join(('['+', '.join(c for c in row)+']') for row in s.split())+']'
@@ -71,96 +93,470 @@ def gridtext_to_arraytext(s):
 # >>> ADVANCED
 def edit_sudoku(board=None):
     '''Edit a sudoku board. Navigate the cells with `wasd`, delete with 0 or `x`, fill a cell by typing the desired number.\\
-    Quit with `q`, get this help with `h`.'''
+    Quit with `q`, get this help with `h`.\\
+    On boards larger than 9×9, the values after 9 are typed with the letters of `SYMBOLS` (so `a` and `d` are values there, and the cells
+    are navigated with `WASD`).'''
     if board is None: board = [[0 for _ in range(9)] for _ in range(9)]
-    selected = [4, 4]
-    nums = set(map(str,range(10)))
+    size = len(board)
+    selected = [size//2, size//2]
+    nums = {symbol: v for v, symbol in enumerate('0' + SYMBOLS[:size])}
+    if size > 9:
+        nums.update({symbol.lower(): v for symbol, v in nums.items()})
+        moves = {'W': (-1, 0), 'S': (1, 0), 'A': (0, -1), 'D': (0, 1)}
+    else:
+        moves = {'w': (-1, 0), 's': (1, 0), 'a': (0, -1), 'd': (0, 1)}
+    renderer = BoardRenderer()
+    message = ''
     while(True):
-        print_board(board, selected)
+        renderer.draw(board_frame(board, selected) + message.split('\n'))
+        message = ''
         i = getch()
-        if i in nums:
-            board[selected[0]][selected[1]] = int(i)
-        elif i == 'w':
-            selected[0] = (selected[0]+8)%9
-        elif i == 's':
-            selected[0] = (selected[0]+1)%9
-        elif i == 'a':
-            selected[1] = (selected[1]+8)%9
-        elif i == 'd':
-            selected[1] = (selected[1]+1)%9
+        if i in moves:
+            selected[0] = (selected[0]+moves[i][0])%size
+            selected[1] = (selected[1]+moves[i][1])%size
+        elif i in nums:
+            board[selected[0]][selected[1]] = nums[i]
         elif i == 'x':
             board[selected[0]][selected[1]] = 0
         elif i == 'h':
-            print('''Edit a sudoku board. Navigate the cells with wasd, delete with 0 or x, fill a cell by typing the desired number.
-Quit with 'q', get this help with 'h'.''')
+            message = '''Edit a sudoku board. Navigate the cells with wasd, delete with 0 or x, fill a cell by typing the desired number.
+Quit with 'q', get this help with 'h'.'''
         elif i == 'q':
             return board
 
+# >>> FETCHING PUZZLES
+WEBSUDOKU_URL = r'https?://(?:nine|www)\.websudoku\.com/'
+
+def websudoku_url(set_id, level=1, base='https://nine.websudoku.com/'):
+    '''The URL of the puzzle with the given `set_id` and difficulty `level` (1-4) on websudoku.'''
+    return f'{base}?level={level}&set_id={set_id}'
+
+def parse_websudoku(html):
+    '''Finds the puzzle in a websudoku page and converts it into a `list` of `list`s. Only the `puzzle_grid` table is scanned with regular
+    expressions, instead of building the tree of the whole page.'''
+    table = re.search(r'<table[^>]*id="?puzzle_grid\b.*?</table>', html, re.IGNORECASE | re.DOTALL)
+    if table is None:
+        raise ValueError("Could not find the puzzle on the page.")
+    board = []
+    for row in re.split(r'<tr\b', table.group(0), flags=re.IGNORECASE)[1:]:
+        values = [re.search(r'\bvalue="?(\d)', attrs, re.IGNORECASE) for attrs in re.findall(r'<input\b([^>]*)>', row, re.IGNORECASE)]
+        board.append([0 if v is None else int(v.group(1)) for v in values])
+    if len(board) != 9 or any(len(row) != 9 for row in board):
+        raise ValueError("Could not interpret the puzzle on the page as a sudoku table.")
+    return board
+
+class PuzzleFetcher:
+    '''Downloads puzzles through one pooled `requests.Session` (so connections are reused), with a `timeout` for each request and
+    `retries` retries with exponential backoff on connection errors and 429/5xx responses. Many puzzles can be downloaded concurrently
+    with `fetch_many()`, using at most `max_workers` threads at the same time.\\
+    If `cache_dir` is given, parsed grids are stored there (one 81 character line per file, named after the SHA-256 hash of the URL), and
+    a cached puzzle is never downloaded again, so a list of puzzles can be replayed offline. Only URLs matching the regular expression
+    `url_pattern` are accepted.'''
+    def __init__(self, cache_dir=None, max_workers=8, timeout=10, retries=3, url_pattern=WEBSUDOKU_URL):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.url_pattern = url_pattern
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers,
+            max_retries=Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504)))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.downloads = 0  # number of pages downloaded
+        self.cache_hits = 0 # number of puzzles read from the cache
+
+    def _cache_path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest + '.txt')
+
+    def fetch(self, url):
+        '''Returns the puzzle at `url` as a `list` of `list`s, from the cache if possible.'''
+        if re.match(self.url_pattern, url) is None:
+            raise ValueError(f"Downloading puzzles is not supported from {url}.")
+        if self.cache_dir is not None:
+            path = self._cache_path(url)
+            try:
+                with open(path, 'r', encoding='ascii') as file:
+                    board = decode_puzzles(file.read().strip())[0].tolist()
+                self.cache_hits += 1
+                return board
+            except FileNotFoundError:
+                pass
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        self.downloads += 1
+        board = parse_websudoku(response.text)
+        if self.cache_dir is not None: # write to a temporary file first, so other threads/processes never see a half written file
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w', encoding='ascii') as file:
+                file.write(encode_puzzles(board)[0] + '\n')
+            os.replace(tmp, path)
+        return board
+
+    def fetch_many(self, urls):
+        '''Downloads the puzzles at `urls` concurrently, and lazily yields `(url, board)` pairs in the order of `urls`. If a puzzle could not
+        be fetched, `board` is the exception instead. At most `max_workers` downloads run at the same time, and only about twice as many
+        `urls` are taken from the iterable ahead of the ones yielded.'''
+        import concurrent.futures
+        import requests
+        def fetch(url):
+            try:
+                return url, self.fetch(url)
+            except (requests.RequestException, ValueError, OSError) as e:
+                return url, e
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = collections.deque()
+            for url in urls:
+                pending.append(executor.submit(fetch, url))
+                if len(pending) >= 2*self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def fetch_sets(self, set_ids, level=1, base='https://nine.websudoku.com/'):
+        '''Like `fetch_many()`, but for websudoku puzzles given by their `set_id`s; yields `(set_id, board)` pairs.'''
+        set_ids = list(set_ids)
+        for set_id, (_, board) in zip(set_ids, self.fetch_many(websudoku_url(set_id, level, base) for set_id in set_ids)):
+            yield set_id, board
+
+    def close(self):
+        self.session.close()
+
+_fetcher = None # shared by the calls of `fetch_puzzle()`
 def fetch_puzzle(url):
     '''Downloads a puzzle from a given `url`, and converts it into a `list` of `list`s. Currently only supports 
-    puzzles on http://nine.websudoku.com/.'''
-    if re.match(r'https?://(?:nine|www)\.websudoku\.com/', url) is not None:
-        results = requests.get(url, headers=headers)
-        soup = bs4.BeautifulSoup(results.text, features='lxml')
-        buttons = [row.select('input') for row in soup.select('table[id="puzzle_grid"] tr')]
-        values = [[int(button['value']) if 'value' in button.attrs else 0 for button in row] for row in buttons]
-        return values
-    else:
-        raise ValueError(f"Downloading puzzles is not supported from {url}.")
+    puzzles on http://nine.websudoku.com/. See `PuzzleFetcher` for downloading many puzzles.'''
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = PuzzleFetcher(max_workers=1)
+    return _fetcher.fetch(url)
+
+# >>> READING PUZZLE CORPORA
+# The readers below map the file into memory, cut it into chunks of about `chunk_size` bytes at line boundaries, and decode all the
+# puzzles of a chunk at once with numpy, so the whole file is never read into memory or split into lines at once.
+_CELLS = bytes(c-ord('0') if ord('0') <= c <= ord('9') else 0 if c in b'.-_*xX' else 255 for c in range(256)) # byte -> cell value
+#   (0: empty cell, 255: invalid character)
+
+def _iter_chunks(path, chunk_size):
+    '''Yields the contents of the file at `path` in `bytes` chunks of about `chunk_size`, each ending at the end of a line.'''
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0: # an empty file can't be mapped
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while start < size:
+                end = min(start + chunk_size, size)
+                if end < size: # cut at the last line ending of the chunk (or the first one after it, if there is none)
+                    newline = mm.rfind(b'\n', start, end)
+                    end = newline + 1 if newline != -1 else mm.find(b'\n', end) + 1 or size
+                yield mm[start:end]
+                start = end
+
+def decode_puzzles(puzzles):
+    '''Converts N puzzles of 81 characters (digits, with `0` or `.` for empty cells) to an N×9×9 `uint8` array in one `np.frombuffer`
+    pass. `puzzles` is either a single `str`/`bytes` block of the N puzzles written after each other, or an iterable of `str`/`bytes` puzzles.'''
+    if isinstance(puzzles, str):
+        puzzles = puzzles.encode('ascii', 'replace')
+    elif not isinstance(puzzles, (bytes, bytearray, memoryview)):
+        puzzles = b''.join(p.encode('ascii', 'replace') if isinstance(p, str) else p for p in puzzles)
+    if len(puzzles) % 81 != 0:
+        raise ValueError(f"Could not interpret input as sudoku tables: length {len(puzzles)} is not divisible by 81")
+    import numpy as np
+    if len(puzzles) == 0:
+        return np.zeros((0, 9, 9), dtype=np.uint8)
+    boards = np.frombuffer(bytes(puzzles).translate(_CELLS), dtype=np.uint8).reshape(-1, 9, 9)
+    invalid = (boards > 9).reshape(len(boards), -1).any(axis=1)
+    if invalid.any():
+        bad = int(np.flatnonzero(invalid)[0])
+        raise ValueError(f"Could not interpret input as a sudoku table: {bytes(puzzles[81*bad:81*bad+81]).decode('ascii', 'replace')}")
+    return boards
+
+def encode_puzzles(boards, empty='0'):
+    '''The inverse of `decode_puzzles()`: converts an N×9×9 (or 9×9) array of boards to a `list` of 81 character strings, with `empty`
+    written in the empty cells.'''
+    import numpy as np
+    boards = np.asarray(boards, dtype=np.uint8).reshape(-1, 81)
+    text = (boards + ord('0')).tobytes()
+    if empty != '0':
+        text = text.replace(b'0', empty.encode('ascii'))
+    return [text[81*i:81*i+81].decode('ascii') for i in range(len(boards))]
+
+def _yield_boards(batches, as_tuples):
+    '''Turn the arrays of `batches` into boards (`list` of `list`s) or `(row, col, value)` tuple lists.'''
+    for batch in batches:
+        for board in batch.tolist():
+            yield init_tuples_from_array(board) if as_tuples else board
+
+def iter_line_batches(path, chunk_size=1<<20):
+    '''Yields the puzzles of a file with one puzzle per line (81 characters, digits with `0` or `.` for empty cells; anything after the
+    81st character is ignored) as N×9×9 `uint8` arrays, one per chunk. Empty lines and lines starting with `#` are skipped.'''
+    for chunk in _iter_chunks(path, chunk_size):
+        rows = []
+        for line in chunk.split(b'\n'):
+            line = line.strip()
+            if len(line) == 0 or line[0] == ord('#'):
+                continue
+            if len(line) < 81:
+                raise ValueError(f"Could not interpret input as a sudoku table: {line.decode('utf-8', 'replace')}")
+            rows.append(line[:81])
+        if len(rows) > 0:
+            yield decode_puzzles(b''.join(rows))
+
+def read_lines(path, as_tuples=False, chunk_size=1<<20):
+    '''Lazily yields the puzzles of a file with one puzzle per line (see `iter_line_batches()`) as `list`s of `list`s, or as lists of
+    `(row, col, value)` tuples if `as_tuples` is `True`.'''
+    return _yield_boards(iter_line_batches(path, chunk_size), as_tuples)
+
+def iter_sdk_batches(path, chunk_size=1<<20):
+    '''Yields the puzzles of an `.sdk` file (9 rows of 9 characters per puzzle, `.` for empty cells) as N×9×9 `uint8` arrays, one per
+    chunk. A file may contain several puzzles. Empty lines, lines starting with `#`, `|` characters and `-+` separator lines are skipped.'''
+    rows = [] # rows not yet decoded; a puzzle may continue in the next chunk
+    for chunk in _iter_chunks(path, chunk_size):
+        for line in chunk.split(b'\n'):
+            line = line.strip()
+            if len(line) == 0 or line[0] == ord('#'):
+                continue
+            line = line.replace(b'|', b'').replace(b' ', b'')
+            if len(line.strip(b'-+=')) == 0:
+                continue
+            if len(line) != 9:
+                raise ValueError(f"Could not interpret input as a row of a sudoku table: {line.decode('utf-8', 'replace')}")
+            rows.append(line)
+        complete = len(rows) - len(rows) % 9
+        if complete > 0:
+            yield decode_puzzles(b''.join(rows[:complete]))
+            rows = rows[complete:]
+    if len(rows) > 0:
+        raise ValueError(f"Could not interpret input as a sudoku table: number of rows were {len(rows)}")
+
+def read_sdk(path, as_tuples=False, chunk_size=1<<20):
+    '''Lazily yields the puzzles of an `.sdk` file (see `iter_sdk_batches()`) as `list`s of `list`s, or as lists of `(row, col, value)`
+    tuples if `as_tuples` is `True`.'''
+    return _yield_boards(iter_sdk_batches(path, chunk_size), as_tuples)
+
+def iter_csv_batches(path, chunk_size=1<<20):
+    '''Yields the puzzles and solutions of a CSV file as pairs of N×9×9 `uint8` arrays, one per chunk (the second is `None` if there is no
+    solution column, or if the solution fields of the chunk are all empty). The puzzle column is the one called `puzzle`/`quizzes` in the header, the solution column is the one called
+    `solution`/`solutions`; without a header, these are the first two columns. Every puzzle and solution must have 81 characters (they
+    are decoded together, so a shorter and a longer one would shift the puzzles after them): a `ValueError` names the first line which
+    does not.'''
+    puzzle_col, solution_col = 0, 1
+    first = True
+    line_no = 0
+    for chunk in _iter_chunks(path, chunk_size):
+        puzzles = []
+        solutions = []
+        unsolved = None # the first line of the chunk with an empty solution field
+        lines = chunk.split(b'\n')
+        if lines[-1] == b'': # the chunk ends with a line ending
+            lines.pop()
+        for line in lines:
+            line_no += 1
+            fields = [f.strip(b' "\'\r') for f in line.split(b',')]
+            if len(fields[0]) == 0:
+                continue
+            if first: # header?
+                first = False
+                names = [f.decode('utf-8', 'replace').lower() for f in fields]
+                if len(fields[0]) != 81 or fields[0][:1] not in b'0123456789.':
+                    puzzle_col = next((i for i, n in enumerate(names) if n in ('puzzle', 'puzzles', 'quiz', 'quizzes')), 0)
+                    solution_col = next((i for i, n in enumerate(names) if n in ('solution', 'solutions')), 1)
+                    continue
+            for column, name in ((puzzle_col, 'puzzle'), (solution_col, 'solution')):
+                if column < len(fields) and len(fields[column]) != 81 and (column == puzzle_col or len(fields[column]) > 0):
+                    raise ValueError(f"Could not interpret line {line_no} of {path}: the {name} has {len(fields[column])} characters "
+                        "instead of 81")
+            puzzles.append(fields[puzzle_col])
+            if solution_col < len(fields):
+                solutions.append(fields[solution_col])
+                if len(fields[solution_col]) == 0 and unsolved is None:
+                    unsolved = line_no
+        if not any(solutions): # an empty solution column
+            solutions = []
+        elif unsolved is not None:
+            raise ValueError(f"Line {unsolved} of {path} has no solution, but other puzzles have one.")
+        if len(puzzles) > 0:
+            yield decode_puzzles(b''.join(puzzles)), (decode_puzzles(b''.join(solutions)) if len(solutions) == len(puzzles) else None)
+
+def read_csv(path, with_solutions=False, as_tuples=False, chunk_size=1<<20):
+    '''Lazily yields the puzzles of a CSV file (see `iter_csv_batches()`) as `list`s of `list`s, or as lists of `(row, col, value)` tuples
+    if `as_tuples` is `True`. If `with_solutions` is `True`, `(puzzle, solution)` pairs are yielded, the solution being a `list` of
+    `list`s.'''
+    for puzzles, solutions in iter_csv_batches(path, chunk_size):
+        if not with_solutions:
+            yield from _yield_boards((puzzles,), as_tuples)
+        elif solutions is None:
+            raise ValueError(f"{path} has no solution column.")
+        else:
+            yield from zip(_yield_boards((puzzles,), as_tuples), solutions.tolist())
 
 # >>> OUTPUT   
-def print_board(board, selected=(9,9)):
-    '''Print the 9×9 board, with spaces in cells containing 0.'''
-    print("┌─────────┬─────────┬─────────┐")
-    for i in range(9):
-        if i%3==0 and i!=0:
-            print("├─────────┼─────────┼─────────┤")
-        for j in range(9):
-            if j%3==0:
-                print("│",end="")
-            to_print = ' ' if board[i][j]==0 else board[i][j]
-            if i == selected[0] and j == selected[1]:
-                print(f"[{to_print}]",end="")
-            else:
-                print(f" {to_print} ",end="")
-        print("│")
-    print("└─────────┴─────────┴─────────┘")
+# Boards are built as frames: lists of lines, where each line is a `list` of segments (strings). Segments are the units `BoardRenderer`
+# compares between frames, so a cell is always a separate segment. The strings of the cells are cached.
+_ANSI = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
 
-def print_detailed_board(board, possibles, selected=(9,9)):
-    '''Print a detailed version of an ongoing solve. Only printing happens here.'''
-    print("╔═════════╤═════════╤═════════╦═════════╤═════════╤═════════╦═════════╤═════════╤═════════╗")
-    for i in range(9):
-        if i%3 != 0:
-            print("╟─────────┼─────────┼─────────╫─────────┼─────────┼─────────╫─────────┼─────────┼─────────╢")
+def _border(left, fill, thin, thick, right, box, width):
+    '''A horizontal border line of a board with `box`×`box` sections and cells of `width` characters: `thin` is drawn between the cells
+    of a section (None: no separator between them), and `thick` between sections.'''
+    section = fill*(width*box) if thin is None else thin.join([fill*width]*box)
+    return [left + thick.join([section]*box) + right]
+
+@functools.lru_cache(maxsize=None)
+def _borders(box):
+    '''The border lines of the boards with `box`×`box` sections: `(top, middle, bottom)` of the small board, and `(top, thin, thick,
+    bottom)` of the detailed board.'''
+    small = (_border("┌", "─", None, "┬", "┐", box, 3), _border("├", "─", None, "┼", "┤", box, 3), _border("└", "─", None, "┴", "┘", box, 3))
+    width = 3*box
+    detailed = (_border("╔", "═", "╤", "╦", "╗", box, width), _border("╟", "─", "┼", "╫", "╢", box, width),
+        _border("╠", "═", "╪", "╬", "╣", box, width), _border("╚", "═", "╧", "╩", "╝", box, width))
+    return small, detailed
+
+@functools.lru_cache(maxsize=None)
+def _visible_width(segment):
+    return len(_ANSI.sub('', segment))
+
+@functools.lru_cache(maxsize=None)
+def _small_cell(value, selected):
+    to_print = ' ' if value == 0 else SYMBOLS[value-1]
+    return f"[{to_print}]" if selected else f" {to_print} "
+
+@functools.lru_cache(maxsize=4096)
+def _detailed_cell(value, possibles, selected, box=3):
+    '''The `box` lines of a cell of the detailed board (each `3*box` characters wide); `possibles` is a `tuple`.'''
+    color = bclr.RED if selected else ""
+    if value == 0:
+        lines = []
+        for r in range(box):
+            tp = [' ' if box*r+k+1 not in possibles else SYMBOLS[box*r+k] for k in range(box)]
+            lines.append(color + ''.join(f" {v} " for v in tp) + bclr.ENDC)
+        return tuple(lines)
+    width = 3*box
+    if box == 2: # too small for the frame around the value
+        return (color + f"[{SYMBOLS[value-1]}]".center(width) + bclr.ENDC, color + " "*width + bclr.ENDC)
+    frame = ["┏━━━┓", f"┃ {SYMBOLS[value-1]} ┃", "┗━━━┛"]
+    above = (box-3)//2
+    return tuple(color + line.center(width) + bclr.ENDC for line in [""]*above + frame + [""]*(box-3-above))
+
+def board_frame(board, selected=None):
+    '''The lines of the board as printed by `print_board()` (see `BoardRenderer`).'''
+    size = len(board)
+    box = math.isqrt(size)
+    top, middle, bottom = _borders(box)[0]
+    selected = selected or (-1, -1)
+    lines = [top]
+    for i in range(size):
+        if i%box==0 and i!=0:
+            lines.append(middle)
+        line = []
+        for j in range(size):
+            if j%box==0:
+                line.append("│")
+            line.append(_small_cell(board[i][j], i == selected[0] and j == selected[1]))
+        line.append("│")
+        lines.append(line)
+    lines.append(bottom)
+    return lines
+
+def detailed_board_frame(board, possibles, selected=None):
+    '''The lines of the board as printed by `print_detailed_board()` (see `BoardRenderer`).'''
+    size = len(board)
+    box = math.isqrt(size)
+    top, thin, thick, bottom = _borders(box)[1]
+    lines = [top]
+    for i in range(size):
+        if i%box != 0:
+            lines.append(thin)
         elif i != 0:
-            print("╠═════════╪═════════╪═════════╬═════════╪═════════╪═════════╬═════════╪═════════╪═════════╣")
-        for r in range(3):
-            for j in range(9):
-                if j%3 == 0:
-                    print("║",end="")
-                else:
-                    print("│",end="")
-                if board[i][j] == 0:
-                    tp = [' ' if 3*r+k+1 not in possibles[i][j] else 3*r+k+1 for k in range(3)]
-                    print((bclr.RED if selected==(i,j) else "") +f" {tp[0]}  {tp[1]}  {tp[2]} {bclr.ENDC}",end="")
-                elif r == 0:
-                    print((bclr.RED if selected==(i,j) else "")+f"  ┏━━━┓  {bclr.ENDC}",end="")
-                elif r == 1:
-                    print((bclr.RED if selected==(i,j) else "")+f"  ┃ {board[i][j]} ┃  {bclr.ENDC}",end="")
-                else:
-                    print((bclr.RED if selected==(i,j) else "")+f"  ┗━━━┛  {bclr.ENDC}",end="")
-            print("║")
-    print("╚═════════╧═════════╧═════════╩═════════╧═════════╧═════════╩═════════╧═════════╧═════════╝")
+            lines.append(thick)
+        cells = [_detailed_cell(board[i][j], tuple(possibles[i][j]), selected==(i,j), box) for j in range(size)]
+        for r in range(box):
+            line = []
+            for j in range(size):
+                line.append("║" if j%box == 0 else "│")
+                line.append(cells[j][r])
+            line.append("║")
+            lines.append(line)
+    lines.append(bottom)
+    return lines
+
+def frame_to_string(lines):
+    return ''.join(''.join(line)+'\n' for line in lines)
+
+def print_board(board, selected=None):
+    '''Print the board, with spaces in cells containing 0.'''
+    print(frame_to_string(board_frame(board, selected)), end='')
+
+def print_detailed_board(board, possibles, selected=None):
+    '''Print a detailed version of an ongoing solve. Only printing happens here.'''
+    print(frame_to_string(detailed_board_frame(board, possibles, selected)), end='')
+
+class BoardRenderer:
+    '''Draws frames (lists of lines, each line being a `str` or a `list` of segments) to the current sink of `print` with one write per frame.
+    If the output is a terminal, the first frame clears the screen, and later frames only rewrite the segments which changed since the
+    previous frame (using ANSI cursor movement); otherwise every frame is written whole. Call `invalidate()` if something else was
+    written to the screen, so the next frame is drawn from scratch.'''
+    def __init__(self):
+        self.last = None # the previous frame, if it is still on the screen
+
+    def invalidate(self):
+        self.last = None
+
+    def draw(self, lines):
+        frame = [line if isinstance(line, list) else [line] for line in lines]
+        file = print.sink
+        if not file.isatty():
+            file.write(frame_to_string(frame))
+            return
+        columns, rows = shutil.get_terminal_size()
+        heights = [max(1, -(-sum(_visible_width(s) for s in line) // columns)) for line in frame] # screen rows used by each line
+        if self.last is None or sum(heights) >= rows: # draw from scratch
+            out = ['\x1b[H\x1b[2J', frame_to_string(frame)]
+        else:
+            out = []
+            row = 1 # screen row of the current line
+            last, positions = self.last
+            for i, line in enumerate(frame):
+                if i >= len(last) or (row, heights[i]) != positions[i]: # position changed: redraw the rest
+                    out.append(f'\x1b[{row};1H\x1b[J' + frame_to_string(frame[i:]))
+                    break
+                old = last[i]
+                if old != line:
+                    if heights[i] == 1 and len(old) == len(line) and \
+                            all(_visible_width(a) == _visible_width(b) for a, b in zip(old, line)):
+                        col = 1
+                        for a, b in zip(old, line):
+                            if a != b:
+                                out.append(f'\x1b[{row};{col}H{b}')
+                            col += _visible_width(b)
+                    else:
+                        out.append(f'\x1b[{row};1H' + ''.join(line) + '\x1b[K')
+                row += heights[i]
+            else:
+                out.append(f'\x1b[{row};1H\x1b[J') # clear what remained of the previous frame, and move below this one
+        file.write(''.join(out))
+        file.flush()
+        row = 1
+        positions = [] # (screen row, height) of each line
+        for h in heights:
+            positions.append((row, h))
+            row += h
+        self.last = (frame, positions) if sum(heights) < rows else None
 
 def print_raw_board(board):
     '''Print the board with only the numbers visible, 0-s for empty cells, newlines between lines of the board.'''
     for line in board:
-        print(''.join((str(i) for i in line)))
+        print(''.join((SYMBOLS[i-1] if i != 0 else '0' for i in line)))
 
 def print_array_board(board):
     '''Print the board in an array format'''
     for i, line in enumerate(board):
-        print("[[" if i==0 else " [",', '.join((str(i) for i in line)),'],' if i < 8 else ']]',sep='')
+        print("[[" if i==0 else " [",', '.join((str(i) for i in line)),'],' if i < len(board)-1 else ']]',sep='')
 
 if __name__ == "__main__":
     # init_tuples_from_text test
@@ -193,7 +589,7 @@ if __name__ == "__main__":
     
     # edit_sudoku test
     print("--- Testing edit_sudoku()")
-    print(np.array(edit_sudoku()))
+    print(edit_sudoku())
 
     # fetch_puzzle test
     print("--- Testing fetch_puzzle()")
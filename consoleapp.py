@@ -4,11 +4,11 @@
 # ==============================================================
 
 import re
-from consolestyle import fclr, style
 try:
-    import readline
-except:
-    pass
+    from re import _parser as sre_parse # Python 3.11+
+except ImportError:
+    import sre_parse
+from consolestyle import fclr, style
 
 class ConsoleApp:
     '''Each instance of this class is a textual input parser, which makes it easy to interpret variable queries, variable setting commands,
@@ -78,6 +78,7 @@ class ConsoleApp:
         self.description = description
         self.welcome_text = welcome_text
         self.started = False
+        self._index = {} # first character of the input -> (combined pattern, entries) of the variables/functions it may name
         if help_cmd is not None:
             self.add_function(help_cmd,[],has_args=True,description=
             'If no parameters are given, display help for all commands and variables. Otherwise display help only for the given objects.')
@@ -95,8 +96,10 @@ class ConsoleApp:
             'variable_pattern': variable_pattern,
             'description': re.sub(r'\n',r'\n\t',description),
             'name_pattern': re.compile(rname),
+            'first_chars': first_chars(rname),
             'get_pattern': re.compile(rname+r'\s*'),
             'set_pattern': re.compile(rname+r'(?:\s*=\s*|\s+?)('+variable_pattern+')\s*')})
+        self._index = {}
     
     def add_function(self, rname, signature, *flags, has_args=False, has_kwargs=False, description=''):
         '''Add a function that can be parsed by the interpreter.\n
@@ -119,16 +122,22 @@ class ConsoleApp:
             'description': re.sub(r'\n',r'\n\t',description),
             'flags': flags,
             'name_pattern': re.compile(rname),
+            'first_chars': first_chars(rname),
             'pattern_args': re.compile(rname+\
                 (r'(?:\s+'+r'|\s+'.join((f'(?P<flag_{i}>{flag})[,;]?' for i, flag in enumerate(flags)))+')*' if len(flags)>0 else '')+\
                 ''.join((f'(?:\s+(?P<arg_{i}>{t[1]})[,;]?' for i, t in enumerate(signature) if len(t)==2))+\
                 ''.join((f'(?:\s+(?P<arg_{i}>{t[1]})[,;]?' for i, t in enumerate(signature) if len(t)==3))+r')?'*len(signature)+\
                 r'(?:\s+'+r'|\s+'.join((t[0]+r'(?:\s*=\s*|\s+)'+f'(?P<kwarg_{i}>{t[1]})[,;]?' for i, t in enumerate(signature)))+')*')})
+        self._index = {}
     
     def input(self):
         '''Request input and return it for further processing.'''
         if not self.started:
             self.started = True
+            try:
+                import readline # line editing and history for input(); only needed once input is actually requested
+            except:
+                pass
             if self.welcome_text is not None and self.welcome_text != '':
                 print(self.welcome_text)
         print(fclr.GREEN, end='')
@@ -136,6 +145,42 @@ class ConsoleApp:
         print(fclr.DEFAULT, end='')
         return self.parse(i)
 
+    def script(self, lines, echo=False):
+        '''Parse the commands in `lines` (an iterable of strings, e.g. an open file or `sys.stdin`) one by one, and yield the results like
+        iterating over the app does, but without prompts, the welcome text or `readline`. Blank lines and lines starting with `#` are
+        skipped, and the exit command ends the script. If `echo` is True, each command is printed after the cursor before it is parsed.'''
+        for line in lines:
+            line = line.strip()
+            if line == '' or line[0] == '#':
+                continue
+            if echo:
+                print(self.cursor+line)
+            try:
+                yield self.parse(line)
+            except StopIteration: # exit command
+                return
+
+    def _resolve(self, string):
+        '''Return the `('var', variable)` or `('func', function)` entry whose name matches the beginning of `string` first (variables are
+        tried before functions, both in the order they were added), or `None` if there is no such entry.\\
+        The entries which may match are looked up by the first character of `string`, and their names are tried at once, as the
+        alternatives of one compiled regex (the first alternative which matches wins, like in a sequential search).'''
+        first = string[:1]
+        bucket = self._index.get(first)
+        if bucket is None:
+            entries = [e for e in [('var', v) for v in self.vars] + [('func', f) for f in self.funcs]
+                if e[1]['first_chars'] is None or first in e[1]['first_chars']]
+            try:
+                pattern = re.compile('|'.join(f"(?P<_e{i}>{e[1]['rname']})" for i, e in enumerate(entries)))
+            except re.error: # names with conflicting groups: try them one by one
+                pattern = None
+            bucket = self._index[first] = (pattern, entries)
+        pattern, entries = bucket
+        if pattern is None:
+            return next((e for e in entries if e[1]['name_pattern'].match(string) is not None), None)
+        m = pattern.match(string)
+        return None if m is None else entries[int(m.lastgroup[2:])]
+
     def parse(self, string):
         '''Parse a string and decode it into a variable assignment or a function call.\n
         If it is a variable name without parameters, it will return 
@@ -157,63 +202,64 @@ class ConsoleApp:
         >   `'fail_func', rname, input_string`\n
         If the input doesn't match any of the variables/functions, it will return:
         >   `'nonsense', None, None`'''
+        entry = self._resolve(string)
         # Match variables
-        for v in self.vars:
-            if v["name_pattern"].match(string) is not None:
-                if v["get_pattern"].fullmatch(string) is not None:
-                    return 'get_var', v["rname"], None
-                m = v["set_pattern"].fullmatch(string)
-                if m is not None:
-                    return 'set_var', v["rname"], m.group(1)
-                print(f"ERROR: could not parse input. Please use {solve_regex(v['rname'])}=<value>, with both sides formatted properly.")
-                return 'fail_var', v["rname"], string
+        if entry is not None and entry[0] == 'var':
+            v = entry[1]
+            if v["get_pattern"].fullmatch(string) is not None:
+                return 'get_var', v["rname"], None
+            m = v["set_pattern"].fullmatch(string)
+            if m is not None:
+                return 'set_var', v["rname"], m.group(1)
+            print(f"ERROR: could not parse input. Please use {solve_regex(v['rname'])}=<value>, with both sides formatted properly.")
+            return 'fail_var', v["rname"], string
         # Match functions
-        for f in self.funcs:
-            if f["name_pattern"].match(string) is not None:
-                m = f["pattern_args"].match(string)
-                if m is not None:
-                    raw = m.groupdict()
-                    ret = {"flags": {flag: (raw[f'flag_{i}'] is not None) for i, flag in enumerate(f["flags"])}} # get flags
-                    # get params:
-                    params = {}
-                    for i, t in enumerate(f['signature']):
-                        if raw[f'arg_{i}'] is not None:
-                            params[t[0]] = raw[f'arg_{i}']
-                        elif raw[f'kwarg_{i}'] is not None:
-                            params[t[0]] = raw[f'kwarg_{i}']
-                        elif len(t) == 3:
-                            params[t[0]] = t[2]
-                        else:
-                            print(f'ERROR: argument {i} is not provided! Use the following signature:')
-                            print('\t',self.short_func_signature(f))
-                            return 'fail_func', f['rname'], string
-                    ret['params'] = params
-                    string = f['pattern_args'].sub('',string,count=1)
-                    # get kwargs:
-                    if f['has_kwargs']:
-                        kwstring = ConsoleApp._kwargs_pattern.search(string)
-                        ret['kwargs'] = {m.group('name'): ConsoleApp.get_text(m.group('v')) 
-                            for m in ConsoleApp._kwarg_pattern.finditer(kwstring.group(0))}
-                        string = ConsoleApp._kwargs_pattern.sub('',string,count=1)
-                    # get args:
-                    if f['has_args']:
-                        ret['args'] = [ConsoleApp.get_text(s) for s in ConsoleApp._arg_pattern.findall(string)]
-                        string = ''
-                    # error:
-                    if string != '':
-                        print("ERROR: could not parse input. Superfluous parameters detected. Use the following signature:")
+        if entry is not None and entry[0] == 'func':
+            f = entry[1]
+            m = f["pattern_args"].match(string)
+            if m is not None:
+                raw = m.groupdict()
+                ret = {"flags": {flag: (raw[f'flag_{i}'] is not None) for i, flag in enumerate(f["flags"])}} # get flags
+                # get params:
+                params = {}
+                for i, t in enumerate(f['signature']):
+                    if raw[f'arg_{i}'] is not None:
+                        params[t[0]] = raw[f'arg_{i}']
+                    elif raw[f'kwarg_{i}'] is not None:
+                        params[t[0]] = raw[f'kwarg_{i}']
+                    elif len(t) == 3:
+                        params[t[0]] = t[2]
+                    else:
+                        print(f'ERROR: argument {i} is not provided! Use the following signature:')
                         print('\t',self.short_func_signature(f))
                         return 'fail_func', f['rname'], string
-                    # SUCCESS, do the thingy!!!
-                    if f['rname'] == self.help_cmd:
-                        self.help_func(*ret['args'])
-                    elif f['rname'] == self.exit_cmd:
-                        raise StopIteration
-                    return 'func', f['rname'], ret
-                else:
-                    print('ERROR: could not parse input. Incorrect function signature detected. Use the following signature:')
+                ret['params'] = params
+                string = f['pattern_args'].sub('',string,count=1)
+                # get kwargs:
+                if f['has_kwargs']:
+                    kwstring = ConsoleApp._kwargs_pattern.search(string)
+                    ret['kwargs'] = {m.group('name'): ConsoleApp.get_text(m.group('v')) 
+                        for m in ConsoleApp._kwarg_pattern.finditer(kwstring.group(0))}
+                    string = ConsoleApp._kwargs_pattern.sub('',string,count=1)
+                # get args:
+                if f['has_args']:
+                    ret['args'] = [ConsoleApp.get_text(s) for s in ConsoleApp._arg_pattern.findall(string)]
+                    string = ''
+                # error:
+                if string != '':
+                    print("ERROR: could not parse input. Superfluous parameters detected. Use the following signature:")
                     print('\t',self.short_func_signature(f))
                     return 'fail_func', f['rname'], string
+                # SUCCESS, do the thingy!!!
+                if f['rname'] == self.help_cmd:
+                    self.help_func(*ret['args'])
+                elif f['rname'] == self.exit_cmd:
+                    raise StopIteration
+                return 'func', f['rname'], ret
+            else:
+                print('ERROR: could not parse input. Incorrect function signature detected. Use the following signature:')
+                print('\t',self.short_func_signature(f))
+                return 'fail_func', f['rname'], string
         # Do nothing
         print(self.reply_to_nonsense,end='')
         return 'nonsense', None, None
@@ -279,6 +325,46 @@ class ConsoleApp:
             raise ValueError(f'{s} is not a properly formatted boolean!')
     
 
+def first_chars(pattern_string):
+    '''Return the set of characters a match of the regex `pattern_string` can start with, or `None` if this can not be determined (e.g. the
+    regex can match an empty string, starts with `\w` or `.`, or ignores case).'''
+    def first(items):
+        if len(items) == 0:
+            return None
+        op, av = items[0]
+        if op is sre_parse.LITERAL:
+            return {chr(av)}
+        if op is sre_parse.IN:
+            chars = set()
+            for o, a in av:
+                if o is sre_parse.LITERAL:
+                    chars.add(chr(a))
+                elif o is sre_parse.RANGE and a[1] - a[0] < 256:
+                    chars.update(map(chr, range(a[0], a[1]+1)))
+                else: # negated sets, categories like \d
+                    return None
+            return chars
+        if op is sre_parse.BRANCH:
+            chars = set()
+            for alternative in av[1]:
+                c = first(alternative)
+                if c is None:
+                    return None
+                chars |= c
+            return chars
+        if op is sre_parse.SUBPATTERN and not av[1] & re.IGNORECASE:
+            return first(av[-1])
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            return first(av[2])
+        return None
+    try:
+        parsed = sre_parse.parse(pattern_string)
+    except re.error:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    return first(parsed)
+
 def solve_regex(pattern_string):
     '''Return a "typical" string which satisfies the given (not-too-complicated) regex.\\
     Can deal with `(?:)`, `[]`, `\s\d\w\S\D\W`, `.`, `?`, `+`, `*`, `|`'''
@@ -1,6 +1,6 @@
-from itertools import combinations, permutations, product
+from itertools import combinations, product
 from tracker import MustBe
-from util import cell_section, global_to_local, local_to_global
+from util import bits, cell_section, global_to_local, local_to_global, popcount
 
 class Contradiction(Exception):
     def __init__(self, message):
@@ -9,7 +9,7 @@ class Contradiction(Exception):
 def only_one_value(sudoku):
     """RULE: only 1 value can be written to this cell, as all others are present in this row+column+section"""
     made_deduction = False
-    for i, j in product(range(9), range(9)):
+    for i, j in product(range(sudoku.size), range(sudoku.size)):
         if sudoku.board[i][j]!=0: # left here to enable contradiction check
             continue
         tmp = sudoku.allowed[i][j] # which numbers are not present in this row+column+section?
@@ -25,7 +25,7 @@ def only_this_cell(sudoku):
     """RULE: v can be written only to this cell in this row/column/section, as all other cells are filled/v cannot be written in them
     ignoring already filled cells is done be make_deduction"""
     made_deduction = False
-    for i, j in product(range(9), range(9)):
+    for i, j in product(range(sudoku.size), range(sudoku.size)):
         if len(sudoku.rowpos[i][j]) == 1:
             made_deduction |= sudoku.make_deduction(MustBe((i,sudoku.rowpos[i][j].last_one()),j+1,'rowpos'),
                 'rowpos',sudoku.rowpos[i][j].notNones())
@@ -33,22 +33,26 @@ def only_this_cell(sudoku):
             made_deduction |= sudoku.make_deduction(MustBe((i,sudoku.colpos[i][j].last_one()),j+1,'colpos'),
                 'colpos',sudoku.colpos[i][j].notNones())
         if len(sudoku.secpos[i][j])==1:
-            made_deduction |= sudoku.make_deduction(MustBe((i,sudoku.secpos[i][j].last_one()),j+1,'secpos'),
+            made_deduction |= sudoku.make_deduction(MustBe((i,sudoku.secpos[i][j].last_one()),j+1,'secpos',sudoku.box),
                 'secpos',sudoku.secpos[i][j].notNones())
     return made_deduction
 
-def _apply_for_nines(func):
+def _apply_for_nines(sudoku, func):
     made_deduction = False
-    for row in range(9):
-        cells_to_check = [(row,col) for col in range(9)]
+    size, box = sudoku.size, sudoku.box
+    for row in range(size):
+        sudoku.checkpoint()
+        cells_to_check = [(row,col) for col in range(size)]
         made_deduction |= func(cells_to_check, {"type": "row", "idx": row})
 
-    for col in range(9):
-        cells_to_check = [(row,col) for row in range(9)]
+    for col in range(size):
+        sudoku.checkpoint()
+        cells_to_check = [(row,col) for row in range(size)]
         made_deduction |= func(cells_to_check, {"type": "col", "idx": col})
 
-    for sec in range(9):
-        cells_to_check = [local_to_global(sec,i,j) for i,j in product(range(3),range(3))]
+    for sec in range(size):
+        sudoku.checkpoint()
+        cells_to_check = [local_to_global(sec,i,j,box) for i,j in product(range(box),range(box))]
         made_deduction |= func(cells_to_check, {"type": "square", "idx": sec})
     return made_deduction
 
@@ -65,9 +69,14 @@ def _allowed_numbers(sudoku, cells):
         if sudoku.board[cell[0]][cell[1]] != 0:
             allowed_numbers.append((sudoku.board[cell[0]][cell[1]],))
         else:
-            allowed_numbers.append(tuple(sudoku.allowed[cell[0]][cell[1]].allowed()))
+            allowed_numbers.append(tuple(bits(sudoku.candidates[cell[0]][cell[1]])))
     return allowed_numbers
 
+def _candidate_mask(sudoku, cell):
+    """The bitset of the numbers allowed in cell (see `Sudoku.candidates`): the bit of its value if it is filled."""
+    value = sudoku.board[cell[0]][cell[1]]
+    return 1 << value if value != 0 else sudoku.candidates[cell[0]][cell[1]]
+
 
 def naked_pair(sudoku):
     """RULE: If two cells in the same territory(row/col/sec), can only have the elements of the same 2 size set then ban these numbers from other cells in this territory."""
@@ -91,12 +100,12 @@ def naked_pair(sudoku):
                     made_deduction |= _ban_numbers(sudoku,cell,deleted_numbers,"naked_pair",cells_used, {'cell1':cell1, 'cell2':cell2, 'nums': deleted_numbers, 'section': section})
         return made_deduction
 
-    return _apply_for_nines(search_and_ban_in_subset)
+    return _apply_for_nines(sudoku, search_and_ban_in_subset)
 
 def hidden_pair(sudoku):
     """RULE: If two numbers can only go in up to 2 cells within a territory(row/col/sec), ban other numbers from these cells."""
     def search_hidden_pairs(elems):
-        where_can_go = {i:[] for i in range(1,10)} # i-th number in which indices of elems can go
+        where_can_go = {i:[] for i in range(1,sudoku.size+1)} # i-th number in which indices of elems can go
         for idx,elem in enumerate(elems):
             for num in elem:
                 where_can_go[num].append(idx)
@@ -124,7 +133,7 @@ def hidden_pair(sudoku):
 
         return made_deduction
 
-    return _apply_for_nines(search_and_ban_in_subset)
+    return _apply_for_nines(sudoku, search_and_ban_in_subset)
 
 
 def naked_triples(sudoku):
@@ -138,27 +147,18 @@ def naked_triples(sudoku):
         (123) (12) (23) - {3/2/2}
         (12) (23) (13) - {2/2/2}
         """
+        # only cells with 2 or 3 candidates can be part of a triple: a triple is accepted if the union of the cells has 3 elements, one
+        # of the cells has all 3 of them, and the cells with 2 candidates differ (so {2/2/2} is not accepted, as in earlier versions)
+        sets = {i: frozenset(elem) for i, elem in enumerate(elems) if len(elem) == 2 or len(elem) == 3}
         l = []
-        for comb in combinations(range(9), 3):
-            cell0 = set(elems[comb[0]])
-            cell1 = set(elems[comb[1]])
-            cell2 = set(elems[comb[2]])
-            for cell0, cell1, cell2 in permutations((cell0, cell1, cell2)):
-                if len(cell0) == 3 and cell0 == cell1 and cell1 == cell2:
-                    l.append(tuple(sorted((comb[0], comb[1], comb[2]))))
-                    break
-                elif len(cell0) == 3 and cell0 == cell1 and len(cell2) == 2 and cell2.issubset(cell1):
-                    l.append(tuple(sorted((comb[0], comb[1], comb[2]))))
-                    break
-                elif len(cell0) == 3 and len(cell1) == 2 and len(cell2) == 2 and \
-                        cell1.issubset(cell0) and cell2.issubset(cell0) and len(cell1 & cell2) == 1:
-                    l.append(tuple(sorted((comb[0], comb[1], comb[2]))))
-                    break
-                elif len(cell0) == 2 and len(cell1) == 2 and len(cell1) == 2 and \
-                        len(cell0 & cell1) == 2 and len(cell1 & cell2) == 2 and \
-                        len(cell0 & cell2) == 2 and len(cell0 & cell1 & cell2) == 1:
-                    l.append(tuple(sorted((comb[0], comb[1], comb[2]))))
-                    break
+        for comb in combinations(sets, 3):
+            cell0, cell1, cell2 = sets[comb[0]], sets[comb[1]], sets[comb[2]]
+            if len(cell0 | cell1 | cell2) != 3:
+                continue
+            pairs = [cell for cell in (cell0, cell1, cell2) if len(cell) == 2]
+            if len(pairs) == 3 or (len(pairs) == 2 and pairs[0] == pairs[1]):
+                continue
+            l.append(comb)
         return l
 
     def search_and_ban_in_subset(cells_to_check, section):
@@ -182,7 +182,7 @@ def naked_triples(sudoku):
                                                     'section': section})
         return made_deduction
 
-    return _apply_for_nines(search_and_ban_in_subset)
+    return _apply_for_nines(sudoku, search_and_ban_in_subset)
 
 
 def hidden_triples(sudoku):
@@ -190,12 +190,14 @@ def hidden_triples(sudoku):
 
     def search_hidden_triples(elems):
         res = dict()
-        where_can_go = {i: set() for i in range(1, 10)}  # i-th number in which indices of elems can go
+        where_can_go = {i: set() for i in range(1, sudoku.size + 1)}  # i-th number in which indices of elems can go
         for idx, elem in enumerate(elems):
             for num in elem:
                 where_can_go[num].add(idx)
 
-        for nums in combinations(range(1, 10), 3):
+        # only numbers with 2 or 3 places can be in a triple: on larger boards this leaves much fewer combinations to check
+        candidates = [num for num, places in where_can_go.items() if 1 < len(places) <= 3]
+        for nums in combinations(candidates, 3):
             nums_can_go = tuple(where_can_go[nums[0]] | where_can_go[nums[1]] | where_can_go[nums[2]])
             if len(where_can_go[nums[0]]) > 1 and len(where_can_go[nums[1]]) > 1 and len(where_can_go[nums[2]]) > 1 and \
                     len(nums_can_go) == 3:
@@ -226,54 +228,56 @@ def hidden_triples(sudoku):
                                            "hidden_triple", cells_used, details)
         return made_deduction
 
-    return _apply_for_nines(search_and_ban_in_subset)
+    return _apply_for_nines(sudoku, search_and_ban_in_subset)
 
 def square_line(sudoku):
     '''RULE: if number can only go in one line within square ban that number from rest of the line'''
     made_deduction=False
-    for sec in range(9):
-        for val in range(9):
+    size, box = sudoku.size, sudoku.box
+    for sec in range(size):
+        for val in range(size):
             places=sudoku.secpos[sec][val].allowed()
             if len(places): continue #avoid redundant ban (can write val to this pos because of only_this_cell)
             #for row
             if len(set((i for i,j in places)))==1:
-                row,_=local_to_global(sec,*places[0])
+                row,_=local_to_global(sec,*places[0],box)
                 reason=[info for key, info in sudoku.secpos[sec][val].items() if key[0] != row and info is not None]
-                for col in range(9):
-                    if col//3!=sec%3: #trust me, I'm an engineer
+                for col in range(size):
+                    if col//box!=sec%box: #trust me, I'm an engineer
                         made_deduction|=sudoku.ban(row,col,val+1,"square_line",reason,details={'rc':'row', 'line':row, 'sec': sec})
             #for col
             if len(set((j for i,j in places)))==1:
-                _,col=local_to_global(sec,*places[0])
+                _,col=local_to_global(sec,*places[0],box)
                 reason = [info for key, info in sudoku.secpos[sec][val].items() if key[1] != col and info is not None]
-                for row in range(9):
-                    if row//3!=sec//3:
+                for row in range(size):
+                    if row//box!=sec//box:
                         made_deduction|=sudoku.ban(row,col,val+1,"square_line",reason,details={'rc':'col', 'line':col, 'sec': sec})
     return made_deduction
 
 def line_square(sudoku):
     '''RULE: if number can only go in one square within a line ban that number from rest of the square'''
     made_deduction=False
-    for row in range(9):
-        for val in range(9):
+    size, box = sudoku.size, sudoku.box
+    for row in range(size):
+        for val in range(size):
             places=sudoku.rowpos[row][val].allowed()
             if len(places)==1: continue #avoid redundant ban (can write val to this pos because of only_this_cell)
-            if len(set(i//3 for i in places))==1:
-                sec=cell_section(row,places[0])
-                reason=[info for key, info in sudoku.rowpos[row][val].items() if key // 3 != places[0] // 3 and info is not None]
-                for i,j in product(range(3),range(3)):
-                    r,c=local_to_global(sec,i,j)
+            if len(set(i//box for i in places))==1:
+                sec=cell_section(row,places[0],box)
+                reason=[info for key, info in sudoku.rowpos[row][val].items() if key // box != places[0] // box and info is not None]
+                for i,j in product(range(box),range(box)):
+                    r,c=local_to_global(sec,i,j,box)
                     if r!=row:
                         made_deduction|=sudoku.ban(r,c,val+1,"line_square",reason,details={'rc':'row', 'line':row, 'sec': sec})
-    for col in range(9):
-        for val in range(9):
+    for col in range(size):
+        for val in range(size):
             places=sudoku.colpos[col][val].allowed()
             if len(places) == 1: continue  # avoid redundant ban (can write val to this pos because of only_this_cell)
-            if len(set(i//3 for i in places))==1:
-                sec=cell_section(places[0],col)
-                reason=[info for key, info in sudoku.colpos[col][val].items() if key // 3 != places[0] // 3 and info is not None]
-                for i,j in product(range(3),range(3)):
-                    r,c=local_to_global(sec,i,j)
+            if len(set(i//box for i in places))==1:
+                sec=cell_section(places[0],col,box)
+                reason=[info for key, info in sudoku.colpos[col][val].items() if key // box != places[0] // box and info is not None]
+                for i,j in product(range(box),range(box)):
+                    r,c=local_to_global(sec,i,j,box)
                     if c!=col:
                         made_deduction|=sudoku.ban(r,c,val+1,"line_square",reason,details={'rc':'col', 'line':col, 'sec':sec})
     return made_deduction
@@ -297,79 +301,76 @@ def ywing(sudoku):
      || BC  --  --|| C+ C+  C+ ||
      ============================'''
     # (i,j)=AC and (k,l)=BC
-    def allowed_nums_multicells(*args):
+    # the candidates are compared as bitsets (see `Sudoku.candidates`): the numbers two cells share are the bits of the AND of their masks
+    def common(*cells):
+        """Input: cells. Output: the bitset of the numbers that can be written in all these cells."""
+        mask = _candidate_mask(sudoku, cells[0])
+        for cell in cells[1:]:
+            mask &= _candidate_mask(sudoku, cell)
+        return mask
+
+    def allowed_nums_multicells(*cells):
         """Input: cells. Output: numbers that can be written in all these cells."""
-        return set.intersection(*[set(_allowed_numbers(sudoku,[arg])[0]) for arg in args])
-    
-    def cells_in_same_sec(cell, col={0,1,2}, row={0,1,2}):
+        return set(bits(common(*cells)))
+
+    def cells_in_same_sec(cell, col=None, row=None):
         """Returns a list with the cells that are not set and are in the same sec as cell.
         You can also set the (local)col or (local)row."""
-        sec = cell_section(cell[0],cell[1])
+        sec = cell_section(cell[0],cell[1],box)
         res = []
-        for i,j in product(range(3),range(3)):
-            if i in row and j in col:
-                new_cell = local_to_global(sec, i, j)
-                if len(allowed_nums_multicells(new_cell)) > 0:
+        for i,j in product(range(box),range(box)):
+            if (row is None or i in row) and (col is None or j in col):
+                new_cell = local_to_global(sec, i, j, box)
+                if common(new_cell) != 0:
                     res.append(new_cell)
         return res
 
     made_deduction = False
-    for cell1 in product(range(9),range(9)):
-        for cell2 in product(range(9),range(9)):
-            if len(allowed_nums_multicells(cell1)) == 2 and len(allowed_nums_multicells(cell2)) == 2 and \
-               len(allowed_nums_multicells(cell1,cell2)) == 1 and \
-               not (cell1[0] == cell2[0] and cell1[1] == cell2[1]):
-                if len(set((cell1[0],cell2[0]))) == 2 and len(set((cell1[1],cell2[1]))) == 2:
+    size, box = sudoku.size, sudoku.box
+    count = popcount
+    for cell1 in product(range(size),range(size)):
+        sudoku.checkpoint()
+        for cell2 in product(range(size),range(size)):
+            mask1 = common(cell1)
+            if count(mask1) != 2: # only bivalue cells can be the first cell of a wing
+                continue
+            mask2 = common(cell2)
+            if count(mask2) == 2 and count(mask1 & mask2) == 1 and cell1 != cell2:
+                if cell1[0] != cell2[0] and cell1[1] != cell2[1]:
                     # It is a rectangle
                     cell0 = (cell1[0], cell2[1])
                     cell3 = (cell2[0], cell1[1])
-                    if len(allowed_nums_multicells(cell0)) == 2 and \
-                       len(allowed_nums_multicells(cell0,cell1)) == 1 and \
-                       len(allowed_nums_multicells(cell0,cell2)) == 1 and \
-                       len(allowed_nums_multicells(cell0,cell1,cell2)) == 0:
+                    mask0 = common(cell0)
+                    if count(mask0) == 2 and count(mask0 & mask1) == 1 and count(mask0 & mask2) == 1 and mask0 & mask1 & mask2 == 0:
                         # Good rectangle.
-                        deleted_number = set.intersection(allowed_nums_multicells(cell1,cell2)).pop()
+                        deleted_number = bits(mask1 & mask2)[0]
                         cells_used = sudoku.allowed[cell0[0]][cell0[1]].notNones()+sudoku.allowed[cell1[0]][cell1[1]].notNones()+sudoku.allowed[cell2[0]][cell2[1]].notNones()
                         details = {'main':cell0,'main_allowed':allowed_nums_multicells(cell3),'second1':cell1,'second1_allowed':allowed_nums_multicells(cell1),'second2':cell2,'second2_allowed':allowed_nums_multicells(cell2)}
                         made_deduction |= sudoku.ban(cell3[0],cell3[1],deleted_number,"ywing",cells_used, details)
-                    if len(allowed_nums_multicells(cell3)) == 2 and \
-                       len(allowed_nums_multicells(cell3,cell1)) == 1 and \
-                       len(allowed_nums_multicells(cell3,cell2)) == 1 and \
-                       len(allowed_nums_multicells(cell3,cell1,cell2)) == 0:
+                    mask1, mask2, mask3 = common(cell1), common(cell2), common(cell3)
+                    if count(mask3) == 2 and count(mask3 & mask1) == 1 and count(mask3 & mask2) == 1 and mask3 & mask1 & mask2 == 0:
                         # Good rectangle.
-                        deleted_number = set.intersection(allowed_nums_multicells(cell1,cell2)).pop()
+                        deleted_number = bits(mask1 & mask2)[0]
                         cells_used = sudoku.allowed[cell3[0]][cell3[1]].notNones()+sudoku.allowed[cell1[0]][cell1[1]].notNones()+sudoku.allowed[cell2[0]][cell2[1]].notNones()
                         details = {'main':cell3,'main_allowed':allowed_nums_multicells(cell3),'second1':cell1,'second1_allowed':allowed_nums_multicells(cell1),'second2':cell2,'second2_allowed':allowed_nums_multicells(cell2)}
                         made_deduction |= sudoku.ban(cell0[0],cell0[1],deleted_number,"ywing",cells_used, details)
-                elif cell1[0] == cell2[0] and cell_section(cell1[0],cell1[1]) != cell_section(cell2[0],cell2[1]):
-                    # One row, but not in the same sec
-                    main_cell = cell1
-                    second_cell = cell2
-                    other_cells = cells_in_same_sec(main_cell, row = {0,1,2}-{global_to_local(second_cell[0],second_cell[1])[0]})
-                    for cell3 in other_cells:
-                        if len(allowed_nums_multicells(cell3)) == 2 and  \
-                            len(allowed_nums_multicells(main_cell,cell3)) == 1 and len(allowed_nums_multicells(second_cell,cell3)) == 1 and \
-                            len(allowed_nums_multicells(main_cell,second_cell, cell3)) == 0:
-                            deleted_number = allowed_nums_multicells(second_cell,cell3).pop()
-                            cells_used = sudoku.allowed[main_cell[0]][main_cell[1]].notNones() + sudoku.allowed[second_cell[0]][second_cell[1]].notNones() + sudoku.allowed[cell3[0]][cell3[1]].notNones()
-                            for cell4 in cells_in_same_sec(second_cell,row={global_to_local(cell3[0],cell3[1])[0]}):
-                                if deleted_number in allowed_nums_multicells(cell4):
-                                    details = {'main':main_cell,'main_allowed':allowed_nums_multicells(main_cell),'second1':second_cell,'second1_allowed':allowed_nums_multicells(second_cell),'second2':cell3,'second2_allowed':allowed_nums_multicells(cell3)}
-                                    made_deduction |= sudoku.ban(cell4[0],cell4[1],deleted_number,"ywing",cells_used, details)
-
-                elif cell1[1] == cell2[1] and cell_section(cell1[0],cell1[1]) != cell_section(cell2[0],cell2[1]):
-                    # One col, but not in the same sec
+                elif (cell1[0] == cell2[0] or cell1[1] == cell2[1]) and cell_section(*cell1,box) != cell_section(*cell2,box):
+                    # One row (or one col), but not in the same sec
                     main_cell = cell1
                     second_cell = cell2
-                    other_cells = cells_in_same_sec(main_cell, col = {0,1,2}-{global_to_local(second_cell[0],second_cell[1])[1]})
+                    # the local row (or col) of the third cell: in the sec of the main cell, but not in the line of the second cell
+                    axis = 0 if cell1[0] == cell2[0] else 1
+                    lines = set(range(box))-{global_to_local(*second_cell,box)[axis]}
+                    other_cells = cells_in_same_sec(main_cell, row=lines) if axis == 0 else cells_in_same_sec(main_cell, col=lines)
                     for cell3 in other_cells:
-                        if len(allowed_nums_multicells(cell3)) == 2 and  \
-                            len(allowed_nums_multicells(main_cell,cell3)) == 1 and len(allowed_nums_multicells(second_cell,cell3)) == 1 and \
-                            len(allowed_nums_multicells(main_cell,second_cell, cell3)) == 0:
-                            deleted_number = allowed_nums_multicells(second_cell,cell3).pop()
+                        main_mask, second_mask, mask3 = common(main_cell), common(second_cell), common(cell3)
+                        if count(mask3) == 2 and count(main_mask & mask3) == 1 and count(second_mask & mask3) == 1 and \
+                            main_mask & second_mask & mask3 == 0:
+                            deleted_number = bits(second_mask & mask3)[0]
                             cells_used = sudoku.allowed[main_cell[0]][main_cell[1]].notNones() + sudoku.allowed[second_cell[0]][second_cell[1]].notNones() + sudoku.allowed[cell3[0]][cell3[1]].notNones()
-                            for cell4 in cells_in_same_sec(second_cell,col={global_to_local(cell3[0],cell3[1])[1]}):
-                                if deleted_number in allowed_nums_multicells(cell4):
+                            line = {global_to_local(*cell3,box)[axis]}
+                            for cell4 in (cells_in_same_sec(second_cell,row=line) if axis == 0 else cells_in_same_sec(second_cell,col=line)):
+                                if common(cell4) >> deleted_number & 1:
                                     details = {'main':main_cell,'main_allowed':allowed_nums_multicells(main_cell),'second1':second_cell,'second1_allowed':allowed_nums_multicells(second_cell),'second2':cell3,'second2_allowed':allowed_nums_multicells(cell3)}
                                     made_deduction |= sudoku.ban(cell4[0],cell4[1],deleted_number,"ywing",cells_used, details)
     return made_deduction
@@ -378,22 +379,23 @@ def xwing(sudoku):
     '''RULE: if for two rows/cols a given number can only go in 2 places each and these 4 places form a rectangle
        then ban given number from corresponding cols/rows'''
     made_deduction=False
-    for val in range(9):
+    size = sudoku.size
+    for val in range(size):
         #rows with 2
-        possible={i:sudoku.rowpos[i][val].allowed() for i in range(9) if len(sudoku.rowpos[i][val])==2}
+        possible={i:sudoku.rowpos[i][val].allowed() for i in range(size) if len(sudoku.rowpos[i][val])==2}
         for i,j in combinations(possible.keys(),2):
             if possible[i]==possible[j]:
                 reason = sudoku.rowpos[i][val].notNones() + sudoku.rowpos[j][val].notNones()
-                for r in range(9):
+                for r in range(size):
                     for c in possible[i]:
                         if r!=i and r!=j:
                             made_deduction|=sudoku.ban(r,c,val+1,"xwing",reason,details={'rc':'rows', 'lines':[i,j]})
         #cols with 2
-        possible={i:sudoku.colpos[i][val].allowed() for i in range(9) if len(sudoku.colpos[i][val])==2}
+        possible={i:sudoku.colpos[i][val].allowed() for i in range(size) if len(sudoku.colpos[i][val])==2}
         for i,j in combinations(possible.keys(),2):
             if possible[i]==possible[j]:
                 reason=sudoku.colpos[i][val].notNones()+sudoku.colpos[j][val].notNones()
-                for c in range(9):
+                for c in range(size):
                     for r in possible[i]:
                         if c!=i and c!=j:
                             made_deduction|=sudoku.ban(r,c,val+1,"xwing",reason,details={'rc':'cols', 'lines':[i,j]})
@@ -403,25 +405,28 @@ def swordfish(sudoku):
     '''RULE: if for 3 rows/cols a given number can only go in 2 or 3 places each, and these are in 3 cols/rows then ban given number from cols/rows'''
     made_deduction=False
     stripped_dict = lambda dic, banned: [info for key,info in dic.items() if (key not in banned) and info is not None] #for processing
+    size = sudoku.size
     #rows
-    for val in range(9):
-        possible = {i: sudoku.rowpos[i][val].allowed() for i in range(9) if len(sudoku.rowpos[i][val]) in [2,3]}
+    for val in range(size):
+        sudoku.checkpoint()
+        possible = {i: sudoku.rowpos[i][val].allowed() for i in range(size) if len(sudoku.rowpos[i][val]) in [2,3]}
         for i,j,k in combinations(possible.keys(),3):
             cols=list(set().union(possible[i],possible[j],possible[k]))
             if len(cols)==3:
                 reason = stripped_dict(sudoku.rowpos[i][val],cols) + stripped_dict(sudoku.rowpos[j][val],cols) + stripped_dict(sudoku.rowpos[k][val],cols)
-                for r in range(9):
+                for r in range(size):
                     for c in cols:
                         if r not in [i,j,k]:
                             made_deduction |= sudoku.ban(r, c, val + 1, "swordfish", reason,details={'rc':'rows', 'lines':[i,j,k]})
     #cols
-    for val in range(9):
-        possible = {i: sudoku.colpos[i][val].allowed() for i in range(9) if len(sudoku.colpos[i][val]) in [2,3]}
+    for val in range(size):
+        sudoku.checkpoint()
+        possible = {i: sudoku.colpos[i][val].allowed() for i in range(size) if len(sudoku.colpos[i][val]) in [2,3]}
         for i,j,k in combinations(possible.keys(),3):
             rows=list(set().union(possible[i],possible[j],possible[k]))
             if len(rows)==3:
                 reason = stripped_dict(sudoku.colpos[i][val],rows) + stripped_dict(sudoku.colpos[j][val],rows) + stripped_dict(sudoku.colpos[k][val],rows)
-                for c in range(9):
+                for c in range(size):
                     for r in rows:
                         if c not in [i,j,k]:
                             made_deduction |= sudoku.ban(r, c, val + 1, "swordfish", reason,details={'rc':'cols', 'lines':[i,j,k]})
@@ -0,0 +1,181 @@
+# ==========================================
+#       PUZZLE GENERATOR
+# ==========================================
+import os
+import random
+import sys
+import time
+from getopt import gnu_getopt
+
+# cells are indexed 0-80 in reading order; values are stored as bits 1-9 of the masks of the rows, columns and sections
+_ROW = [i // 9 for i in range(81)]
+_COL = [i % 9 for i in range(81)]
+_SEC = [(i // 27) * 3 + (i % 9) // 3 for i in range(81)]
+_ALL = 0b1111111110
+_BITS = [bin(m).count('1') for m in range(1 << 10)] # number of candidates in a mask
+
+def _search(cells, limit, rng=None):
+    '''Backtracking search on the 81 `cells` (0 for empty), always branching on the empty cell with the fewest candidates. Stops after
+    `limit` solutions; the candidates are tried in a random order if `rng` is given. Returns the number of solutions found and the
+    first one (None if there is none).'''
+    rows, cols, secs = [0]*9, [0]*9, [0]*9
+    empty = []
+    for i, v in enumerate(cells):
+        if v == 0:
+            empty.append(i)
+            continue
+        bit = 1 << v
+        if (rows[_ROW[i]] | cols[_COL[i]] | secs[_SEC[i]]) & bit:
+            return 0, None
+        rows[_ROW[i]] |= bit
+        cols[_COL[i]] |= bit
+        secs[_SEC[i]] |= bit
+    grid = list(cells)
+    found = [0, None]
+
+    def search(depth):
+        '''Fills `empty[depth:]`; returns True when the search can stop.'''
+        if depth == len(empty):
+            found[0] += 1
+            if found[1] is None:
+                found[1] = list(grid)
+            return found[0] >= limit
+        best, best_free, best_n = depth, 0, 10
+        for k in range(depth, len(empty)):
+            i = empty[k]
+            free = _ALL & ~(rows[_ROW[i]] | cols[_COL[i]] | secs[_SEC[i]])
+            n = _BITS[free]
+            if n < best_n:
+                best, best_free, best_n = k, free, n
+                if n <= 1:
+                    break
+        if best_n == 0:
+            return False
+        empty[depth], empty[best] = empty[best], empty[depth]
+        i = empty[depth]
+        r, c, s = _ROW[i], _COL[i], _SEC[i]
+        values = [v for v in range(1, 10) if best_free >> v & 1]
+        if rng is not None:
+            rng.shuffle(values)
+        for v in values:
+            bit = 1 << v
+            rows[r] |= bit
+            cols[c] |= bit
+            secs[s] |= bit
+            grid[i] = v
+            stop = search(depth + 1)
+            rows[r] ^= bit
+            cols[c] ^= bit
+            secs[s] ^= bit
+            if stop:
+                grid[i] = 0
+                return True
+        grid[i] = 0
+        return False
+
+    search(0)
+    return found[0], found[1]
+
+def count_solutions(cells, limit=2):
+    '''The number of solutions of the puzzle given by its 81 `cells` in reading order (0 for empty), counting at most `limit` of them.
+    With the default `limit`, 1 means that the solution is unique.'''
+    return _search(cells, limit)[0]
+
+def random_grid(rng):
+    '''A random complete sudoku grid (81 values in reading order), using the random generator `rng`.'''
+    return _search([0]*81, 1, rng)[1]
+
+def make_puzzle(rng, symmetric=True):
+    '''Makes a puzzle with a unique solution: starts from a random complete grid and removes its clues in a random order, each one only if
+    the solution stays unique, so no more clues can be removed from the result. If `symmetric` is True, clues are removed in pairs
+    symmetric to the center. Returns the 81 cells of the puzzle in reading order.'''
+    puzzle = random_grid(rng)
+    order = list(range(41 if symmetric else 81))
+    rng.shuffle(order)
+    for i in order:
+        removed = (i, 80 - i) if symmetric and i != 40 else (i,)
+        values = [puzzle[j] for j in removed]
+        for j in removed:
+            puzzle[j] = 0
+        if count_solutions(puzzle) != 1:
+            for j, v in zip(removed, values):
+                puzzle[j] = v
+    return puzzle
+
+def generate_batch(seeds, symmetric=True):
+    '''Makes and grades a puzzle from each seed of `seeds` (see `grading.grade()`). Returns a list of `(line, band, rule)` triples, where
+    `line` is the puzzle in 81 characters. Runs in a worker process.'''
+    from grading import grade
+    result = []
+    for seed in seeds:
+        puzzle = make_puzzle(random.Random(seed), symmetric)
+        line = ''.join(map(str, puzzle))
+        band, rule = grade(line)
+        result.append((line, band, rule))
+    return result
+
+def generate(targets, workers=None, seed=None, batch_size=8, symmetric=True, max_puzzles=None):
+    '''Lazily yields `(line, band, rule)` triples (see `generate_batch()`) until `targets[band]` puzzles have been yielded from each band
+    of `targets` (a `dict`); puzzles of other bands, puzzles of bands which already have enough, and repeated puzzles are thrown away.
+    Puzzles are made in batches of `batch_size` by `workers` processes (default: one per CPU). The puzzle made from the `n`th seed is
+    always the same for the same `seed` (a random one if it is None). Stops after trying `max_puzzles`, if it is given.'''
+    import concurrent.futures
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    needed = {band: n for band, n in targets.items() if n > 0}
+    seen = set()
+    tried = 0
+    def seeds():
+        nonlocal tried
+        count = batch_size if max_puzzles is None else min(batch_size, max_puzzles - tried)
+        tried += count
+        return [f'{seed}-{n}' for n in range(tried - count, tried)]
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        in_flight = {pool.submit(generate_batch, seeds(), symmetric) for _ in range(2 * workers)}
+        try:
+            while needed and in_flight:
+                done, in_flight = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    for line, band, rule in future.result():
+                        if needed.get(band, 0) > 0 and line not in seen:
+                            seen.add(line)
+                            needed[band] -= 1
+                            if needed[band] == 0:
+                                del needed[band]
+                            yield line, band, rule
+                    if needed and (max_puzzles is None or tried < max_puzzles):
+                        in_flight.add(pool.submit(generate_batch, seeds(), symmetric))
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+if __name__ == "__main__":
+    from grading import BANDS
+    _opts, args = gnu_getopt(sys.argv[1:], "hw:s:o:", ["workers=", "seed=", "out=", "batch=", "max=", "asymmetric",
+        *(f'{band}=' for band in BANDS)])
+    opts = dict(_opts)
+    targets = {band: int(opts.get(f'--{band}', 0)) for band in BANDS}
+    if '-h' in opts or sum(targets.values()) == 0:
+        print("python generator.py {--easy <n>} {--medium <n>} {--hard <n>} {--expert <n>} {--workers <n>} {--seed <s>} {--out <file>}"
+            " {--batch <n>} {--max <n>} {--asymmetric}")
+        print("\tMakes puzzles with unique solutions until there are the given number of them in each difficulty band. One puzzle is")
+        print("\twritten per line: the 81 cells, the band, and the hardest deduction rule needed. --max limits the number of puzzles tried.")
+        sys.exit(0 if '-h' in opts else 2)
+    workers = opts.get('-w', opts.get('--workers'))
+    seed = opts.get('-s', opts.get('--seed'))
+    max_puzzles = opts.get('--max')
+    out_path = opts.get('-o', opts.get('--out'))
+    out = open(out_path, 'w') if out_path is not None else sys.stdout
+    timestamp = time.time()
+    made = dict.fromkeys(targets, 0)
+    try:
+        for line, band, rule in generate(targets, int(workers) if workers else None, seed, int(opts.get('--batch', 8)),
+            '--asymmetric' not in opts, int(max_puzzles) if max_puzzles else None):
+            out.write(f'{line} {band} {rule}\n')
+            made[band] += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{sum(made.values())} puzzles in {time.time()-timestamp:.1f} s: " + ', '.join(f'{band}: {n}' for band, n in made.items()
+        if targets[band] > 0), file=sys.stderr)
@@ -0,0 +1,164 @@
+# ==========================================
+#       DIFFICULTY GRADING
+# ==========================================
+import os
+import sys
+import time
+from collections import deque
+from getopt import gnu_getopt
+import boardio
+from sudoku import Sudoku, SINGLE_RULES, DEDUCTION_RULES
+from sinks import NullSink
+
+# names of the deduction rules from the simplest to the hardest (the order in which `Sudoku.solve_step` tries them)
+RULE_ORDER = tuple(rule.__name__ for rule in SINGLE_RULES + DEDUCTION_RULES)
+# difficulty band of each rule: a puzzle belongs to the band of the hardest rule its solve needs
+RULE_BANDS = {
+    'only_one_value': 'easy', 'only_this_cell': 'easy',
+    'naked_pair': 'medium', 'naked_triples': 'medium', 'hidden_pair': 'medium', 'hidden_triples': 'medium',
+    'square_line': 'medium', 'line_square': 'medium',
+    'xwing': 'hard', 'ywing': 'hard', 'swordfish': 'hard',
+}
+# bands from the easiest; 'expert' puzzles can not be solved with the deduction rules alone
+BANDS = ('easy', 'medium', 'hard', 'expert')
+FISH_RULES = ('xwing', 'swordfish')
+WING_RULES = ('ywing',)
+# short names of the rules in the result table
+RULE_ABBREVIATIONS = {
+    'only_one_value': 'ov', 'only_this_cell': 'oc', 'naked_pair': 'np', 'naked_triples': 'nt', 'hidden_pair': 'hp',
+    'hidden_triples': 'ht', 'square_line': 'sl', 'line_square': 'ls', 'xwing': 'xw', 'ywing': 'yw', 'swordfish': 'sf',
+}
+
+def hardest_rule(sudoku):
+    '''The name of the hardest rule which found something new during the solves of `sudoku` (see `Sudoku.rule_uses`), or None.'''
+    return max(sudoku.rule_uses, key=RULE_ORDER.index, default=None)
+
+def grade_report(board, k_stats=False):
+    '''Grades a puzzle (`list` of `list`s, or a line of 81 characters) by solving it with the rules applied in escalating order: after
+    each new deduction the search starts again from the simplest rule, so a harder rule is only used when the simpler ones are stuck.
+    Nothing is printed, and the IP solver is never called (k-optimization is off).\\
+    Returns a `dict` with\\
+    `'band'`, `'hardest'`: the difficulty band (see `BANDS`) and the name of the hardest rule needed;\\
+    `'rule_uses'`: how many times each rule found something new (see `RULE_ORDER`);\\
+    `'steps'`, `'fish_steps'`, `'wing_steps'`: the number of filled cells, and how many of them needed fish (X-wing, swordfish) or
+    wing (Y-wing) rules;\\
+    `'failed_solves'`, `'stalled'`: whether (and how many times) the solve got stuck;\\
+    and if `k_stats` is True, `'max_k'` and `'mean_k'`: statistics of the (not optimized) proofs of the steps.'''
+    if isinstance(board, str):
+        sudoku = Sudoku(tuples=boardio.init_tuples_from_line(board), reset_always=True, k_cache=False, sink=NullSink())
+    else:
+        sudoku = Sudoku(board=board, reset_always=True, k_cache=False, sink=NullSink())
+    uses = sudoku.rule_uses
+    fish_steps = wing_steps = 0
+    answer = None
+    while answer is None:
+        fish = sum(uses[rule] for rule in FISH_RULES)
+        wing = sum(uses[rule] for rule in WING_RULES)
+        answer = sudoku.solve_step()
+        fish_steps += sum(uses[rule] for rule in FISH_RULES) > fish
+        wing_steps += sum(uses[rule] for rule in WING_RULES) > wing
+    hardest = hardest_rule(sudoku)
+    report = {
+        'band': RULE_BANDS.get(hardest, 'easy') if answer else 'expert',
+        'hardest': hardest,
+        'rule_uses': {rule: uses[rule] for rule in RULE_ORDER if uses[rule] > 0},
+        'steps': len(sudoku.proof),
+        'fish_steps': fish_steps,
+        'wing_steps': wing_steps,
+        'failed_solves': sudoku.failed_solves,
+        'stalled': not answer,
+    }
+    if k_stats:
+        report['max_k'] = max((step.k for step in sudoku.proof), default=0)
+        report['mean_k'] = 0 if len(sudoku.proof) == 0 else sum(step.k for step in sudoku.proof)/len(sudoku.proof)
+    return report
+
+def grade(board):
+    '''Grades a puzzle like `grade_report()`, but only returns the pair `(band, rule)`: the difficulty band and the name of the hardest
+    rule needed.'''
+    report = grade_report(board)
+    return report['band'], report['hardest']
+
+def grade_batch(boards, k_stats=False):
+    '''`grade_report()` of each board of `boards`. Runs in a worker process.'''
+    return [grade_report(board, k_stats) for board in boards]
+
+def read_corpus(path):
+    '''Lazily yields the puzzles of a corpus file as `list`s of `list`s: `.sdk` and `.csv` files are read with `boardio.read_sdk()` and
+    `boardio.read_csv()`, any other file as one puzzle per line (see `boardio.read_lines()`).'''
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.sdk':
+        return boardio.read_sdk(path)
+    if extension == '.csv':
+        return boardio.read_csv(path)
+    return boardio.read_lines(path)
+
+def grade_corpus(boards, workers=None, chunk_size=64, k_stats=False):
+    '''Lazily yields the `grade_report()` of each board of the iterable `boards`, in their order. The boards are graded in chunks of
+    `chunk_size` by `workers` processes (default: one per CPU); at most two chunks per worker are read ahead, so `boards` may be a
+    corpus of any size.'''
+    import concurrent.futures
+    workers = workers or os.cpu_count() or 1
+    boards = iter(boards)
+    def next_chunk():
+        chunk = []
+        for board in boards:
+            chunk.append(board)
+            if len(chunk) == chunk_size:
+                break
+        return chunk
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        in_flight = deque()
+        try:
+            while True:
+                while len(in_flight) < 2 * workers:
+                    chunk = next_chunk()
+                    if len(chunk) == 0:
+                        break
+                    in_flight.append(pool.submit(grade_batch, chunk, k_stats))
+                if len(in_flight) == 0:
+                    return
+                yield from in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+def report_row(idx, report):
+    '''One line of the result table of the CLI (see `TABLE_HEADER`).'''
+    uses = ' '.join(f'{RULE_ABBREVIATIONS[rule]}:{n}' for rule, n in report['rule_uses'].items())
+    k = f" {report['max_k']:>5} {report['mean_k']:>6.2f}" if 'max_k' in report else ''
+    return (f"{idx:>7} {report['band']:<6} {RULE_ABBREVIATIONS.get(report['hardest'], '-'):<2} {report['steps']:>5} {report['fish_steps']:>4}"
+        f" {report['wing_steps']:>4} {report['failed_solves']:>4}{k}  {uses}")
+
+TABLE_HEADER = "      # band   hr steps fish wing fail"
+K_HEADER = " max_k mean_k"
+
+if __name__ == "__main__":
+    _opts, args = gnu_getopt(sys.argv[1:], "hw:o:k", ["workers=", "chunk=", "out=", "k-stats"])
+    opts = dict(_opts)
+    if '-h' in opts or len(args) != 1:
+        print("python grading.py <corpus> {--workers <n>} {--chunk <n>} {--k-stats} {--out <file>}")
+        print("\tGrades each puzzle of the corpus (one puzzle per line, .sdk or .csv) and prints a table: the band, the hardest rule (hr),")
+        print("\tthe number of steps, of steps needing fish and wing rules, of failed solves, and the uses of each rule. Rules are")
+        print(f"\tabbreviated as {', '.join(f'{a}={r}' for r, a in RULE_ABBREVIATIONS.items())}.")
+        print("\t--k-stats adds the maximal and mean k of the (not optimized) proofs.")
+        sys.exit(0 if '-h' in opts else 2)
+    workers = opts.get('-w', opts.get('--workers'))
+    k_stats = '-k' in opts or '--k-stats' in opts
+    out_path = opts.get('-o', opts.get('--out'))
+    out = open(out_path, 'w') if out_path is not None else sys.stdout
+    timestamp = time.time()
+    bands = dict.fromkeys(BANDS, 0)
+    try:
+        out.write(TABLE_HEADER + (K_HEADER if k_stats else '') + '  rules\n')
+        for idx, report in enumerate(grade_corpus(read_corpus(args[0]), int(workers) if workers else None,
+            int(opts.get('--chunk', 64)), k_stats)):
+            out.write(report_row(idx, report) + '\n')
+            bands[report['band']] += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    total = sum(bands.values())
+    elapsed = time.time() - timestamp
+    print(f"{total} puzzles in {elapsed:.1f} s ({total/elapsed if elapsed > 0 else 0:.1f}/s): "
+        + ', '.join(f'{band}: {n}' for band, n in bands.items()), file=sys.stderr)
@@ -1,45 +1,16 @@
-from tracker import Knowledge
-from boardio import print
+# ==========================================================
+#       PRINTING AND EXPORTING THE GRAPHS OF PROOFSTEPS
+# ==========================================================
 
-def _make_acyclic(step, stack, allowed_paths):
-    '''Nearly exact copy of `ProofStep._make_acyclic`. Copied here, because for graph printing we don't want to init a new `ProofStep`.
-    
-    Calculate `allowed_paths`, so for each `Deduction` check which `Consequence`s don't lead to cycles, and store them in
-    `allowed_path[ded]`, a `list`. Return `True` if `step` can be resolved. The main goal of this function is to fill `allowed_paths` and
-    make it possible for the IP solver to solve the problem properly.\\
-    Of course, this function may be used instead of `_chose_resolution_greedy()` for `k_opt==False` too, but it would not eliminate the need
-    for a separate `choose_resolution` function for that case, and would deactivate some speedups implemented in `_chose_resolution_greedy()`
-    too.\n
-    `stack` is a set of the `step`s which depend on this `step`, and are currently being processed in the recursion. `allowed_paths` is a dict
-    that assignes to resolvable `Deduction`s the `Consequences` it can use to resolve itself.'''
-    if step in stack:
-        return False
-    elif step in allowed_paths:
-        return True
-    elif isinstance(step, Knowledge):
-        return True
-    stack.add(step)
-    possibles = []
-    for cons in step.consequence_of: # iterate over all possible reasonings...
-        for info in cons.of: # if all predicates can be peacefully resolved:
-            if not _make_acyclic(info, stack, allowed_paths):
-                break
-        else:
-            possibles.append(cons)
-    stack.remove(step)
-    if len(possibles) == 0:
-        return False
-    allowed_paths[step] = possibles
-    return True
+import json
+import os.path
+from tracker import Knowledge, make_acyclic
+from boardio import print
 
 def print_graph(deductions):
     '''Prints a graph of the acyclic version of the tree grown from the roots in the set `deductions`.'''
     # >>> REMOVE CYCLES
-    allowed_paths = {} # Deduction -> list(Consequence): which Consequences may be used without causing cycles?
-    #   only contain Deductions which can be resolved; serves as a "resolved" set too
-    stack = set()
-    for ded in deductions:
-        _make_acyclic(ded, stack, allowed_paths)
+    allowed_paths, _ = make_acyclic(deductions) # Deduction -> list(Consequence): which Consequences may be used without causing cycles?
 
     # >>> PREPARAIONS
     depth = {} # Deduction -> int: how deep is this node in the BFS tree?
@@ -143,4 +114,83 @@ def print_graph(deductions):
         #  │ │││    ││ │   │
         print(''.join(base()))
     # ***
-    print(''.join(('*' if is_active[i] else ' ' for i in range(width))))
\ No newline at end of file
+    print(''.join(('*' if is_active[i] else ' ' for i in range(width))))
+
+# >>> EXPORT
+def _walk(deductions, allowed_paths):
+    '''Yields every node of the acyclic graph grown from the roots in `deductions` exactly once, each after all the nodes it depends on
+    (post-order). Unresolvable roots are skipped. Uses an explicit stack, so the depth of the graph doesn't matter.'''
+    done = set()
+    for root in deductions:
+        if root in done or root not in allowed_paths:
+            continue
+        frames = [(root, iter([info for cons in allowed_paths[root] for info in cons.of]))]
+        done.add(root)
+        while frames:
+            step, children = frames[-1]
+            for info in children:
+                if info not in done:
+                    done.add(info)
+                    if isinstance(info, Knowledge):
+                        yield info
+                    else:
+                        frames.append((info, iter([i for cons in allowed_paths[info] for i in cons.of])))
+                    break
+            else:
+                frames.pop()
+                yield step
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('"', '\\"')
+
+def write_dot(deductions, file):
+    '''Writes the acyclic graph grown from the roots in `deductions` to the open text `file` in Graphviz DOT format, in a single pass.
+    `Knowledge` instances are boxes, `Deduction`s are ellipses (the roots have double borders), and each usable `Consequence` is a point
+    joining its predicates to the `Deduction`, with the rule as the label of the edge.'''
+    allowed_paths, _ = make_acyclic(deductions)
+    ids = {} # Knowledge/Deduction -> id of the node
+    file.write('digraph proof {\n    rankdir=BT;\n    node [fontname="monospace"];\n')
+    n_cons = 0
+    for node in _walk(deductions, allowed_paths):
+        i = ids[node] = len(ids)
+        if isinstance(node, Knowledge):
+            file.write(f'    n{i} [shape=box, label="{_escape(str(node))}"];\n')
+            continue
+        border = ', peripheries=2' if node in deductions else ''
+        lines = [f'    n{i} [label="{_escape(str(node.result))}"{border}];\n']
+        for cons in allowed_paths[node]:
+            lines.append(f'    c{n_cons} [shape=point];\n    c{n_cons} -> n{i} [label="{_escape(cons.rule)}"];\n')
+            lines.extend(f'    n{ids[info]} -> c{n_cons} [arrowhead=none];\n' for info in cons.of)
+            n_cons += 1
+        file.write(''.join(lines))
+    file.write('}\n')
+
+def write_json(deductions, file):
+    '''Writes the acyclic graph grown from the roots in `deductions` to the open text `file` as JSON, in a single pass. The output is an object
+    with a `nodes` list (in an order where every node comes after the ones it depends on) and a `rules` list. Each node has an `id`, a `type`
+    (`"knowledge"` or `"deduction"`), the `fact` (class of the `Knowledge`), `position`, `value` and `label`; `Deduction`s also have `root`,
+    and `consequences`: a list of hyperedges, each with the index of its `rule` in `rules` and the ids of the nodes it is made `of`.'''
+    allowed_paths, _ = make_acyclic(deductions)
+    ids = {} # Knowledge/Deduction -> id of the node
+    rules = {} # rule -> rule id
+    file.write('{"nodes": [')
+    for node in _walk(deductions, allowed_paths):
+        i = ids[node] = len(ids)
+        fact = node if isinstance(node, Knowledge) else node.result
+        record = {'id': i, 'type': 'knowledge' if fact is node else 'deduction', 'fact': type(fact).__name__,
+            'position': list(fact.get_pos()), 'value': fact.value, 'label': str(fact)}
+        if fact is not node:
+            record['root'] = node in deductions
+            record['consequences'] = [{'rule': rules.setdefault(cons.rule, len(rules)), 'of': [ids[info] for info in cons.of]}
+                for cons in allowed_paths[node]]
+        file.write(('\n' if i == 0 else ',\n') + json.dumps(record))
+    file.write('\n], "rules": ' + json.dumps(list(rules)) + '}\n')
+
+graph_writers = {'.dot': write_dot, '.gv': write_dot, '.json': write_json} # file extension -> export function
+
+def export_graph(deductions, path):
+    '''Exports the graph of the k-optimization problem of `deductions` to the file at `path`. The format (DOT or JSON) is chosen by the
+    extension of the file (see `graph_writers`).'''
+    writer = graph_writers[os.path.splitext(path)[1].lower()]
+    with open(path, 'w', encoding='utf-8', buffering=1<<16) as file:
+        writer(deductions, file)
@@ -0,0 +1,98 @@
+# ==========================================================
+#       INTEGER PROGRAMMING BACKENDS FOR K-OPTIMIZATION
+# ==========================================================
+
+# The solver libraries are heavy to import, so they are only imported by the backend using them, the first time it is called.
+
+class Status:
+    '''Possible outcomes of solving an `IPModel`.
+    -   `OPTIMAL`:   an optimal solution was found
+    -   `FEASIBLE`:  the solver ran out of time, but found a solution (the best one found is returned)
+    -   `TIMED_OUT`: the solver ran out of time before finding any solution
+    -   `FAILED`:    the problem could not be solved for some other reason'''
+    OPTIMAL = 'optimal'
+    FEASIBLE = 'feasible'
+    TIMED_OUT = 'timed_out'
+    FAILED = 'failed'
+
+class IPModel:
+    '''A 0-1 integer program: minimize `costs`·x such that `A`·x >= `lower`. The nonzero coefficients of the constraint matrix `A` are
+    stored in coordinate format (`rows`, `cols`, `coefs` lists), so each backend can convert the model to whatever it needs.'''
+    def __init__(self):
+        self.costs = [] # objective coefficient of each variable
+        self.rows = []  # row index of each nonzero coefficient of A
+        self.cols = []  # column (variable) index of each nonzero coefficient of A
+        self.coefs = [] # value of each nonzero coefficient of A
+        self.lower = [] # lower bound of each constraint
+
+    def add_variable(self, cost=0):
+        '''Add a new binary variable with the given objective coefficient, and return its index.'''
+        self.costs.append(cost)
+        return len(self.costs) - 1
+
+    def add_constraint(self, terms, lower):
+        '''Add the constraint `sum(coef * x[var] for var, coef in terms) >= lower`.'''
+        row = len(self.lower)
+        for var, coef in terms:
+            if coef != 0:
+                self.rows.append(row)
+                self.cols.append(var)
+                self.coefs.append(coef)
+        self.lower.append(lower)
+
+# >>> BACKENDS
+# Each backend is a function `(model, time_limit) -> (status, values)`, where `values` is a sequence containing the value of each
+# variable (or `None`, if there is no solution). `time_limit` is in seconds; `None` means unlimited time.
+def solve_cbc(model, time_limit=None):
+    '''Solve `model` with PuLP using the CBC solver (in a separate process, communicating through files).'''
+    import pulp as pl # type: ignore
+    prob = pl.LpProblem(name='k-optimize')
+    variables = [pl.LpVariable(name=f'x_{i}', cat=pl.LpBinary) for i in range(len(model.costs))]
+    terms = [[] for _ in model.lower]
+    for row, col, coef in zip(model.rows, model.cols, model.coefs):
+        terms[row].append((variables[col], coef))
+    for row_terms, lower in zip(terms, model.lower):
+        if len(row_terms) > 0:
+            prob += (pl.LpAffineExpression(row_terms) >= lower)
+    prob += pl.LpAffineExpression([(variables[i], cost) for i, cost in enumerate(model.costs) if cost != 0])
+    prob.solve(pl.PULP_CBC_CMD(msg=0,timeLimit=time_limit))
+    if prob.sol_status == pl.LpSolutionOptimal:
+        status = Status.OPTIMAL
+    elif prob.sol_status == pl.LpSolutionIntegerFeasible:
+        status = Status.FEASIBLE
+    elif prob.status == pl.LpStatusNotSolved: # stopped before finding any solution
+        return Status.TIMED_OUT, None
+    else:
+        return Status.FAILED, None
+    return status, [0 if v.value() is None else v.value() for v in variables]
+
+def solve_highs(model, time_limit=None):
+    '''Solve `model` in-process with HiGHS through `scipy.optimize.milp`. The constraints are passed as a sparse matrix.'''
+    import numpy as np
+    try:
+        from scipy.optimize import milp, Bounds, LinearConstraint # type: ignore
+        from scipy.sparse import csr_matrix # type: ignore
+    except ImportError:
+        raise ImportError("The 'highs' backend requires scipy (scipy.optimize.milp).")
+    n = len(model.costs)
+    A = csr_matrix((model.coefs, (model.rows, model.cols)), shape=(len(model.lower), n))
+    options = {'disp': False}
+    if time_limit is not None:
+        options['time_limit'] = time_limit
+    res = milp(np.array(model.costs, dtype=float), integrality=np.ones(n), bounds=Bounds(0, 1),
+        constraints=LinearConstraint(A, np.array(model.lower, dtype=float), np.inf), options=options)
+    if res.status == 0:
+        return Status.OPTIMAL, res.x
+    elif res.status == 1: # time limit reached
+        return (Status.TIMED_OUT, None) if res.x is None else (Status.FEASIBLE, res.x)
+    return Status.FAILED, None
+
+def has_highs():
+    '''Whether the 'highs' backend can be used (scipy with `scipy.optimize.milp` is installed). Imports scipy.'''
+    try:
+        from scipy.optimize import milp # type: ignore # noqa
+    except ImportError:
+        return False
+    return True
+
+backends = {'cbc': solve_cbc, 'highs': solve_highs}
@@ -0,0 +1,175 @@
+# ==========================================
+#       PROFILING SOLVES
+# ==========================================
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ('deterministic', 'sampling')
+
+def frame_label(frame):
+    '''The name of the function of `frame` in the collapsed stacks and the tables: `module:qualified name`, e.g.
+    `deduction_rules:naked_pair`. (Before Python 3.11 code objects have no qualified name: the class of a method is then found from its
+    `self` or `cls` argument, and functions which are not in the globals of their module are named `<locals>.<name>`.)'''
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', None)
+    if name is None:
+        name = code.co_name
+        if code.co_argcount > 0 and code.co_varnames[0] in ('self', 'cls'):
+            owner = frame.f_locals.get(code.co_varnames[0])
+            if owner is not None:
+                name = f'{(owner if isinstance(owner, type) else type(owner)).__name__}.{name}'
+        function = frame.f_globals.get(name)
+        if '.' not in name and getattr(getattr(function, '__wrapped__', function), '__code__', None) is not code:
+            name = f'<locals>.{name}'
+    return f'{os.path.splitext(os.path.basename(code.co_filename))[0]}:{name}'
+
+def phase_of(label):
+    '''The group a function is counted in by `Profiler.by_phase()`: `rule <name>` for the deduction rules of `deduction_rules` (their
+    helper functions are counted in the rule calling them), `tracker <name>` for the phases of `ProofStep` and the functions of `tracker`
+    working on whole proof graphs (`make_acyclic`, `prune_history`, ...), and None for every other function.'''
+    module, _, name = label.partition(':')
+    if '.' in name and not name.startswith('ProofStep.'):
+        return None
+    if module == 'deduction_rules' and not name.startswith('_'):
+        return f'rule {name}'
+    if module == 'tracker':
+        return f'tracker {name}'
+    return None
+
+class Profiler:
+    '''Profiles the code run in its `with` block, recording the call stacks it spends its time in.\\
+    `'deterministic'` mode follows every call and return (through `sys.setprofile`): the time spent in each stack is exact (but every
+    call is slowed down by the profiler) and the number of calls is counted. `'sampling'` mode looks at the stack of the profiled thread
+    every `interval` seconds from a background thread: it hardly slows the solve down, but short calls may be missed. (The sampling thread
+    can only run when the profiled thread lets go of the GIL, so the switch interval of the interpreter is lowered to `interval` while
+    sampling.)\\
+    The stacks only contain the frames called from the `with` block. Their weights are microseconds in deterministic mode and numbers of
+    samples in sampling mode.'''
+    def __init__(self, mode='deterministic', interval=0.001):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', it should be one of {', '.join(MODES)}.")
+        self.mode = mode
+        self.interval = interval
+        self.stacks = Counter() # tuple of labels from the outermost call -> microseconds or samples spent in its innermost function
+        self.calls = Counter() # label -> number of calls (deterministic mode)
+        self.samples = 0
+        self.elapsed = 0
+        self._outer = None
+        self._stop = None
+        self._sampler = None
+
+    def __enter__(self):
+        self._outer = set() # the frames already running, which are not part of the profiled stacks
+        frame = sys._getframe(1)
+        while frame is not None:
+            self._outer.add(frame)
+            frame = frame.f_back
+        self._start = time.perf_counter()
+        if self.mode == 'deterministic':
+            self._paths = [()] # the call stack as tuples of labels
+            self._starts = [] # when the calls of the stack started
+            self._children = [0] # time spent in the callees of the calls of the stack
+            sys.setprofile(self._event)
+        else:
+            self._switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(self.interval, self._switch_interval))
+            self._stop = threading.Event()
+            self._sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.mode == 'deterministic':
+            sys.setprofile(None)
+            del self._paths, self._starts, self._children
+        else:
+            self._stop.set()
+            self._sampler.join()
+            sys.setswitchinterval(self._switch_interval)
+        self.elapsed = time.perf_counter() - self._start
+        self._outer = None
+        return False
+
+    def _event(self, frame, event, arg):
+        if event == 'call' or event == 'c_call':
+            label = frame_label(frame) if event == 'call' else \
+                f"{getattr(arg, '__module__', None) or 'builtins'}:{getattr(arg, '__qualname__', repr(arg))}"
+            self.calls[label] += 1
+            self._paths.append(self._paths[-1] + (label,))
+            self._children.append(0)
+            self._starts.append(time.perf_counter())
+        elif len(self._starts) > 0: # returns of calls made before the profiling started are skipped
+            elapsed = time.perf_counter() - self._starts.pop()
+            self.stacks[self._paths.pop()] += (elapsed - self._children.pop()) * 1e6
+            self._children[-1] += elapsed
+
+    def _sample(self, thread_id):
+        outer = self._outer
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if self._stop.is_set(): # the block is already over
+                break
+            stack = []
+            while frame is not None and frame not in outer:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if frame is not None and len(stack) > 0:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    # >>> RESULTS
+    def seconds(self, weight):
+        return weight / 1e6 if self.mode == 'deterministic' else weight * self.elapsed / max(self.samples, 1)
+
+    def functions(self):
+        '''Returns a `dict`: label -> `(self, total)`, the weight of the stacks ending in the function, and of the stacks containing it.'''
+        own, total = Counter(), Counter()
+        for stack, weight in self.stacks.items():
+            own[stack[-1]] += weight
+            for label in set(stack):
+                total[label] += weight
+        return {label: (own[label], total[label]) for label in total}
+
+    def by_phase(self):
+        '''The weight of the stacks grouped by the innermost deduction rule or `tracker` phase in them (see `phase_of()`), or `'other'`.'''
+        result = Counter()
+        for stack, weight in self.stacks.items():
+            phase = next(filter(None, map(phase_of, reversed(stack))), 'other')
+            result[phase] += weight
+        return result
+
+    def collapsed(self):
+        '''Yields the lines of the stacks in the collapsed ("folded") format read by flamegraph.pl, speedscope and most flame graph tools.'''
+        for stack, weight in sorted(self.stacks.items()):
+            if round(weight) > 0:
+                yield f"{';'.join(stack)} {round(weight)}\n"
+
+    def table(self, top=20, title='profile'):
+        '''Yields the lines of a report: the time of each deduction rule and `tracker` phase, then the `top` functions with the most time
+        spent in them.'''
+        total = sum(self.stacks.values()) or 1
+        count = f', {sum(self.calls.values())} calls' if self.mode == 'deterministic' else f', {self.samples} samples'
+        yield f"{title}: {self.mode}, {self.elapsed:.3f} s{count}\n"
+        yield f"\n{'time (s)':>10} {'%':>6}  rule / phase\n"
+        for phase, weight in self.by_phase().most_common():
+            yield f"{self.seconds(weight):>10.4f} {100*weight/total:>6.1f}  {phase}\n"
+        yield f"\n{'calls':>9} {'self (s)':>10} {'total (s)':>10} {'self %':>6}  function\n"
+        functions = sorted(self.functions().items(), key=lambda item: item[1][0], reverse=True)
+        for label, (own, cumulative) in functions[:top]:
+            calls = self.calls[label] if self.mode == 'deterministic' else '-'
+            yield f"{calls:>9} {self.seconds(own):>10.4f} {self.seconds(cumulative):>10.4f} {100*own/total:>6.1f}  {label}\n"
+
+    def save(self, path, top=20, title='profile'):
+        '''Writes the report of `table()` to `path`, and the collapsed stacks next to it, to the same name with the extension `.folded`.
+        (If `path` itself ends in `.folded`, the report is written to `.txt` instead.) Returns the paths of the report and of the stacks.'''
+        base, ext = os.path.splitext(path)
+        if ext.lower() == '.folded':
+            path = base + '.txt'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(self.table(top, title))
+        with open(base + '.folded', 'w', encoding='utf-8') as f:
+            f.writelines(self.collapsed())
+        return path, base + '.folded'
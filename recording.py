@@ -0,0 +1,161 @@
+# ==========================================
+#       RECORDING AND REPLAYING SESSIONS
+# ==========================================
+import gzip
+import json
+import time
+import zlib
+
+# >>> FILE FORMAT
+# A recording is a JSON lines file (gzip compressed if its name ends with '.gz'). The first line is the header:
+#   {"format": "sudoku-recording", "version": 1, "started": <unix time>, "board": <81 characters>, "options": {<option>: <value>, ...},
+#    "kopt_cache": <n>}
+# with the board and the options (see `OPTIONS`) of the sudoku, and the number of entries in the k-optimization cache when the recording
+# started (a board which is not 9×9 has 16, 256 or 625 characters, see `boardio.board_to_line()`). Every other line is a command which
+# changed the state of the sudoku or of the k-optimization cache (see `is_recorded()`), in the order they were run:
+#   [<seconds since the start>, <action>, <rname>, <data>, <result>]
+# where `action`, `rname` and `data` are what `ConsoleApp.parse()` returned for the command. The `result` is None, except for `step` and
+# `solve` commands:
+#   {"time": <seconds>, "fills": [[row, column, value, k], ...], "proof": <crc32 of the text of the new proof steps>, "missing": <n>}
+# where "missing" is the number of empty cells after the command.
+FORMAT = 'sudoku-recording'
+VERSION = 1
+OPTIONS = ('k_opt', 'ip_time_limit', 'greedy', 'reset_always', 'ignore_filled', 'time_budget', 'k_cache', 'ip_backend', 'compact_after')
+# the commands which make steps (their results are checked by the replay)
+SOLVING = {('func', r'step'), ('func', r'(?:solve)?')}
+# the commands which are recorded: besides `SOLVING`, setting variables and 'Deus Ex' steps
+RECORDED = SOLVING | {('func', r'set'), ('func', r'ban')}
+# the flag of the 'cache' command emptying the k-optimization cache (recorded without the other flags)
+CLEAR_CACHE = r'-?-?c(?:lear)?'
+# the commands which can not be replayed, because they read the sudoku or the k-optimization cache from a file: they are refused while
+# recording ((action, rname) -> the flag making them read a file)
+UNREPLAYABLE = {('func', r'session'): r'-?-?l(?:oad)?', ('func', r'cache'): r'-?-?l(?:oad)?'}
+
+def is_recorded(action, rname, data):
+    return action == 'set_var' or (action, rname) in RECORDED or ((action, rname) == ('func', r'cache') and data['flags'][CLEAR_CACHE])
+
+def is_refused(action, rname, data):
+    flag = UNREPLAYABLE.get((action, rname))
+    return flag is not None and data['flags'][flag]
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def step_result(sudoku, start, elapsed):
+    '''The `result` of a `step` or `solve` command (see the file format above) which made the steps from `sudoku.proof[start]`.'''
+    steps = sudoku.proof[start:]
+    return {
+        'time': round(elapsed, 6),
+        'fills': [[*step.position, step.value, step.k] for step in steps],
+        'proof': zlib.crc32(''.join(sudoku.iter_proof_lines(start)).encode()),
+        'missing': sudoku.missing,
+    }
+
+class Recorder:
+    '''Records the commands of an interactive session which change the state of `sudoku` to `path`, so the session can be replayed with
+    `replay()`. Each command is written (and flushed) as soon as it is finished, so the recording survives a session which is killed.'''
+    def __init__(self, sudoku, path):
+        import boardio
+        import tracker
+        self.path = path
+        self.commands = 0
+        self.start = time.time()
+        self.file = _open(path, 'w')
+        header = {'format': FORMAT, 'version': VERSION, 'started': self.start,
+            'board': boardio.board_to_line(sudoku.board),
+            'options': {option: getattr(sudoku, option) for option in OPTIONS}, 'kopt_cache': len(tracker.kopt_cache)}
+        self._write(header)
+
+    def _write(self, line):
+        self.file.write(json.dumps(line, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def run(self, sudoku, handler, action, rname, data):
+        '''Runs the command `handler(sudoku, data)`, and records it if it changes the state of the sudoku (see `is_recorded()`). The
+        commands which could not be replayed (see `is_refused()`) are not run.'''
+        if is_refused(action, rname, data):
+            from boardio import print
+            print(f"ERROR: '{rname} --load' can not be replayed, so it is not allowed while the session is recorded. Stop the "
+                "recording first with 'record --stop'.")
+            return
+        if not is_recorded(action, rname, data):
+            handler(sudoku, data)
+            return
+        recorded = data
+        if (action, rname) == ('func', r'cache'): # only the clearing is replayed, not saving the cache to a file
+            recorded = dict(data, params=dict(data['params'], file=''), flags={flag: flag == CLEAR_CACHE for flag in data['flags']})
+        at = time.time() - self.start
+        start = len(sudoku.proof)
+        timestamp = time.perf_counter()
+        try:
+            handler(sudoku, data)
+        finally:
+            elapsed = time.perf_counter() - timestamp
+            result = step_result(sudoku, start, elapsed) if (action, rname) in SOLVING else None
+            self._write([round(at, 3), action, rname, recorded, result])
+            self.commands += 1
+
+    def close(self):
+        self.file.close()
+
+def read_recording(path):
+    '''Returns the header and the list of commands of a recording.'''
+    with _open(path, 'r') as f:
+        header = json.loads(f.readline())
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            raise ValueError(f"{path} is not a session recording.")
+        if header['version'] > VERSION:
+            raise ValueError(f"{path} is a recording of version {header['version']}, only versions up to {VERSION} can be read.")
+        commands = [json.loads(line) for line in f if line.strip() != '']
+    return header, commands
+
+def replay(path):
+    '''Runs the commands of the recording `path` again on a new sudoku, without prompts, output or waiting between the commands, and
+    checks that every step and solve fills the same cells with the same values and gives the same proof. (`step` commands do not write
+    their graphs to files.) The k-optimization cache is emptied first, so the replay does not depend on earlier solves. The entries the
+    cache had when the recording started are not stored, so if it was not empty (`'warm_cache'` is True), cached proofs may have been
+    chosen over equally good ones when recording, and a k-optimized step or solve may diverge.\\
+    Returns a `dict` with\\
+    `'commands'`: a list with a `dict` for each command: its `'index'`, `'command'` (the name of the command), `'recorded'` and
+    `'replayed'` (the time of the step or solve when it was recorded and now, or None) and `'same'` (False if it diverged);\\
+    `'recorded_time'`, `'replayed_time'`: the total time of the steps and solves when recorded and now;\\
+    `'wall_time'`: the time of the whole replay;\\
+    `'diverged'`: the indices of the commands whose result is different (if one diverged, the ones after it usually do too);\\
+    `'warm_cache'`: whether the k-optimization cache was not empty when the recording started;\\
+    `'board'`: the final board.'''
+    import boardio
+    import tracker
+    from boardio import print
+    from sinks import NullSink
+    from sudoku import Sudoku, console_commands
+    from consoleapp import solve_regex
+    header, commands = read_recording(path)
+    tracker.kopt_cache.clear()
+    timestamp = time.perf_counter()
+    sudoku = Sudoku(board=boardio.init_board_from_line(header['board']), sink=NullSink(), **header['options'])
+    report = {'commands': [], 'recorded_time': 0, 'replayed_time': 0, 'diverged': [], 'warm_cache': header.get('kopt_cache', 0) > 0}
+    with print.redirect(sudoku.sink):
+        for index, (at, action, rname, data, result) in enumerate(commands):
+            handler = console_commands[action, rname]
+            if rname == 'step':
+                data = dict(data, params=dict(data['params'], file=''))
+            start = len(sudoku.proof)
+            command_start = time.perf_counter()
+            handler(sudoku, data)
+            elapsed = time.perf_counter() - command_start
+            entry = {'index': index, 'command': solve_regex(rname) + ('=' + data if action == 'set_var' else ''), 'recorded': None,
+                'replayed': None, 'same': True}
+            if result is not None:
+                replayed = step_result(sudoku, start, elapsed)
+                entry['recorded'], entry['replayed'] = result['time'], elapsed
+                entry['same'] = all(replayed[key] == result[key] for key in ('fills', 'proof', 'missing'))
+                report['recorded_time'] += result['time']
+                report['replayed_time'] += elapsed
+            if not entry['same']:
+                report['diverged'].append(index)
+            report['commands'].append(entry)
+    report['wall_time'] = time.perf_counter() - timestamp
+    report['board'] = sudoku.board
+    return report
@@ -0,0 +1,208 @@
+# ==========================================================
+#       SOLVING SERVICE WITH A POOL OF WORKER PROCESSES
+# ==========================================================
+import asyncio
+import concurrent.futures
+import json
+import os
+import sys
+from getopt import getopt
+
+# >>> PROTOCOL
+# Newline-delimited JSON over TCP or a Unix socket. Each request is one line containing an object:
+#   {"id": <anything>, "board": <81 character string or 9×9 list (or a larger board, see `boardio.init_board_from_line()`)>, "options": {<option>: <value>, ...}, "proof": <bool>, "timeout": <seconds>}
+# where the options are keyword arguments of `Sudoku` (see `SOLVE_OPTIONS`), and "timeout" limits the time of the solve. Each response is one line:
+#   {"id": <id of the request>, "status": <status>, "board": <list of lists>, "stats": {...}, "proof": <text>, "output": <text>}
+# `status` is 'solved', 'stuck' (the solver got stuck), 'contradiction' (the puzzle has no solution), 'timed_out' (the solve reached
+# its "timeout": "board" contains the cells filled until then), 'busy' (the queue of the service
+# is full, try again later) or 'error' (with an "error" message instead of the results). "proof" is only sent if it was requested, and
+# "output" only if the solver printed something. Requests on the same connection are solved concurrently, so responses may arrive in a
+# different order: they are matched by "id".
+SOLVE_OPTIONS = ('k_opt', 'ip_time_limit', 'greedy', 'reset_always', 'ignore_filled', 'time_budget', 'k_cache', 'ip_backend',
+    'compact_after')
+WARM_UP_BOARD = '008000603020009000000800450856070000004000500000060897087006000000300080203000100'
+
+def warm_up(backends=('cbc',)):
+    '''Initializer of the worker processes: imports the solver (and the libraries of the IP `backends`), and solves a puzzle, so the
+    first request a worker gets is not slowed down by imports.'''
+    import boardio
+    from sudoku import Sudoku
+    from sinks import BufferSink
+    if 'cbc' in backends:
+        import pulp # type: ignore # noqa
+    if 'highs' in backends:
+        import ipsolver
+        ipsolver.has_highs()
+    Sudoku(tuples=boardio.init_tuples_from_line(WARM_UP_BOARD), sink=BufferSink()).solve()
+
+def solve_request(request):
+    '''Solves the puzzle of one request (see the protocol above) and returns the response, without the id. Runs in a worker process.'''
+    import boardio
+    from sudoku import Sudoku
+    from sinks import BufferSink
+    from tracker import Deadline
+    options = request.get('options', {})
+    unknown = set(options) - set(SOLVE_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown solve options: {', '.join(sorted(unknown))}")
+    board = request['board']
+    output = BufferSink()
+    if isinstance(board, str):
+        sudoku = Sudoku(board=boardio.init_board_from_line(board), sink=output, **options)
+    else:
+        sudoku = Sudoku(board=board, sink=output, **options)
+    timeout = request.get('timeout')
+    sudoku.solve(deadline=Deadline(timeout) if timeout is not None else None)
+    response = {
+        'status': sudoku.status(),
+        'board': sudoku.board,
+        'stats': sudoku.statistics(),
+    }
+    if request.get('proof', False):
+        response['proof'] = ''.join(sudoku.iter_proof_lines())
+    if output.getvalue() != '':
+        response['output'] = output.getvalue()
+    return response
+
+class SolveService:
+    '''Serves solve requests with `workers` pre-warmed worker processes.\\
+    At most `workers` puzzles are solved at the same time, and at most `max_queue` more wait for a free worker; requests arriving when
+    the queue is full are answered with the status `'busy'` at once. A single connection may have at most `max_in_flight` requests being
+    solved or waiting: until one of them is answered, no more requests are read from it (so a fast client is slowed down by TCP, instead
+    of filling the memory of the service).'''
+    def __init__(self, workers=None, max_queue=64, max_in_flight=16, backends=('cbc',)):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_in_flight = max_in_flight
+        self.backends = backends
+        self.pool = None
+        self.server = None
+        self.running = 0 # requests being solved
+        self.waiting = 0 # requests waiting for a worker
+        self.served = 0
+        self._slots = None
+        self._connections = {} # handler task of each open connection -> its reader
+
+    def _start_pool(self):
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers, initializer=warm_up, initargs=(self.backends,))
+
+    async def start(self, host='127.0.0.1', port=8765, path=None):
+        '''Starts the worker processes (and waits until they are warmed up), then starts listening on the Unix socket `path`, or on
+        `host`:`port` if `path` is None.'''
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._start_pool()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, os.getpid) for _ in range(self.workers)))
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server
+
+    async def close(self):
+        '''Stops listening, closes the open connections (the requests already being solved are finished first), and stops the workers.'''
+        if self.server is not None:
+            self.server.close()
+            for reader in self._connections.values():
+                reader.feed_eof() # stop reading requests
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def serve_forever(self, host='127.0.0.1', port=8765, path=None):
+        await self.start(host, port, path)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def solve(self, request):
+        '''Solves `request` (a `dict`, see the protocol above) in a worker process and returns the response.'''
+        response = {'id': request.get('id')} if isinstance(request, dict) else {'id': None}
+        if self.waiting >= self.max_queue and self.running >= self.workers:
+            response['status'] = 'busy'
+            return response
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            if not isinstance(request, dict) or 'board' not in request:
+                raise ValueError("A request must be a JSON object with a 'board'.")
+            pool = self.pool
+            try:
+                response.update(await asyncio.get_running_loop().run_in_executor(pool, solve_request, request))
+            except concurrent.futures.process.BrokenProcessPool:
+                if self.pool is pool: # a worker died: start a new pool for the next requests
+                    pool.shutdown(wait=False)
+                    self._start_pool()
+                raise RuntimeError("The worker process solving this request died.")
+        except Exception as e:
+            response['status'] = 'error'
+            response['error'] = f'{type(e).__name__}: {e}'
+        finally:
+            self.running -= 1
+            self._slots.release()
+        self.served += 1
+        return response
+
+    async def _handle_connection(self, reader, writer):
+        self._connections[asyncio.current_task()] = reader
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        async def answer(line):
+            try:
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    response = {'id': None, 'status': 'error', 'error': f'Invalid JSON: {e}'}
+                else:
+                    response = await self.solve(request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+        try:
+            while True:
+                await in_flight.acquire()
+                line = await reader.readline()
+                if not line:
+                    in_flight.release()
+                    break
+                if line.strip() == b'':
+                    in_flight.release()
+                    continue
+                task = asyncio.create_task(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            del self._connections[asyncio.current_task()]
+
+if __name__ == "__main__":
+    _opts, args = getopt(sys.argv[1:], "hw:", ["host=", "port=", "socket=", "workers=", "queue=", "in-flight=", "backends="])
+    opts = dict(_opts)
+    if '-h' in opts:
+        print("python service.py {--host <host>} {--port <port>} {--socket <path>} {--workers <n>} {--queue <n>} {--in-flight <n>}"
+            " {--backends cbc,highs}")
+        sys.exit(0)
+    service = SolveService(workers=int(opts.get('-w', opts.get('--workers', 0))) or None, max_queue=int(opts.get('--queue', 64)),
+        max_in_flight=int(opts.get('--in-flight', 16)), backends=tuple(opts.get('--backends', 'cbc').split(',')))
+    path = opts.get('--socket')
+    where = path if path is not None else f"{opts.get('--host', '127.0.0.1')}:{opts.get('--port', 8765)}"
+    print(f"Starting {service.workers} workers, serving on {where}")
+    try:
+        asyncio.run(service.serve_forever(opts.get('--host', '127.0.0.1'), int(opts.get('--port', 8765)), path))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,255 @@
+# ==========================================================
+#       BINARY SESSION ARCHIVES
+# ==========================================================
+
+import ast
+import math
+import mmap
+import struct
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+import numpy as np
+from tracker import IsValue, MustBe, CantBe, Consequence, Deduction, ProofStep
+
+# >>> FILE FORMAT
+# A session file is a header followed by fixed-width arrays, each starting at an offset divisible by 8:
+#   starting board (81×u1), final board (81×u1), steps (n_steps×STEP_DTYPE), nodes (n_nodes×NODE_DTYPE), edges (n_edges×u2),
+#   bans (n_bans×3×u1: the row, column and value of each value banned by hand from an empty cell), string offsets ((n_strings+1)×u4),
+#   string data (utf-8)
+# Every node is a lemma of a ProofStep, in the order of `ProofStep.proof`. The edges of a Deduction are the indices (within its step) of
+# the lemmas its chosen Consequence is made of. Rules, Consequence details and the rule uses (as python literals) and the IP backend are
+# stored as strings.
+MAGIC = b'SDKS'
+VERSION = 2
+HEADER = struct.Struct('<4sHHIIIIddddddIIIIQII')
+# magic, version, option flags, n_steps, n_nodes, n_edges, n_strings, ip_time_limit, time_budget, deduction_time, k_opt_time, fill_time,
+# budget_spent, failed_solves, deus_ex_sets, ip_backend (string id), compactions, pruned_consequences, rule_uses (string id), n_bans;
+# None is stored as NaN
+STEP_DTYPE = np.dtype([('node_start', '<u4'), ('node_count', '<u4'), ('ip_time', '<f8'), ('ip_time_limit', '<f8'),
+    ('cache_saved_time', '<f8'), ('cache_hits', '<u4'), ('cache_misses', '<u4'), ('k', '<u2'), ('row', 'u1'), ('col', 'u1'),
+    ('value', 'u1'), ('flags', 'u1')])
+NODE_DTYPE = np.dtype([('edge_start', '<u4'), ('rule', '<u4'), ('details', '<u4'), ('edge_count', '<u2'), ('fact', 'u1'),
+    ('coordtype', 'u1'), ('p0', 'u1'), ('p1', 'u1'), ('value', 'u1'), ('flags', 'u1')])
+NO_STRING = 0xFFFFFFFF
+# option flags
+OPTIONS = ('k_opt', 'greedy', 'reset_always', 'ignore_filled', 'k_cache')
+# step flags
+STEP_FLAGS = ('k_opt', 'approximation', 'greedy', 'timed_out')
+# node flags
+DEDUCTION = 1
+DEUS_EX_FIRST = 2 # the first reason of the Deduction is 'deus_ex' (see `ProofStep.deus_ex_steps()`)
+FACTS = (IsValue, MustBe, CantBe)
+COORDTYPES = ('cell', 'rowpos', 'colpos', 'secpos')
+
+def _pad(n):
+    return -n % 8
+
+def _none_to_nan(x):
+    return math.nan if x is None else x
+
+def _number(x):
+    '''Converts a stored `float` back: NaN to `None`, and whole numbers to `int` (these were `int`s originally, like `ip_time_limit=10`).'''
+    x = float(x)
+    if math.isnan(x):
+        return None
+    return int(x) if x.is_integer() else x
+
+# >>> WRITING
+def save_session(sudoku, path):
+    '''Saves the starting board, the final board, the options, the statistics, the proof and the bans made by hand (see
+    `Sudoku.deus_ex_bans()`) of `sudoku` to `path` in the binary session format. Only the chosen proof of each `ProofStep` is saved, not
+    every possible reasoning. The format only stores 9×9 boards.'''
+    if sudoku.box != 3:
+        raise ValueError(f"Only 9×9 sudokus can be saved as sessions, not {sudoku.size}×{sudoku.size} ones.")
+    strings = {} # str -> string id
+    def string_id(text):
+        return strings.setdefault(text, len(strings))
+    steps = np.zeros(len(sudoku.proof), dtype=STEP_DTYPE)
+    nodes = []
+    edges = []
+    for i, step in enumerate(sudoku.proof):
+        if len(step.proof) > 0xFFFF:
+            raise ValueError(f"Proofstep #{i} is too large to be saved ({len(step.proof)} lemmas).")
+        steps[i] = (len(nodes), len(step.proof), step.ip_time, _none_to_nan(step.ip_time_limit), step.cache_saved_time,
+            step.cache_hits, step.cache_misses, step.k, step.position[0], step.position[1], step.value,
+            sum(1 << b for b, name in enumerate(STEP_FLAGS) if getattr(step, name)))
+        for lemma in step.proof:
+            fact = lemma.result if isinstance(lemma, Deduction) else lemma
+            p1 = fact.position[1] if fact.coordtype != 'secpos' else 3*fact.position[1][0] + fact.position[1][1]
+            rule = details = NO_STRING
+            flags = 0
+            edge_start = len(edges)
+            if isinstance(lemma, Deduction):
+                cons = step.chosen_reasons[lemma]
+                rule = string_id(cons.rule)
+                if cons.details is not None:
+                    details = string_id(repr(cons.details))
+                flags = DEDUCTION | (DEUS_EX_FIRST if lemma.consequence_of[0].rule == 'deus_ex' else 0)
+                edges.extend(step.proof_order[info] for info in cons.of)
+            nodes.append((edge_start, rule, details, len(edges)-edge_start, FACTS.index(type(fact)), COORDTYPES.index(fact.coordtype),
+                fact.position[0], p1, fact.value, flags))
+    rule_uses = string_id(repr(dict(sudoku.rule_uses)))
+    bans = sudoku.deus_ex_bans()
+    header = HEADER.pack(MAGIC, VERSION, sum(1 << b for b, name in enumerate(OPTIONS) if getattr(sudoku, name)), len(steps), len(nodes),
+        len(edges), len(strings)+1, _none_to_nan(sudoku.ip_time_limit), _none_to_nan(sudoku.time_budget), sudoku.deduction_time,
+        sudoku.k_opt_time, sudoku.fill_time, _none_to_nan(sudoku.budget_spent), sudoku.failed_solves, sudoku.deus_ex_sets, len(strings),
+        sudoku.compactions, sudoku.pruned_consequences, rule_uses, len(bans))
+    string_data = [text.encode('utf-8') for text in strings] + [sudoku.ip_backend.encode('utf-8')]
+    offsets = np.zeros(len(string_data)+1, dtype='<u4')
+    np.cumsum([len(b) for b in string_data], out=offsets[1:])
+    sections = [np.array(sudoku.starting_board, dtype='u1').tobytes(), np.array(sudoku.board, dtype='u1').tobytes(), steps.tobytes(),
+        np.array(nodes, dtype=NODE_DTYPE).tobytes(), np.array(edges, dtype='<u2').tobytes(), np.array(bans, dtype='u1').tobytes(),
+        offsets.tobytes(), b''.join(string_data)]
+    with open(path, 'wb') as file:
+        file.write(header + b'\0'*_pad(len(header)))
+        for section in sections:
+            file.write(section + b'\0'*_pad(len(section)))
+
+# >>> READING
+class Session:
+    '''A session archive opened through `mmap`. Only the header is parsed when opening: the arrays are read-only `numpy` views of the file,
+    and `ProofStep`s are only reconstructed when they are accessed through `proof`.\n
+    Member variables:\\
+    `starting_board`, `board`: `list` of `list`s\\
+    >   The board at the start and at the end of the session.
+    `options`: `dict`\\
+    >   The keyword arguments of the `Sudoku` constructor the session was solved with.
+    `stats`: `dict`\\
+    >   The statistics of the `Sudoku` (member name -> value).
+    `bans`: `list` of `(row, col, value)` tuples\\
+    >   The values banned by hand from the cells which were empty at the end of the session.
+    `steps`, `nodes`, `edges`: `numpy` arrays\\
+    >   The raw arrays (see `STEP_DTYPE` and `NODE_DTYPE`).
+    `proof`: `SessionProof`\\
+    >   The sequence of `ProofStep`s.'''
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, options, n_steps, n_nodes, n_edges, n_strings, ip_time_limit, time_budget, deduction_time, k_opt_time, fill_time,
+            budget_spent, failed_solves, deus_ex_sets, ip_backend, compactions, pruned_consequences, rule_uses,
+            n_bans) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a session file.")
+        if version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} has unsupported session format version {version}.")
+        offset = HEADER.size + _pad(HEADER.size)
+        def section(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes + _pad(array.nbytes)
+            return array
+        self.starting_board = section('u1', 81).reshape(9, 9).tolist()
+        self.board = section('u1', 81).reshape(9, 9).tolist()
+        self.steps = section(STEP_DTYPE, n_steps)
+        self.nodes = section(NODE_DTYPE, n_nodes)
+        self.edges = section('<u2', n_edges)
+        self.bans = [tuple(ban) for ban in section('u1', 3*n_bans).reshape(n_bans, 3).tolist()]
+        self._offsets = section('<u4', n_strings+1)
+        self._string_base = offset
+        self._strings = {} # string id -> str/details, decoded on demand
+        self.options = {name: bool(options >> b & 1) for b, name in enumerate(OPTIONS)}
+        self.options.update(ip_time_limit=_number(ip_time_limit), time_budget=_number(time_budget),
+            ip_backend=self.string(ip_backend))
+        self.stats = {'deduction_time': _number(deduction_time), 'k_opt_time': _number(k_opt_time), 'fill_time': _number(fill_time),
+            'budget_spent': _number(budget_spent), 'failed_solves': failed_solves, 'deus_ex_sets': deus_ex_sets, 'compactions': compactions,
+            'pruned_consequences': pruned_consequences, 'rule_uses': Counter(ast.literal_eval(self.string(rule_uses)))}
+        self.proof = SessionProof(self)
+
+    def string(self, i):
+        '''Returns the `i`th string of the file.'''
+        if i not in self._strings:
+            start, end = self._offsets[i:i+2].tolist()
+            self._strings[i] = self._mmap[self._string_base+start:self._string_base+end].decode('utf-8')
+        return self._strings[i]
+
+    def details(self, i):
+        '''Returns the `i`th string of the file evaluated as a python literal (the `details` of a `Consequence`).'''
+        if i == NO_STRING:
+            return None
+        key = ('details', i)
+        if key not in self._strings:
+            self._strings[key] = ast.literal_eval(self.string(i))
+        return self._strings[key]
+
+    def fills(self):
+        '''Yields the `(row, col, value)` of the cells filled during the session: first the cells filled by the proof in order, then the
+        ones set by hand.'''
+        filled = set()
+        for row, col, value in zip(self.steps['row'].tolist(), self.steps['col'].tolist(), self.steps['value'].tolist()):
+            filled.add((row, col))
+            yield row, col, value
+        for row in range(9):
+            for col in range(9):
+                if self.board[row][col] != 0 and self.starting_board[row][col] == 0 and (row, col) not in filled:
+                    yield row, col, self.board[row][col]
+
+    def load_step(self, i):
+        '''Reconstructs the `i`th `ProofStep`.'''
+        step = self.steps[i]
+        start = int(step['node_start'])
+        nodes = self.nodes[start:start+int(step['node_count'])].tolist()
+        proof = []
+        chosen_reasons = {}
+        for edge_start, rule, details, edge_count, fact, coordtype, p0, p1, value, flags in nodes:
+            coordtype = COORDTYPES[coordtype]
+            knowledge = FACTS[fact]((p0, p1) if coordtype != 'secpos' else (p0, (p1//3, p1%3)), value, coordtype)
+            if not flags & DEDUCTION:
+                proof.append(knowledge)
+                continue
+            cons = Consequence([proof[e] for e in self.edges[edge_start:edge_start+edge_count].tolist()], self.string(rule),
+                self.details(details))
+            reasons = [cons]
+            if flags & DEUS_EX_FIRST and cons.rule != 'deus_ex':
+                reasons.insert(0, Consequence([], 'deus_ex'))
+            ded = Deduction(reasons, knowledge)
+            chosen_reasons[ded] = cons
+            proof.append(ded)
+        attributes = {name: bool(step['flags'] >> b & 1) for b, name in enumerate(STEP_FLAGS)}
+        return ProofStep.restore(proof, chosen_reasons, position=(int(step['row']), int(step['col'])), value=int(step['value']),
+            k=int(step['k']), ip_time=_number(step['ip_time']), ip_time_limit=_number(step['ip_time_limit']),
+            cache_hits=int(step['cache_hits']), cache_misses=int(step['cache_misses']), cache_saved_time=_number(step['cache_saved_time']),
+            **attributes)
+
+    def close(self):
+        self.steps = self.nodes = self.edges = self._offsets = None # release the views of the mmap
+        self.proof.session = None
+        self._mmap.close()
+
+class SessionProof(Sequence):
+    '''The `ProofStep`s of a `Session`, reconstructed on access. The last `cache_size` reconstructed steps are kept. New steps can be
+    appended, so solving can be continued on a loaded session.'''
+    def __init__(self, session, cache_size=64):
+        self.session = session
+        self.archived = len(session.steps)
+        self.appended = []
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+
+    def __len__(self):
+        return self.archived + len(self.appended)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("proofstep index out of range")
+        if i >= self.archived:
+            return self.appended[i-self.archived]
+        if i in self.cache:
+            self.cache.move_to_end(i)
+        else:
+            self.cache[i] = self.session.load_step(i)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return self.cache[i]
+
+    def append(self, step):
+        self.appended.append(step)
+
+def load_session(path):
+    '''Opens the session archive at `path` (see `Session`).'''
+    return Session(path)
@@ -0,0 +1,254 @@
+# ==========================================================
+#       OUTPUT SINKS: WHERE PRINTED TEXT GOES
+# ==========================================================
+import sys
+import queue
+import threading
+import contextlib
+
+class Sink:
+    '''Something text can be printed to. Calling a sink works like `print` (with the `sep` and `end` keywords), but formats the whole
+    call into one string and hands it to `write()`, so a line costs one method call instead of a `builtins.print` round trip.\\
+    Subclasses implement `write()`, and if they buffer, `flush()` and `close()`.'''
+    def write(self, text):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def isatty(self):
+        return False
+
+    def __call__(self, *args, sep=' ', end='\n'):
+        if len(args) == 1 and type(args[0]) is str: # the usual case: a single f-string
+            self.write(args[0] + end)
+        else:
+            self.write(sep.join(map(str, args)) + end)
+
+    def writelines(self, lines):
+        '''Write the strings of the iterable `lines` (which contain their own line endings). `lines` can be a lazy generator.'''
+        for line in lines:
+            self.write(line)
+
+class ConsoleSink(Sink):
+    '''Writes straight to `stream` (default: whatever `sys.stdout` is at the time of writing, so redirections of `sys.stdout` are
+    followed). `writelines` joins the lines into chunks of about `chunk_size` characters, so there is one write per chunk.'''
+    def __init__(self, stream=None, chunk_size=1<<16):
+        self.stream = stream
+        self.chunk_size = chunk_size
+
+    def write(self, text):
+        (self.stream or sys.stdout).write(text)
+
+    def flush(self):
+        (self.stream or sys.stdout).flush()
+
+    def close(self):
+        self.flush()
+
+    def isatty(self):
+        return (self.stream or sys.stdout).isatty()
+
+    def writelines(self, lines):
+        chunk = []
+        size = 0
+        for line in lines:
+            chunk.append(line)
+            size += len(line)
+            if size >= self.chunk_size:
+                self.write(''.join(chunk))
+                chunk = []
+                size = 0
+        self.write(''.join(chunk))
+
+class BufferSink(Sink):
+    '''Collects everything in memory; `getvalue()` returns the text written so far. Useful as the sink of a single solve.'''
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def getvalue(self):
+        text = ''.join(self.parts)
+        self.parts = [text]
+        return text
+
+class NullSink(Sink):
+    '''Throws everything away, without even formatting it. For solves whose output nobody reads, such as grading.'''
+    def write(self, text):
+        pass
+
+    def __call__(self, *args, sep=' ', end='\n'):
+        pass
+
+    def writelines(self, lines):
+        pass
+
+class FileSink(Sink):
+    '''Writes to the file at `path`. Writes are collected in memory, and only written to the file once about `buffer_size` characters
+    have accumulated (and on `flush()`/`close()`). If `background` is True, the joined batches are handed to the shared
+    `BackgroundWriter` thread instead, so the solve never waits for the disk; `close()` waits until everything is written.'''
+    def __init__(self, path, buffer_size=1<<16, background=False):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.buffer_size = buffer_size
+        self.writer = background_writer() if background else None
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            data = ''.join(self.parts)
+            self.parts = []
+            self.size = 0
+            if self.writer is not None:
+                self.writer.submit(self.file, data)
+            else:
+                self.file.write(data)
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        file, self.file = self.file, None
+        if self.writer is not None:
+            self.writer.close(file)
+        else:
+            file.close()
+
+# >>> BACKGROUND WRITER
+class BackgroundWriter:
+    '''A daemon thread which writes batches of text to files. Whatever is waiting in the queue when the thread wakes up is written
+    together: consecutive batches for the same file are joined into a single write.\\
+    An error raised while writing is re-raised in the thread which next submits to or closes a file.'''
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='sink-writer', daemon=True)
+        self.thread.start()
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, file, data):
+        self._check()
+        self.queue.put((file, data, None))
+
+    def close(self, file):
+        '''Close `file` once everything submitted before is written, and wait for it.'''
+        done = threading.Event()
+        self.queue.put((file, None, done))
+        done.wait()
+        self._check()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            pending = [] # consecutive writes to the same file
+            for file, data, done in batch:
+                if pending and (done is not None or file is not pending[0][0]):
+                    self._write(pending)
+                    pending = []
+                if done is None:
+                    pending.append((file, data))
+                else:
+                    try:
+                        file.close()
+                    except Exception as e:
+                        self.error = e
+                    done.set()
+            if pending:
+                self._write(pending)
+
+    def _write(self, pending):
+        try:
+            pending[0][0].write(''.join(data for _, data in pending))
+        except Exception as e:
+            self.error = e
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def background_writer():
+    '''Returns the shared `BackgroundWriter`, starting it on first use.'''
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+        return _writer
+
+# >>> ROUTING
+class OutputRouter:
+    '''Replacement for the builtin `print`: calls are forwarded to the current sink of the calling thread, so solves running in
+    different threads can print to different places. The default sink is `console`.\\
+    `set_file()`/`reset()` switch the current thread to a file and back (closing the file they opened), and `redirect()` temporarily
+    switches to a sink owned by the caller, unless a file was chosen with `set_file()`: an explicitly chosen file always wins. If
+    `background` is True, files opened by `set_file()` are written by the background writer.'''
+    def __init__(self):
+        self.console = ConsoleSink()
+        self.background = False
+        self._local = threading.local()
+
+    @property
+    def sink(self):
+        return getattr(self._local, 'sink', self.console)
+
+    def set_file(self, path):
+        '''From now on print into this file! (None or '': print to console.)'''
+        self.reset()
+        if path is not None and path != '':
+            self._local.sink = FileSink(path, background=self.background)
+            self._local.owned = True
+
+    def reset(self):
+        '''Return to printing to the console, closing the file opened by `set_file()`, if there is one.'''
+        if getattr(self._local, 'owned', False):
+            self._local.sink.close()
+        self._local.sink = self.console
+        self._local.owned = False
+
+    @contextlib.contextmanager
+    def redirect(self, sink):
+        '''Print to `sink` inside the `with` block (in this thread). The sink is flushed, but not closed, at the end. If `sink` is None,
+        or the thread prints to a file opened by `set_file()`, nothing changes.'''
+        if sink is None or getattr(self._local, 'owned', False):
+            yield self.sink
+            return
+        previous = (self.sink, getattr(self._local, 'owned', False))
+        self._local.sink, self._local.owned = sink, False
+        try:
+            yield sink
+        finally:
+            sink.flush()
+            self._local.sink, self._local.owned = previous
+
+    def __call__(self, *args, sep=' ', end='\n', flush=False):
+        sink = self.sink
+        sink(*args, sep=sep, end=end)
+        if flush:
+            sink.flush()
+
+    def write(self, text):
+        self.sink.write(text)
+
+    def writelines(self, lines):
+        self.sink.writelines(lines)
+
+    def flush(self):
+        self.sink.flush()
@@ -3,11 +3,13 @@
 # ==========================================
 
 # standard modules
-import numpy as np
 import re
 import time
-import builtins
-import copy
+import functools
+import sys
+import contextlib
+import math
+from collections import Counter
 from sys import argv
 from getopt import getopt
 from itertools import product
@@ -19,59 +21,111 @@ import boardio
 from boardio import print
 from deduction_rules import hidden_pair, hidden_triples, naked_pair, naked_triples, only_one_value, only_this_cell, \
     line_square, square_line, ywing, xwing, swordfish, Contradiction
-from tracker import CantBe, Consequence, Deduction, IsValue, Knowledge, MustBe, ProofStep
-from graph import print_graph
+import tracker
+import ipsolver
+from tracker import CantBe, Consequence, Deduction, IsValue, Knowledge, MustBe, ProofStep, TimeBudget, Deadline, DeadlineExceeded
+from graph import print_graph, export_graph, graph_writers
+from timeline import Timeline
 from util import cell_section, local_to_global, global_to_local, diclen
 
-sudoku_app = ConsoleApp(description=f'{style.BOLD}INTERACTIVE SUDOKU SOLVER{style.UNBOLD}')
-# VARIABLES
-sudoku_app.add_variable(r'k[-_]opt(?:imi[zs]ation)?',ConsoleApp.Patterns.BOOLONOFF,
-    'Should we minimize k in the solving process?')
-sudoku_app.add_variable(r'[iI][pP][-_][tT](?:ime)?(?:[-_]?[lL]im(?:it)?)?',ConsoleApp.Patterns.FLOAT,
-    'How much time should be given to the IP solver in each iteration? Setting to non-positive values will disable the time limit.')
-sudoku_app.add_variable(r'greedy?',ConsoleApp.Patterns.BOOLONOFF,
-    '''If k-optimization is ON, should it be turned off if a cell can be filled without using intermediate steps? For example,
+@functools.lru_cache(maxsize=None)
+def sudoku_app():
+    '''Returns the `ConsoleApp` parsing the commands of `Sudoku.interactive_solve()`. It is built (and its patterns are compiled) on first
+    use, so solving without the interactive console does not pay for it.'''
+    app = ConsoleApp(description=f'{style.BOLD}INTERACTIVE SUDOKU SOLVER{style.UNBOLD}')
+    # VARIABLES
+    app.add_variable(r'k[-_]opt(?:imi[zs]ation)?',ConsoleApp.Patterns.BOOLONOFF,
+        'Should we minimize k in the solving process?')
+    app.add_variable(r'[iI][pP][-_][tT](?:ime)?(?:[-_]?[lL]im(?:it)?)?',ConsoleApp.Patterns.FLOAT,
+        'How much time should be given to the IP solver in each iteration? Setting to non-positive values will disable the time limit.')
+    app.add_variable(r'[iI][pP][-_]?[bB]ackend',r'(?:cbc|CBC|highs|HiGHS|HIGHS)',
+        '''Which IP solver should be used for k-optimization? 'cbc' runs CBC through PuLP in a separate process, 'highs' runs HiGHS in-process
+through scipy (requires scipy).''')
+    app.add_variable(r'time[-_]?budget',ConsoleApp.Patterns.FLOAT,
+        '''Total time in seconds the IP solver may use during a whole solve. It is distributed among the steps based on the size of their
+problems and the number of empty cells; 'ip-time-limit' still caps each step. Setting to non-positive values will disable the budget.''')
+    app.add_variable(r'k[-_]cache',ConsoleApp.Patterns.BOOLONOFF,
+        '''Should the results of k-optimization be cached? Structurally identical proof graphs are then only solved once by the IP solver,
+even across puzzles. See also the 'cache' command.''')
+    app.add_variable(r'greedy?',ConsoleApp.Patterns.BOOLONOFF,
+        '''If k-optimization is ON, should it be turned off if a cell can be filled without using intermediate steps? For example,
 if only one value can be written somewhere because all others are present in its row/column/section, should we immediately fill it in?
 This means a significant speedup, but may not achieve the optimal k if this optimum is below 8.\n
 If k-optimization is OFF, should we immediately fill in a cell if we deduce its content?''')
-sudoku_app.add_variable(r'reset(?:[-_]always)?',ConsoleApp.Patterns.BOOLONOFF,
-    '''After a new deduction has been made in the solving process, should we continue looking for more complicated deductions, or should we
+    app.add_variable(r'reset(?:[-_]always)?',ConsoleApp.Patterns.BOOLONOFF,
+        '''After a new deduction has been made in the solving process, should we continue looking for more complicated deductions, or should we
 immediately jump back to the simplest deductions, and look for them instead? This may or may not speed up the solving process.''')
-sudoku_app.add_variable(r'ignore(?:[-_]filled)?',ConsoleApp.Patterns.BOOLONOFF,
-    '''If a cell is filled, should we force the solver to use that as a reason to why more numbers can't be written there?
+    app.add_variable(r'ignore(?:[-_]filled)?',ConsoleApp.Patterns.BOOLONOFF,
+        '''If a cell is filled, should we force the solver to use that as a reason to why more numbers can't be written there?
 Similar to 'greedy': might make k-optimization with k<8 break, but provides a significant speedup.''')
-# FUNCTIONS
-sudoku_app.add_function(r'set',[(r'row',r'\d'),(r'col(?:umn)?',r'\d:?'),(r'val(?:ue)?',r'\d')],description=
-    '''Set the cell given by 'row' and 'column' to value 'value', if possible.''')
-sudoku_app.add_function(r'ban',[(r'cells',r'(?:\d[,;\s]*\d[,;\s]*)+:'),(r'values',r'(?:[,;\s]*\d)*')],description=
-    '''Ban from the cells given in 'cells' in the format 'cell1_row,cell1_col cell2_row,cell2_col ...:' the values given in 'values'.
+    # FUNCTIONS
+    app.add_function(r'set',[(r'row',r'\d\d?'),(r'col(?:umn)?',r'\d\d?:?'),(r'val(?:ue)?',r'\d\d?')],description=
+        '''Set the cell given by 'row' and 'column' to value 'value', if possible.''')
+    app.add_function(r'ban',[(r'cells',r'(?:\d[,;\s]*\d[,;\s]*)+:'),(r'values',r'(?:[,;\s]*\d)*')],description=
+        '''Ban from the cells given in 'cells' in the format 'cell1_row,cell1_col cell2_row,cell2_col ...:' the values given in 'values'.
 Note that there must be a separating ':' between 'cells' and 'values'.''')
-sudoku_app.add_function(r'u(?:nique)?|check_unicity',[],description=
-    '''Check whether this sudoku has a unique solution. Prints the solution if it is so, or two solutions, if it is not.''')
-sudoku_app.add_function(r'print',[(r'file',ConsoleApp.Patterns.TEXT,"")],r'-?-?r(?:aw)?',r'-?-?a(?:rray)?',r'-?-?s(?:mall)?',description=
-    '''Prints the board to the console (to a file, if a file is specified in a string). Flags:
+    app.add_function(r'u(?:nique)?|check_unicity',[],description=
+        '''Check whether this sudoku has a unique solution. Prints the solution if it is so, or two solutions, if it is not.''')
+    app.add_function(r'print',[(r'file',ConsoleApp.Patterns.TEXT,"")],r'-?-?r(?:aw)?',r'-?-?a(?:rray)?',r'-?-?s(?:mall)?',description=
+        '''Prints the board to the console (to a file, if a file is specified in a string). Flags:
 --raw:   print only the numbers which are filled in, with 0 for empty cells, no superfluous characters
 --array: print the Sudoku.board array in a python array-style
 --small: the sudoku will be pretty printed, but only the filled in values are shown''')
-sudoku_app.add_function(r'proof',[(r'slice',r'\d*\s*:\s*\d*',':'),(r'file',ConsoleApp.Patterns.TEXT,"")],
-    r'-?-?r(?:ef(?:erence)?)?',r'-?-?[Ii](?:s[Vv]alue)?',description=
-    '''Prints the proof constructed so far to the console (or the given file, e.g. "proof.txt"). A 'slice' is a start:end slice notation,
+    app.add_function(r'proof',[(r'slice',r'\d*\s*:\s*\d*',':'),(r'file',ConsoleApp.Patterns.TEXT,"")],
+        r'-?-?r(?:ef(?:erence)?)?',r'-?-?[Ii](?:s[Vv]alue)?',description=
+        '''Prints the proof constructed so far to the console (or the given file, e.g. "proof.txt"). A 'slice' is a start:end slice notation,
 where either or both arguments may be omitted: if this is given, only these proof steps will be printed.''')
-sudoku_app.add_function(r'play(?:back)?',[],description=
-    '''Enter a playback mode of the proof so far. Individual ProofSteps and their lemmas can be explored with the current states of the
+    app.add_function(r'play(?:back)?',[],description=
+        '''Enter a playback mode of the proof so far. Individual ProofSteps and their lemmas can be explored with the current states of the
 board always shown.''')
-sudoku_app.add_function(r'stat(?:istic)?s?',[(r'file',ConsoleApp.Patterns.TEXT,"")],description=
-    '''Prints some detailed statistics about the solving process so far, such as total runtime.''')
-sudoku_app.add_function(r'origin(?:al)?|og?|puzzle',[],description=
-    '''Prints the original puzzle to the console.''')
-sudoku_app.add_function(r'export',[(r'file',ConsoleApp.Patterns.TEXT)],
-    r'-?-?n(?:ostats?)?',r'-?-?r(?:aw)?',r'-?-?a(?:rray)?',r'-?-?r(?:ef(?:erence)?)?',r'-?-?[Ii](?:s[Vv]alue)?',description=
-    '''Prints information about this session to a file. If --nostats is enabled, statistics will not be printed.''')
-sudoku_app.add_function(r'step',[(r'n',ConsoleApp.Patterns.UINT,'1'),(r'file',ConsoleApp.Patterns.TEXT,'')],r'-?-?graph',r'-?-?proof',description=
-    '''Fill a cell 'n' times. If the '--graph' flag is enabled, print a graph of k-optimization problem in each step to
-'file' (if it is not specified, to the console). If the '--proof' flag is enabled, the ProofStep of the current steps will be printed.''')
-sudoku_app.add_function(r'',[],description=
-    '''Attempts to solve the sudoku from this state.''')
+    app.add_function(r'stat(?:istic)?s?',[(r'file',ConsoleApp.Patterns.TEXT,"")],description=
+        '''Prints some detailed statistics about the solving process so far, such as total runtime.''')
+    app.add_function(r'origin(?:al)?|og?|puzzle',[],description=
+        '''Prints the original puzzle to the console.''')
+    app.add_function(r'export',[(r'file',ConsoleApp.Patterns.TEXT)],
+        r'-?-?n(?:ostats?)?',r'-?-?r(?:aw)?',r'-?-?a(?:rray)?',r'-?-?r(?:ef(?:erence)?)?',r'-?-?[Ii](?:s[Vv]alue)?',description=
+        '''Prints information about this session to a file. If --nostats is enabled, statistics will not be printed.''')
+    app.add_function(r'step',[(r'n',ConsoleApp.Patterns.UINT,'1'),(r'file',ConsoleApp.Patterns.TEXT,'')],r'-?-?graph',r'-?-?proof',description=
+        '''Fill a cell 'n' times. If the '--graph' flag is enabled, print a graph of k-optimization problem in each step to
+'file' (if it is not specified, to the console). If 'file' ends with '.dot', '.gv' or '.json', the graph of each step is exported in that
+format to a separate file instead of being drawn. If the '--proof' flag is enabled, the ProofStep of the current steps will be printed.''')
+    app.add_function(r'cache',[(r'file',ConsoleApp.Patterns.TEXT,'')],r'-?-?s(?:ave)?',r'-?-?l(?:oad)?',r'-?-?c(?:lear)?',description=
+        '''Manage the cache of k-optimization results. With '--save' or '--load' the cache is saved to/loaded from 'file', with '--clear'
+it is emptied. Without flags, the number of cached results is printed.''')
+    app.add_function(r'session',[(r'file',ConsoleApp.Patterns.TEXT)],r'-?-?s(?:ave)?',r'-?-?l(?:oad)?',description=
+        '''Save this session to 'file' in a compact binary format with '--save', or continue an archived session from 'file' with '--load'
+(its proof, statistics and playback are available without solving again). Without flags, a summary of the archived session is printed.''')
+    app.add_function(r'trace',[(r'file',ConsoleApp.Patterns.TEXT,'')],r'-?-?stop',description=
+        '''Record where the following solves and steps spend their time: the calls of the deduction rules, the phases of the ProofSteps
+(acyclic pass, cache lookup, IP build and solve, topological ordering), the fills and compactions, and the number of FillImmediately and
+ResetDeductionSearch exceptions. The trace is written to 'file' in the Chrome trace-event format (open it in chrome://tracing or
+https://ui.perfetto.dev) on '--stop', or when the session ends.''')
+    app.add_function(r'prof(?:ile)?',[(r'file',ConsoleApp.Patterns.TEXT,''),(r'top',ConsoleApp.Patterns.UINT,'20')],
+        r'-?-?s(?:ampl(?:e|ing))?',r'-?-?c(?:ancel)?',description=
+        '''Profile the next solve or 'step n' command. The time spent in each deduction rule and tracker phase, and the 'top' functions
+with the most time spent in them are printed to 'file', and the call stacks to the same name with the extension '.folded' (the collapsed
+format of flame graph tools such as flamegraph.pl or speedscope). Every call is followed by default, with '--sampling' the stack is only
+sampled every millisecond, which slows the solve down much less. '--cancel' cancels a profile which has not started yet.''')
+    app.add_function(r'rec(?:ord)?',[(r'file',ConsoleApp.Patterns.TEXT,'')],r'-?-?stop',description=
+        '''Record the commands which change the state of the sudoku from now on (setting variables, 'set', 'ban', 'step', solves and
+'cache --clear') to 'file' (compressed if it ends with '.gz'), with their timestamps and results. The recording can be replayed with
+'python benchmark.py replay <file>', which checks that the steps come out the same. 'session --load' and 'cache --load' can not be
+replayed, so they are refused while recording. '--stop' ends the recording.''')
+    app.add_function(r'(?:solve)?',[],description=
+        '''Attempts to solve the sudoku from this state. (An empty line does the same.)''')
+    return app
+
+# the rules finding cells which can be filled, applied first in each round of deductions
+SINGLE_RULES = (only_one_value, only_this_cell)
+# the deduction rules which are applied in a loop while they find something new (after `SINGLE_RULES`), from the simplest to the hardest
+DEDUCTION_RULES = (naked_pair, naked_triples, hidden_pair, hidden_triples, square_line, line_square, xwing, ywing, swordfish)
+
+@functools.lru_cache(maxsize=None)
+def empty_diclens(box):
+    '''The empty `diclen`s of a cell, a line (row or column) and a section of a board with `box`×`box` sections, which are copied when a
+    new board is created.'''
+    size = box*box
+    return diclen(range(1,size+1)), diclen(range(size)), diclen(((i,j) for i in range(box) for j in range(box)))
 
 class FillImmediately(Exception):
     def __init__(self, deduction):
@@ -79,51 +133,117 @@ class FillImmediately(Exception):
 class ResetDeductionSearch(Exception):
     pass
 
+_no_span = contextlib.nullcontext() # Sudoku._span() when tracing is off
+
+console_commands = {} # (action, rname) pair returned by sudoku_app() -> method of Sudoku handling it in interactive_solve()
+
+def console_command(action, rname):
+    '''Decorator registering a method of `Sudoku` in `console_commands` as the handler of `action` on `rname`. The method is called with
+    the `data` returned by the parser.'''
+    def register(method):
+        console_commands[action, rname] = method
+        return method
+    return register
+
+def to_own_sink(method):
+    '''Decorator for the methods of `Sudoku` which print: while they run, `print` writes to the sink of the sudoku, if it has one.'''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with print.redirect(self.sink):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class Sudoku:
-    '''A class representing a 9×9 sudoku board. Capable of solving the sudoku. Contains large amounts of helper data.'''
+    '''A class representing a sudoku board (9×9, or 4×4 to 25×25, see `box`). Capable of solving the sudoku. Contains large amounts of helper data.'''
 
     # >>> DATA MANIPULATION
-    def __init__(self, board=None, tuples=None, k_opt=False, ip_time_limit=10, greedy=True, reset_always=False, ignore_filled=False):
+    def __init__(self, board=None, tuples=None, k_opt=False, ip_time_limit=10, greedy=True, reset_always=False, ignore_filled=False,
+        time_budget=None, k_cache=True, ip_backend='cbc', sink=None, compact_after=4096, box=None):
         '''Initialize a sudoku either with:\n
         `board`: `list` of `list`s\\
         >   A matrix representation of the sudoku table, with 0s in empty cells.
         `tuples`: `Iterable` of `(row, column, value)` tuples\\
         >   An `Iterable` containing an entry for each filled cell of the board.\n
+        `board` may also be a 9×9 numpy array, such as a row of the array returned by `boardio.decode_puzzles()`.\\
+        `box`: `int`\\
+        >   The size of the sections: the board has `box*box` rows, columns and values (2: 4×4, 3: 9×9, 4: 16×16, 5: 25×25). By default
+        it is found from the size of `board`, or 3 if the board is given by `tuples`.\\
+        `sink`: `sinks.Sink`\\
+        >   If given, everything this sudoku prints while solving or printing its proof, stats or status goes here, instead of the current
+        sink of `print`. This keeps the output of solves running in parallel apart.\\
+        `compact_after`: `int`\\
+        >   After a cell is filled, the proof graph is compacted (see `compact()`) if at least this many deductions were made since the last
+        compaction (0: after every fill, None: never).\\
         The other variables are default values of their respective variables.'''
         if tuples is not None:
             pass
+        elif 'numpy' in sys.modules and isinstance(board, sys.modules['numpy'].ndarray): # (numpy is imported only when it is used)
+            tuples = boardio.init_tuples_from_numpy(board)
         elif board is not None:
             tuples = boardio.init_tuples_from_array(board)
         else:
             raise ValueError("'board' or 'tuples' must be given in the contructor.")
-        # cell-based variables:
-        self.board=[[0 for _ in range(9)] for _ in range(9)] # the board containing the filled in values and 0 in the empty cells
-        self.allowed=[[diclen(range(1,10)) for _ in range(9)] for _ in range(9)] # values which can be still written here
-        # position-based variables:
-        self.rowpos=[[diclen() for _ in range(9)] for _ in range(9)] # j. sorban az i hova mehet meg
-        self.colpos=[[diclen() for _ in range(9)] for _ in range(9)] # j. oszlopban az i hova mehet meg
-        self.secpos=[[diclen(((i,j) for i in range(3) for j in range(3))) for _ in range(9)] for _ in range(9)] # az adott sectionben az adott szám hova mehet
-        # proof storage
-        self.missing = 9*9
-        self.proof = []
-        self.filler_deductions = set()
+        if box is None:
+            box = math.isqrt(len(board)) if board is not None else 3
+        if not 2 <= box <= 5 or (board is not None and len(board) != box*box):
+            raise ValueError("A board must have 4, 9, 16 or 25 rows, with sections of 2×2 to 5×5 cells.")
+        self.box = box # the size of the sections
+        self.size = size = box*box # the number of rows, columns and values
+        self._init_board()
         # bools:
         self.k_opt = k_opt
         self.ip_time_limit = ip_time_limit
+        self.time_budget = time_budget
+        self.k_cache = k_cache
+        self.ip_backend = ip_backend
         self.greedy = greedy
         self.reset_always = reset_always
         self.ignore_filled = ignore_filled
-        # stats:
+        self.sink = sink
+        self.compact_after = compact_after
+        self._init_stats()
+        # init
+        for row, col, val in tuples:
+            self[row, col] = val
+        self.starting_board = [[self.board[i][j] for j in range(size)] for i in range(size)]
+        self.contradictory=False
+        self.timed_out = False # did the last solve stop at its deadline?
+        self.deadline = None # the Deadline of the step being solved, checked by the deduction rules through checkpoint()
+        self._events = None # events collected for iter_solve() (None if nobody listens)
+        self.tracer = None # the tracing.Tracer recording the solves, if they are traced (see start_trace())
+        self.recorder = None # the recording.Recorder recording the commands of interactive_solve(), if they are recorded
+        self.next_profile = None # (path, mode, top) of the profile of the next solve or step, if it is profiled (see profile_next())
+
+    def _init_board(self):
+        '''Empties the board, the helper data and the proof storage.'''
+        box, size = self.box, self.size
+        empty_cell, empty_line, empty_section = empty_diclens(box)
+        # cell-based variables:
+        self.board=[[0 for _ in range(size)] for _ in range(size)] # the board containing the filled in values and 0 in the empty cells
+        self.allowed=[[empty_cell.copy() for _ in range(size)] for _ in range(size)] # values which can be still written here
+        self.candidates=[[(1 << size+1) - 2 for _ in range(size)] for _ in range(size)] # the same as a bitset: bit v is set if v is allowed
+        # position-based variables:
+        self.rowpos=[[empty_line.copy() for _ in range(size)] for _ in range(size)] # j. sorban az i hova mehet meg
+        self.colpos=[[empty_line.copy() for _ in range(size)] for _ in range(size)] # j. oszlopban az i hova mehet meg
+        self.secpos=[[empty_section.copy() for _ in range(size)] for _ in range(size)] # az adott sectionben az adott szám hova mehet
+        # proof storage
+        self.missing = size*size
+        self.proof = []
+        self.filler_deductions = {} # Deduction -> None: the deductions filling a cell, in the order they were made (a set would iterate
+        # them in the order of their ids, which would make ties between equally good steps depend on memory addresses)
+
+    def _init_stats(self):
+        '''Resets the statistics.'''
         self.deduction_time = 0
         self.k_opt_time = 0
         self.fill_time = 0
         self.failed_solves = 0
         self.deus_ex_sets = 0
-        # init
-        for row, col, val in tuples:
-            self[row, col] = val
-        self.starting_board = [[self.board[i][j] for j in range(9)] for i in range(9)]
-        self.contradictory=False
+        self.rule_uses = Counter() # name of deduction rule -> how many times it found something new
+        self.compactions = 0
+        self.pruned_consequences = 0
+        self._graph_growth = 0 # deductions made since the last compaction
+        self.budget_spent = None # time spent from the budget of the last budgeted solve
 
     def __setitem__(self, key, val):
         '''Fill in the given cell with the given value.\\
@@ -135,40 +255,95 @@ class Sudoku:
         col = key[1]
         self.board[row][col]=val
         im_filled = IsValue((row, col), val)
+        box, size = self.box, self.size
+        sec = cell_section(row,col,box)
         # stop tracking this value
-        for i in range(9):
+        for i in range(size):
             self.rowpos[row][val-1][i] = im_filled
             self.colpos[col][val-1][i] = im_filled
-            self.secpos[cell_section(row,col)][val-1][(i//3,i%3)] = im_filled
+            self.secpos[sec][val-1][(i//box,i%box)] = im_filled
         # no more values can be written this position...
-        for i in range(1, 10):
+        for i in range(1, size+1):
            self.allowed[row][col][i] = im_filled
-        for i in range(9): # ...in this 3×3 section
-            self.secpos[cell_section(row,col)][i][global_to_local(row, col)] = im_filled
-        for i in range(9): # ...in this row and column
+        self.candidates[row][col] = 0
+        for i in range(size): # ...in this section
+            self.secpos[sec][i][global_to_local(row, col, box)] = im_filled
+        for i in range(size): # ...in this row and column
             self.rowpos[row][i][col] = im_filled
             self.colpos[col][i][row] = im_filled
 
         # this value can't be written anymore...
         #   ...in this row, column and section:
-        for i in range(9):
+        bit = ~(1 << val)
+        for i in range(size):
             self.allowed[i][col][val] = im_filled
             self.allowed[row][i][val] = im_filled
-            p = local_to_global(cell_section(row, col),i//3,i%3)
+            self.candidates[i][col] &= bit
+            self.candidates[row][i] &= bit
+            p = local_to_global(sec,i//box,i%box,box)
             self.allowed[p[0]][p[1]][val] = im_filled
+            self.candidates[p[0]][p[1]] &= bit
         #   ...in certain positions in other rows/columns:
-        for i in range(9):
+        for i in range(size):
             self.rowpos[i][val-1][col] = im_filled
             self.colpos[i][val-1][row] = im_filled
         #   ...in certain positions in other secs:
-        for i in range(9):
-            self.secpos[cell_section(i,col)][val-1][global_to_local(i,col)] = im_filled
-        for i in range(9):
-            self.secpos[cell_section(row,i)][val-1][global_to_local(row,i)] = im_filled
+        for i in range(size):
+            self.secpos[cell_section(i,col,box)][val-1][global_to_local(i,col,box)] = im_filled
+        for i in range(size):
+            self.secpos[cell_section(row,i,box)][val-1][global_to_local(row,i,box)] = im_filled
 
     def __getitem__(self, key):
         return self.board[key[0]][key[1]]
 
+    def load_session(self, path):
+        '''Replace the state of this sudoku with the session archived at `path` (see `session.py`): its board, options, statistics, proof and
+        the values banned by hand from empty cells. The board is refilled in the order of the proof, but the `ProofStep`s are only read from
+        the file when they are needed. The sink, the tracer, the recorder and the next profile of this sudoku are kept.'''
+        from session import load_session
+        session = load_session(path)
+        self.close_session()
+        self.box, self.size = 3, 9 # (sessions only store 9×9 boards)
+        self._init_board()
+        self._init_stats()
+        for row, col in product(range(9), range(9)):
+            if session.starting_board[row][col] != 0:
+                self[row, col] = session.starting_board[row][col]
+        self.starting_board = [row.copy() for row in session.starting_board]
+        for row, col, value in session.fills():
+            self[row, col] = value
+        self.reset_always = False # (set with the options below: restoring the bans must not restart a deduction search)
+        for row, col, value in session.bans:
+            self.ban(row, col, value, 'deus_ex', [])
+        for name, value in session.options.items():
+            setattr(self, name, value)
+        for name, value in session.stats.items():
+            setattr(self, name, value)
+        self.proof = session.proof
+        self.contradictory = False
+        self.timed_out = False
+
+    def close_session(self):
+        '''Closes the session archive the proof of this sudoku was loaded from (see `load_session()`), if there is one. The archived steps of
+        the proof are dropped, the steps made since loading are kept.'''
+        session = getattr(self.proof, 'session', None)
+        if session is not None:
+            self.proof = list(self.proof.appended)
+            session.close()
+
+    def deus_ex_bans(self):
+        '''Returns the `(row, col, value)` of the values banned by hand (see the `ban` command) from the cells which are still empty.'''
+        return [(row, col, value) for row in range(self.size) for col in range(self.size) if self.board[row][col] == 0
+            for value, info in self.allowed[row][col].items()
+            if isinstance(info, Deduction) and any(cons.rule == 'deus_ex' for cons in info.consequence_of)]
+
+    @classmethod
+    def from_session(cls, path):
+        '''Create a sudoku from the session archived at `path`.'''
+        sud = cls(tuples=[])
+        sud.load_session(path)
+        return sud
+
     # >>> STORING DEDUCTIONS
     def make_deduction(self, knowledge, rule, reasons=None, details=None):
         '''Store a deduction which yields `knowledge` applying `rule` to `Knowlegde` instances `reasons`.\\
@@ -177,13 +352,14 @@ class Sudoku:
         if self.board[p[0]][p[1]] != 0:
             return False
         cons = Consequence(reasons, rule, details)
+        self._graph_growth += 1
         if isinstance(knowledge, MustBe):
             for ded in self.filler_deductions: # if this deduction was already made, save this as an alternative proof
                 if ded.result == knowledge:
                     return ded.add_reason(cons)
             # if this deduction has not been made yet, create and save it!
             d = Deduction([cons], knowledge)
-            self.filler_deductions.add(d)
+            self.filler_deductions[d] = None
             # STREAMLINE
             if self.greedy:
                 if self.k_opt: # if all the reasons are Knowledges, fill in the cell
@@ -228,6 +404,7 @@ class Sudoku:
         k = deduction.result
         if k.coordtype == "cell":
             self.allowed[k.position[0]][k.position[1]][k.value] = deduction
+            self.candidates[k.position[0]][k.position[1]] &= ~(1 << k.value)
         elif k.coordtype == "rowpos":
             self.rowpos[k.position[0]][k.value-1][k.position[1]] = deduction
         elif k.coordtype == "colpos":
@@ -236,238 +413,726 @@ class Sudoku:
             self.secpos[k.position[0]][k.value-1][k.position[1]] = deduction
 
     # >>> SOLVERS
-    def solve_step(self, graph=False):
+    @to_own_sink
+    def solve_step(self, graph=False, budget=None, deadline=None):
         '''Attempts to fill a single cell of the sudoku using a fixed set of deductions. Return `True` if the sudoku is complete, `False` if
-        the filling attempt failed, and `None` otherwise. If `graph` is True, a graph of the k-optimization problem will be printed using `print`.'''
+        the filling attempt failed, and `None` otherwise. If `graph` is True, a graph of the k-optimization problem will be printed using `print`;
+        if it is a file name, the graph will be exported there instead (see `graph.export_graph`).
+        `budget` is the `TimeBudget` of the solve this step is part of, if there is one.\\
+        If `deadline` (a `tracker.Deadline`) expires (or is cancelled) while deductions are made, the step stops, `timed_out` is set, and
+        `False` is returned. The deductions made so far are kept, so the step can be attempted again later.'''
+        step = self._iter_step(graph, budget, deadline)
+        while True: # (the step only pauses if events are collected by iter_solve)
+            try:
+                next(step)
+            except StopIteration as stop:
+                return stop.value
+
+    def _iter_step(self, graph, budget, deadline):
+        '''Generator making a step like `solve_step()`, whose answer is its return value. It pauses after each rule which found something,
+        if there are events to be streamed (see `iter_solve()`).'''
         if self.missing == 0:
             return True
+        self.timed_out = False
+        self.deadline = deadline
+        tracer = self.tracer
+        start = tracer.clock() if tracer is not None else 0
+        try:
+            return (yield from self._step_deductions(graph, budget, deadline))
+        except DeadlineExceeded:
+            self.timed_out = True
+            if self._events is not None:
+                self._events.append({'event': 'timed_out'})
+            return False
+        finally:
+            self.deadline = None
+            if tracer is not None:
+                tracer.complete('step', 'step', start, {'missing': self.missing})
+
+    def _apply_rule(self, rule):
+        '''Calls `rule`, recording it as a span if the solve is traced.'''
+        tracer = self.tracer
+        if tracer is None:
+            return rule(self)
+        calls = self._graph_growth
+        start = tracer.clock()
+        found = False
+        try:
+            found = rule(self)
+            return found
+        except (FillImmediately, ResetDeductionSearch) as e:
+            found = True
+            tracer.count(type(e).__name__)
+            raise
+        finally:
+            tracer.complete(rule.__name__, 'rule', start, {'make_deduction': self._graph_growth - calls, 'found': bool(found)})
+
+    def _rule_fired(self, rule):
+        self.rule_uses[rule.__name__] += 1
+        if self._events is not None:
+            self._events.append({'event': 'rule', 'rule': rule.__name__})
+
+    def _step_deductions(self, graph, budget, deadline):
+        tracer = self.tracer
         timestamp = time.time()
+        start = tracer.clock() if tracer is not None else 0
         made_deduction = True
         greedy_deduction = None
         # MAKE DEDUCTIONS WHILE POSSIBLE
         while made_deduction:
+            rule = None # the rule being applied
             try:
                 made_deduction = False
-                only_one_value(self)
-                only_this_cell(self)
-                made_deduction |= naked_pair(self)
-                made_deduction |= naked_triples(self)
-                made_deduction |= hidden_pair(self)
-                made_deduction |= hidden_triples(self)
-                made_deduction |= square_line(self)
-                made_deduction |= line_square(self)
-                made_deduction |= xwing(self)
-                made_deduction |= ywing(self)
-                made_deduction |= swordfish(self)
+                self.checkpoint()
+                for rule in SINGLE_RULES:
+                    if self._apply_rule(rule):
+                        self._rule_fired(rule)
+                for rule in DEDUCTION_RULES:
+                    self.checkpoint()
+                    if self._apply_rule(rule):
+                        self._rule_fired(rule)
+                        made_deduction = True
+                        if self._events:
+                            yield
+            except DeadlineExceeded:
+                self.deduction_time += time.time() - timestamp
+                raise
             except FillImmediately as f:
+                self._rule_fired(rule)
                 greedy_deduction = f.deduction
                 made_deduction = False
             except ResetDeductionSearch:
+                self._rule_fired(rule)
                 made_deduction = True
             except Contradiction as c:
                 print(f"{fclr.RED}===============ERROR:Sudoku does not have solution, reason: {c.message}==============={fclr.DEFAULT}")
                 self.contradictory = True
+                if self._events is not None:
+                    self._events.append({'event': 'contradiction', 'message': c.message})
                 return False
+            if self._events:
+                yield
 
         self.deduction_time += time.time() - timestamp
         timestamp = time.time()
+        if tracer is not None:
+            tracer.complete('deductions', 'step', start, {'filler_deductions': len(self.filler_deductions)})
         # EXIT IF NECESSARY
         if len(self.filler_deductions) == 0:
             self.failed_solves += 1
+            if self._events is not None:
+                self._events.append({'event': 'stalled'})
             return False
         # DECIDE HOW TO PROVE THIS STEP
-        if graph:
+        if graph is True:
             print_graph(self.filler_deductions)
-        proofstep = ProofStep(self.filler_deductions, self.k_opt, self.ip_time_limit, greedy_deduction)
+        elif graph:
+            export_graph(self.filler_deductions, graph)
+        start = tracer.clock() if tracer is not None else 0
+        proofstep = ProofStep(self.filler_deductions, self.k_opt, self.ip_time_limit, greedy_deduction, budget, self.missing,
+            tracker.kopt_cache if self.k_cache else None, self.ip_backend, deadline, tracer)
         self.proof.append(proofstep)
         self.k_opt_time += time.time() - timestamp
         timestamp = time.time()
+        if tracer is not None:
+            tracer.complete('ProofStep', 'step', start, {'k': proofstep.k, 'k_opt': proofstep.k_opt, 'greedy': proofstep.greedy})
+            start = tracer.clock()
         # FILL THE SELECTED CELL
         self[proofstep.position] = proofstep.value
+        if tracer is not None:
+            tracer.complete('fill', 'step', start, {'cell': proofstep.position, 'value': proofstep.value})
+        if self.compact_after is not None and self._graph_growth >= self.compact_after:
+            self.compact()
         self.fill_time += time.time() - timestamp
+        if self._events is not None:
+            self._events.append({'event': 'step', 'index': len(self.proof)-1, 'cell': proofstep.position, 'value': proofstep.value,
+                'k': proofstep.k, 'k_opt': proofstep.k_opt, 'greedy': proofstep.greedy})
         if self.missing == 0:
             return True
         return None
 
-    def solve(self): # TODO: shortcut in case of k_opt==False?
+    @to_own_sink
+    def solve(self, deadline=None): # TODO: shortcut in case of k_opt==False?
         '''Attempts to solve this sudoku only using a fixed set of deductions. Return `True` if the sudoku has been solved, and `False` if the
-        solve failed.'''
+        solve failed. If `time_budget` is set, k-optimization will use at most this much time over the whole solve.\\
+        `deadline` is a `tracker.Deadline`, or a number of seconds: if it expires (or is cancelled), the solve stops with the cells filled so
+        far, returning `False` with `timed_out` set (see `status()`).'''
+        if deadline is not None and not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        budget = TimeBudget(self.time_budget) if self.time_budget is not None and self.k_opt else None
         answer = None
-        while answer is None:
-            answer = self.solve_step()
+        with self._span('solve', 'solve'):
+            while answer is None:
+                answer = self.solve_step(budget=budget, deadline=deadline)
+        if budget is not None:
+            self.budget_spent = budget.total - budget.remaining()
         return answer
 
-    def interactive_solve(self):
-        '''Interactive solver tool. Type `'h'` or `'help'` for help.'''
-        print(f"{fclr.RED+style.BOLD}   INTERACTIVE SOLVER STARTED  {fclr.ENDC}")
-        print(style.BOLD, end='')
-        boardio.print_board(self.board)
-        print(style.UNBOLD, end='')
-        for action, rname, data in sudoku_app:
-            if action == 'func' and rname == "step":
-                file = ConsoleApp.get_text(data['params']['file'])
-                base, ext = os.path.splitext(file)
-                if file != '':
-                    if data['flags'][r'-?-?graph']:
-                        print(f"Printing graphs to file {base+'(i)'+ext}.")
-                    else:
-                        print("WARNING: '--graph' flag is OFF, no graph printing will happen.")
-                for i in range(int(data['params']['n'])):
-                    print.set_file((base+f'({i})'+ext) if file != '' else '')
+    def _iter_event_batches(self, deadline):
+        '''Generator solving like `solve()`, and yielding the `list`s of events collected between the pauses of the steps.'''
+        if deadline is not None and not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        budget = TimeBudget(self.time_budget) if self.time_budget is not None and self.k_opt else None
+        self._events = []
+        step = None
+        try:
+            answer = None
+            while answer is None:
+                step = self._iter_step(False, budget, deadline)
+                stepping = True
+                while stepping:
+                    try:
+                        with print.redirect(self.sink): # only while solving: the consumer prints wherever it wants
+                            next(step)
+                    except StopIteration as stop:
+                        answer = stop.value
+                        stepping = False
+                    if self._events:
+                        batch, self._events = self._events, []
+                        yield batch
+            if budget is not None:
+                self.budget_spent = budget.total - budget.remaining()
+            if answer:
+                yield [{'event': 'solved'}]
+        finally:
+            if step is not None:
+                step.close() # the iteration was stopped during a step
+            self._events = None
+
+    def iter_solve(self, deadline=None):
+        '''Solves like `solve()`, but as a generator yielding events (`dict`s) while the solve is running. The `'event'` of each is\\
+        `'ban'`: a value was banned from a cell (`'rule'`, `'cell'`, `'value'`; `rule` is the name used in the proof);\\
+        `'rule'`: a deduction rule found something new (`'rule'`: the name of its function in `deduction_rules`; after its bans);\\
+        `'step'`: a cell was filled (`'index'` of the `ProofStep` in `proof`, `'cell'`, `'value'`, `'k'`, `'k_opt'`, `'greedy'`);\\
+        `'stalled'`, `'contradiction'` (with a `'message'`), `'timed_out'` or `'solved'`: the solve ended (see `status()`).\n
+        Events are yielded as soon as the rule finding them returns, so the first ones arrive long before the solve ends. Stopping the
+        iteration (e.g. `break`) stops the solve; it can be continued later.'''
+        for batch in self._iter_event_batches(deadline):
+            yield from batch
+
+    async def aiter_solve(self, deadline=None):
+        '''Asynchronous version of `iter_solve()`: the solve runs in a thread of its own, so the event loop is not blocked while waiting
+        for the next events. Stopping the iteration (or cancelling the task) cancels the solve through the `deadline` (which is created if
+        it is not given), and waits until it stops (an IP solve which is already running is finished first).'''
+        import asyncio
+        import concurrent.futures
+        if not isinstance(deadline, Deadline):
+            deadline = Deadline(deadline)
+        batches = self._iter_event_batches(deadline)
+        executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='aiter_solve')
+        running = None
+        try:
+            while True:
+                running = executor.submit(next, batches, None)
+                batch = await asyncio.wrap_future(running)
+                if batch is None:
+                    return
+                for event in batch:
+                    yield event
+        finally:
+            if running is not None and not running.done(): # the solve is still running: stop it first
+                deadline.cancel()
+                await asyncio.wait([asyncio.wrap_future(running)])
+            executor.shutdown(wait=False)
+            batches.close()
+
+    def interactive_solve(self, script=None, echo=False):
+        '''Interactive solver tool. Type `'h'` or `'help'` for help.\\
+        If `script` is given (an iterable of lines, e.g. an open file or `sys.stdin`), its commands are run without prompting, and the
+        commands are printed before their output if `echo` is True (see `ConsoleApp.script()`).'''
+        if script is None:
+            print(f"{fclr.RED+style.BOLD}   INTERACTIVE SOLVER STARTED  {fclr.ENDC}")
+            print(style.BOLD, end='')
+            boardio.print_board(self.board)
+            print(style.UNBOLD, end='')
+            commands = sudoku_app()
+        else:
+            commands = sudoku_app().script(script, echo)
+        for action, rname, data in commands:
+            handler = console_commands.get((action, rname))
+            if handler is None:
+                continue
+            if self.recorder is not None:
+                self.recorder.run(self, handler, action, rname, data)
+            else:
+                handler(self, data)
+        if self.tracer is not None and self.tracer.path is not None:
+            print(f"Trace written to {self.stop_trace().path}")
+        if self.recorder is not None:
+            recorder = self.stop_recording()
+            print(f"{recorder.commands} commands recorded to {recorder.path}")
+
+    # >>> CONSOLE COMMANDS
+    # Handlers of the commands of interactive_solve(), registered in console_commands under the (action, rname) pairs of sudoku_app().
+    @console_command('func', r'step')
+    def _command_step(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        base, ext = os.path.splitext(file)
+        export = ext.lower() in graph_writers # export the graph instead of drawing it?
+        if file != '':
+            if data['flags'][r'-?-?graph']:
+                print(f"{'Exporting' if export else 'Printing'} graphs to file {base+'(i)'+ext}.")
+            else:
+                print("WARNING: '--graph' flag is OFF, no graph printing will happen.")
+        with self.profiled(f"step {data['params']['n']}"):
+            for i in range(int(data['params']['n'])):
+                if export:
+                    ret = self.solve_step(data['flags'][r'-?-?graph'] and base+f'({i})'+ext)
+                elif file != '':
+                    print.set_file(base+f'({i})'+ext)
                     ret = self.solve_step(data['flags'][r'-?-?graph'])
                     print.reset()
-                    if ret is None:
-                        if data['flags'][r'-?-?proof']:
-                            self.print_proof(len(self.proof)-1)
-                        else:
-                            print(f"Step #{i} complete, there are still empty cells.")
-                    elif ret:
-                        print(f"{fclr.RED+style.BOLD}          =========================   SUDOKU COMPLETE   =========================          {fclr.ENDC}")
-                        boardio.print_board(self.board)
+                else:
+                    ret = self.solve_step(data['flags'][r'-?-?graph'])
+                if ret is None:
+                    if data['flags'][r'-?-?proof']:
+                        self.print_proof(len(self.proof)-1)
                     else:
-                        print("Solver got stuck at this state:")
-                        self.print_status()
-                        break
-            if action == 'func' and rname == "": # Attempt solve
-                if self.solve():
+                        print(f"Step #{i} complete, there are still empty cells.")
+                elif ret:
                     print(f"{fclr.RED+style.BOLD}          =========================   SUDOKU COMPLETE   =========================          {fclr.ENDC}")
                     boardio.print_board(self.board)
                 else:
                     print("Solver got stuck at this state:")
                     self.print_status()
-            elif action == 'func' and rname == r'print': # Print
-                file = ConsoleApp.get_text(data['params']['file'])
-                if file != '':
-                    print(f"Printing board to file {file}")
-                print.set_file(file)
-                if data['flags'][r'-?-?r(?:aw)?']:
-                    boardio.print_raw_board(self.board)
-                elif data['flags'][r'-?-?a(?:rray)?']:
-                    boardio.print_array_board(self.board)
-                elif data['flags'][r'-?-?s(?:mall)?']:
-                    boardio.print_board(self.board)
-                else:
-                    self.print_status()
-                print.reset()
-            elif action == 'func' and rname == r'set':
-                r = int(data['params']['row'])
-                c = int(re.sub('[^\d]','',data['params']['col(?:umn)?']))
-                v = int(data['params']['val(?:ue)?'])
-                if self.board[r][c] != 0:
-                    print(f"ERROR: ({r}, {c}) is already filled with {self.board[r][c]}")
-                    continue
-                if self.allowed[r][c][v] is not None:
-                    print(f"ERROR: {v} is not allowed at ({r}, {c}); allowed numbers: {self.allowed[r][c].allowed()}")
-                    continue
-                self[r,c] = v
-                self.deus_ex_sets += 1
-                print(f"({r}, {c}) has been set to {v}.")
-            elif action == 'func' and rname == r'ban':
-                pure_cell_str = re.sub('[^\d]','',data['params']['cells'])
-                cells = [(int(pure_cell_str[2*i]),int(pure_cell_str[2*i+1])) for i in range(len(pure_cell_str)//2)]
-                to_ban = {int(d) for d in re.sub(r'[^\d]','',data['params']['values'])}
-                for r, c in cells:
-                    for val in to_ban:
-                        self.ban(r,c,val,'deus_ex',[])
-                print(f"{to_ban} banned from the following cells: {cells}")
-            elif action == 'func' and rname == r'u(?:nique)?|check_unicity':
-                print("Checking unicity of the puzzle. Please wait.")
-                u, sols = self.is_unique()
-                if u:
-                    print("[UNIQUE] This puzzle has a unique solution. It is the following:")
-                    boardio.print_board(sols[0])
-                else:
-                    print("[NOT UNIQUE] This puzzle has multiple solutions. Two of these are:")
-                    boardio.print_board(sols[0])
-                    boardio.print_board(sols[1])
-            elif action == 'func' and rname == 'proof':
-                file = ConsoleApp.get_text(data['params']['file'])
-                if file != '':
-                    print(f"Printing output to {file}")
-                # Simplify k:
-                data['params']['slice'] = re.sub(r'[^\d:]','',data['params']['slice'])
-                # Process k into proper slice indicies:
-                halves = data['params']['slice'].split(':')
-                start = int(halves[0]) if halves[0] != '' else 0
-                end = int(halves[1]) if halves[1] != '' else len(self.proof)
-                if end > len(self.proof):
-                    builtins.print(f"WARNING: specified range too large; proof only has {len(self.proof)} steps so far.")
-                # Execute printing:
-                print.set_file(file)
-                self.print_proof(start, min(end, len(self.proof)),
-                    isvalue=data['flags'][r'-?-?[Ii](?:s[Vv]alue)?'],
-                    reference=data['flags'][r'-?-?r(?:ef(?:erence)?)?'])
-                print.reset()
-            elif action == 'func' and rname == r'play(?:back)?':
-                self.playback()
-            elif action == 'get_var' and rname == r'k[-_]opt(?:imi[zs]ation)?':
-                print(f"k-optimization: {'ON' if self.k_opt else 'OFF'}")
-            elif action == 'set_var' and rname == r'k[-_]opt(?:imi[zs]ation)?':
-                self.k_opt = ConsoleApp.str_to_bool(data)
-                print(f"k-optimization was set to {self.k_opt}")
-            elif action == 'get_var' and rname == r'[iI][pP][-_][tT](?:ime)?(?:[-_]?[lL]im(?:it)?)?':
-                if self.ip_time_limit is None:
-                    print("ip-time-limit is UNLIMITED")
-                else:
-                    print(f"ip-time-limit: {self.ip_time_limit} s")
-            elif action == 'set_var' and rname == r'[iI][pP][-_][tT](?:ime)?(?:[-_]?[lL]im(?:it)?)?':
-                f = float(data)
-                if f <= 0:
-                    self.ip_time_limit = None
-                    print(f"ip-time-limit was set to UNLIMITED")
-                else:
-                    self.ip_time_limit = f
-                    print(f"ip-time-limit was set to {f} s")
-            elif action == 'get_var' and rname == r'greedy?':
-                print(f"greedy: {'ON' if self.greedy else 'OFF'}")
-            elif action == 'set_var' and rname == r'greedy?':
-                self.greedy = ConsoleApp.str_to_bool(data)
-                print(f"greedy was set to {self.greedy}")
-            elif action == 'get_var' and rname == r'reset(?:[-_]always)?':
-                print(f"reset-always is {'ON' if self.reset_always else 'OFF'}")
-            elif action == 'set_var' and rname == r'reset(?:[-_]always)?':
-                self.reset_always = ConsoleApp.str_to_bool(data)
-                print(f"reset-always was set to {self.reset_always}")
-            elif action == 'get_var' and rname == r'ignore(?:[-_]filled)?':
-                print(f"ignore-filled is {'ON' if self.reset_always else 'OFF'}")
-            elif action == 'set_var' and rname == r'ignore(?:[-_]filled)?':
-                self.ignore_filled = ConsoleApp.str_to_bool(data)
-                print(f"ignore-filled was set to {self.ignore_filled}")
-            elif action == 'func' and rname == r'stat(?:istic)?s?':
-                file = ConsoleApp.get_text(data['params']['file'])
-                if file != '':
-                    print(f"Printing statistics to {file}")
-                print.set_file(file)
-                self.print_stats()
-                print.reset()
-            elif action == 'func' and rname == r'export':
-                file = ConsoleApp.get_text(data['params']['file'])
-                print(f"Exporting session data to {file}")
-                print.set_file(file)
-                print("STARTING BOARD:")
-                if data['flags'][r'-?-?r(?:aw)?']:
-                    boardio.print_raw_board(self.starting_board)
-                elif data['flags'][r'-?-?a(?:rray)?']:
-                    boardio.print_array_board(self.starting_board)
-                else:
-                    boardio.print_board(self.starting_board)
-                print("FINAL BOARD:")
-                if data['flags'][r'-?-?r(?:aw)?']:
-                    boardio.print_raw_board(self.board)
-                elif data['flags'][r'-?-?a(?:rray)?']:
-                    boardio.print_array_board(self.board)
-                else:
-                    boardio.print_board(self.board)
-                print("PROOF:")
-                self.print_proof(isvalue=data['flags'][r'-?-?[Ii](?:s[Vv]alue)?'], reference=data['flags'][r'-?-?r(?:ef(?:erence)?)?'])
-                if not data['flags'][r'-?-?n(?:ostats?)?']:
-                    print("STATISTICS:")
-                    self.print_stats()
-                print.reset()
-            elif action == 'func' and rname == r'origin(?:al)?|og?|puzzle':
-                boardio.print_board(self.starting_board)
+                    break
+
+    @console_command('func', r'(?:solve)?')
+    def _command_solve(self, data):
+        with self.profiled('solve'):
+            solved = self.solve()
+        if solved:
+            print(f"{fclr.RED+style.BOLD}          =========================   SUDOKU COMPLETE   =========================          {fclr.ENDC}")
+            boardio.print_board(self.board)
+        else:
+            print("Solver got stuck at this state:")
+            self.print_status()
+
+    @console_command('func', r'print')
+    def _command_print(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if file != '':
+            print(f"Printing board to file {file}")
+        print.set_file(file)
+        if data['flags'][r'-?-?r(?:aw)?']:
+            boardio.print_raw_board(self.board)
+        elif data['flags'][r'-?-?a(?:rray)?']:
+            boardio.print_array_board(self.board)
+        elif data['flags'][r'-?-?s(?:mall)?']:
+            boardio.print_board(self.board)
+        else:
+            self.print_status()
+        print.reset()
+
+    @console_command('func', r'set')
+    def _command_set(self, data):
+        r = int(data['params']['row'])
+        c = int(re.sub('[^\d]','',data['params']['col(?:umn)?']))
+        v = int(data['params']['val(?:ue)?'])
+        if r >= self.size or c >= self.size or not 1 <= v <= self.size:
+            print(f"ERROR: ({r}, {c}) = {v} is not on this {self.size}×{self.size} board")
+            return
+        if self.board[r][c] != 0:
+            print(f"ERROR: ({r}, {c}) is already filled with {self.board[r][c]}")
+            return
+        if self.allowed[r][c][v] is not None:
+            print(f"ERROR: {v} is not allowed at ({r}, {c}); allowed numbers: {self.allowed[r][c].allowed()}")
+            return
+        self[r,c] = v
+        self.deus_ex_sets += 1
+        print(f"({r}, {c}) has been set to {v}.")
+
+    @console_command('func', r'ban')
+    def _command_ban(self, data):
+        pure_cell_str = re.sub('[^\d]','',data['params']['cells'])
+        cells = [(int(pure_cell_str[2*i]),int(pure_cell_str[2*i+1])) for i in range(len(pure_cell_str)//2)]
+        to_ban = {int(d) for d in re.sub(r'[^\d]','',data['params']['values'])}
+        for r, c in cells:
+            for val in to_ban:
+                self.ban(r,c,val,'deus_ex',[])
+        print(f"{to_ban} banned from the following cells: {cells}")
+
+    @console_command('func', r'u(?:nique)?|check_unicity')
+    def _command_unique(self, data):
+        print("Checking unicity of the puzzle. Please wait.")
+        u, sols = self.is_unique()
+        if u:
+            print("[UNIQUE] This puzzle has a unique solution. It is the following:")
+            boardio.print_board(sols[0])
+        else:
+            print("[NOT UNIQUE] This puzzle has multiple solutions. Two of these are:")
+            boardio.print_board(sols[0])
+            boardio.print_board(sols[1])
+
+    @console_command('func', r'proof')
+    def _command_proof(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if file != '':
+            print(f"Printing output to {file}")
+        # Simplify k:
+        data['params']['slice'] = re.sub(r'[^\d:]','',data['params']['slice'])
+        # Process k into proper slice indicies:
+        halves = data['params']['slice'].split(':')
+        start = int(halves[0]) if halves[0] != '' else 0
+        end = int(halves[1]) if halves[1] != '' else len(self.proof)
+        if end > len(self.proof):
+            print.console(f"WARNING: specified range too large; proof only has {len(self.proof)} steps so far.")
+        # Execute printing:
+        print.set_file(file)
+        self.print_proof(start, min(end, len(self.proof)),
+            isvalue=data['flags'][r'-?-?[Ii](?:s[Vv]alue)?'],
+            reference=data['flags'][r'-?-?r(?:ef(?:erence)?)?'])
+        print.reset()
+
+    @console_command('func', r'play(?:back)?')
+    def _command_playback(self, data):
+        self.playback()
+
+    @console_command('get_var', r'k[-_]opt(?:imi[zs]ation)?')
+    def _get_k_opt(self, data):
+        print(f"k-optimization: {'ON' if self.k_opt else 'OFF'}")
+
+    @console_command('set_var', r'k[-_]opt(?:imi[zs]ation)?')
+    def _set_k_opt(self, data):
+        self.k_opt = ConsoleApp.str_to_bool(data)
+        print(f"k-optimization was set to {self.k_opt}")
+
+    @console_command('get_var', r'[iI][pP][-_][tT](?:ime)?(?:[-_]?[lL]im(?:it)?)?')
+    def _get_ip_time_limit(self, data):
+        if self.ip_time_limit is None:
+            print("ip-time-limit is UNLIMITED")
+        else:
+            print(f"ip-time-limit: {self.ip_time_limit} s")
+
+    @console_command('set_var', r'[iI][pP][-_][tT](?:ime)?(?:[-_]?[lL]im(?:it)?)?')
+    def _set_ip_time_limit(self, data):
+        f = float(data)
+        if f <= 0:
+            self.ip_time_limit = None
+            print(f"ip-time-limit was set to UNLIMITED")
+        else:
+            self.ip_time_limit = f
+            print(f"ip-time-limit was set to {f} s")
+
+    @console_command('get_var', r'[iI][pP][-_]?[bB]ackend')
+    def _get_ip_backend(self, data):
+        print(f"ip-backend: {self.ip_backend}")
+
+    @console_command('set_var', r'[iI][pP][-_]?[bB]ackend')
+    def _set_ip_backend(self, data):
+        backend = data.lower()
+        if backend == 'highs' and not ipsolver.has_highs():
+            print("ERROR: the 'highs' backend requires scipy, which is not installed.")
+            return
+        self.ip_backend = backend
+        print(f"ip-backend was set to {self.ip_backend}")
+
+    @console_command('get_var', r'time[-_]?budget')
+    def _get_time_budget(self, data):
+        if self.time_budget is None:
+            print("time-budget is UNLIMITED")
+        else:
+            print(f"time-budget: {self.time_budget} s")
+
+    @console_command('set_var', r'time[-_]?budget')
+    def _set_time_budget(self, data):
+        f = float(data)
+        if f <= 0:
+            self.time_budget = None
+            print(f"time-budget was set to UNLIMITED")
+        else:
+            self.time_budget = f
+            print(f"time-budget was set to {f} s")
+
+    @console_command('get_var', r'k[-_]cache')
+    def _get_k_cache(self, data):
+        print(f"k-cache: {'ON' if self.k_cache else 'OFF'}")
+
+    @console_command('set_var', r'k[-_]cache')
+    def _set_k_cache(self, data):
+        self.k_cache = ConsoleApp.str_to_bool(data)
+        print(f"k-cache was set to {self.k_cache}")
+
+    @console_command('func', r'cache')
+    def _command_cache(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if (data['flags'][r'-?-?s(?:ave)?'] or data['flags'][r'-?-?l(?:oad)?']) and file == '':
+            print("ERROR: a file must be given to save/load the cache.")
+            return
+        if data['flags'][r'-?-?c(?:lear)?']:
+            tracker.kopt_cache.clear()
+            print("k-cache cleared.")
+        if data['flags'][r'-?-?l(?:oad)?']:
+            try:
+                tracker.kopt_cache.load(file)
+                print(f"k-cache loaded from {file}")
+            except (OSError, ValueError) as e:
+                print(f"ERROR: {str(e)}")
+        if data['flags'][r'-?-?s(?:ave)?']:
+            tracker.kopt_cache.save(file)
+            print(f"k-cache saved to {file}")
+        print(f"k-cache contains {len(tracker.kopt_cache)} results.")
+
+    @console_command('func', r'trace')
+    def _command_trace(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if data['flags'][r'-?-?stop'] or (file == '' and self.tracer is not None):
+            tracer = self.stop_trace()
+            if tracer is None:
+                print("ERROR: tracing is not on.")
+            else:
+                print(f"Trace of {len(tracer.events)} events written to {tracer.path}")
+        if file != '':
+            if self.tracer is not None:
+                self.stop_trace()
+            self.start_trace(file)
+            print(f"Tracing ON: the trace will be written to {file}")
+        elif self.tracer is None and not data['flags'][r'-?-?stop']:
+            print("Tracing is OFF. Type 'trace <file>' to start it.")
+
+    @console_command('func', r'prof(?:ile)?')
+    def _command_profile(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if data['flags'][r'-?-?c(?:ancel)?']:
+            print("Profile cancelled." if self.next_profile is not None else "ERROR: no profile is waiting for a solve.")
+            self.next_profile = None
+        elif file != '':
+            mode = 'sampling' if data['flags'][r'-?-?s(?:ampl(?:e|ing))?'] else 'deterministic'
+            self.profile_next(file, mode, int(data['params']['top']))
+            print(f"The next solve or step will be profiled ({mode}), the results will be written to {file}")
+        elif self.next_profile is not None:
+            print(f"The next solve or step will be profiled ({self.next_profile[1]}), the results will be written to {self.next_profile[0]}")
+        else:
+            print("No profile is waiting. Type 'profile <file>' to profile the next solve or step.")
+
+    @console_command('func', r'rec(?:ord)?')
+    def _command_record(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if data['flags'][r'-?-?stop']:
+            recorder = self.stop_recording()
+            if recorder is None:
+                print("ERROR: the session is not recorded.")
+            else:
+                print(f"{recorder.commands} commands recorded to {recorder.path}")
+        elif file != '':
+            if self.recorder is not None:
+                self.stop_recording()
+            try:
+                self.start_recording(file)
+                print(f"Recording the session to {file}")
+            except OSError as e:
+                print(f"ERROR: {str(e)}")
+        elif self.recorder is not None:
+            print(f"Recording the session to {self.recorder.path}, {self.recorder.commands} commands so far.")
+        else:
+            print("The session is not recorded. Type 'record <file>' to start recording it.")
+
+    @console_command('func', r'session')
+    def _command_session(self, data):
+        from session import save_session, load_session
+        file = ConsoleApp.get_text(data['params']['file'])
+        try:
+            if data['flags'][r'-?-?s(?:ave)?']:
+                save_session(self, file)
+                print(f"Session saved to {file}")
+            elif data['flags'][r'-?-?l(?:oad)?']:
+                self.load_session(file)
+                print(f"Session loaded from {file}, {len(self.proof)} proof steps.")
+                boardio.print_board(self.board)
+            else:
+                session = load_session(file)
+                print(f"Session {file}: {len(session.steps)} proof steps, {len(session.nodes)} lemmas, "
+                    f"k={int(session.steps['k'].sum())} overall, maximal k={int(session.steps['k'].max(initial=0))}")
+                session.close()
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {str(e)}")
+
+    @console_command('get_var', r'greedy?')
+    def _get_greedy(self, data):
+        print(f"greedy: {'ON' if self.greedy else 'OFF'}")
+
+    @console_command('set_var', r'greedy?')
+    def _set_greedy(self, data):
+        self.greedy = ConsoleApp.str_to_bool(data)
+        print(f"greedy was set to {self.greedy}")
+
+    @console_command('get_var', r'reset(?:[-_]always)?')
+    def _get_reset_always(self, data):
+        print(f"reset-always is {'ON' if self.reset_always else 'OFF'}")
+
+    @console_command('set_var', r'reset(?:[-_]always)?')
+    def _set_reset_always(self, data):
+        self.reset_always = ConsoleApp.str_to_bool(data)
+        print(f"reset-always was set to {self.reset_always}")
+
+    @console_command('get_var', r'ignore(?:[-_]filled)?')
+    def _get_ignore_filled(self, data):
+        print(f"ignore-filled is {'ON' if self.reset_always else 'OFF'}")
+
+    @console_command('set_var', r'ignore(?:[-_]filled)?')
+    def _set_ignore_filled(self, data):
+        self.ignore_filled = ConsoleApp.str_to_bool(data)
+        print(f"ignore-filled was set to {self.ignore_filled}")
+
+    @console_command('func', r'stat(?:istic)?s?')
+    def _command_stats(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        if file != '':
+            print(f"Printing statistics to {file}")
+        print.set_file(file)
+        self.print_stats()
+        print.reset()
+
+    @console_command('func', r'export')
+    def _command_export(self, data):
+        file = ConsoleApp.get_text(data['params']['file'])
+        print(f"Exporting session data to {file}")
+        print.set_file(file)
+        print("STARTING BOARD:")
+        if data['flags'][r'-?-?r(?:aw)?']:
+            boardio.print_raw_board(self.starting_board)
+        elif data['flags'][r'-?-?a(?:rray)?']:
+            boardio.print_array_board(self.starting_board)
+        else:
+            boardio.print_board(self.starting_board)
+        print("FINAL BOARD:")
+        if data['flags'][r'-?-?r(?:aw)?']:
+            boardio.print_raw_board(self.board)
+        elif data['flags'][r'-?-?a(?:rray)?']:
+            boardio.print_array_board(self.board)
+        else:
+            boardio.print_board(self.board)
+        print("PROOF:")
+        self.print_proof(isvalue=data['flags'][r'-?-?[Ii](?:s[Vv]alue)?'], reference=data['flags'][r'-?-?r(?:ef(?:erence)?)?'])
+        if not data['flags'][r'-?-?n(?:ostats?)?']:
+            print("STATISTICS:")
+            self.print_stats()
+        print.reset()
+
+    @console_command('func', r'origin(?:al)?|og?|puzzle')
+    def _command_original(self, data):
+        boardio.print_board(self.starting_board)
 
     # >>> UTILITY
+    def start_trace(self, path=None):
+        '''From now on, record the solves of this sudoku (rules, `ProofStep` phases, fills; see `tracing.Tracer`) until `stop_trace()`.
+        Returns the `Tracer`.'''
+        from tracing import Tracer
+        self.tracer = Tracer(path)
+        return self.tracer
+
+    def stop_trace(self):
+        '''Stop tracing, and write the trace to the path given to `start_trace()` (if any). Returns the `Tracer`, or None if there was none.'''
+        tracer, self.tracer = self.tracer, None
+        if tracer is not None and tracer.path is not None:
+            tracer.save()
+        return tracer
+
+    def start_recording(self, path):
+        '''From now on, record the commands of `interactive_solve()` which change the state of the sudoku to `path` (see
+        `recording.Recorder`), until `stop_recording()`. Returns the `Recorder`.'''
+        from recording import Recorder
+        self.recorder = Recorder(self, path)
+        return self.recorder
+
+    def stop_recording(self):
+        '''Stop recording, and close the recording. Returns the `Recorder`, or None if there was none.'''
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+        return recorder
+
+    def profile_next(self, path, mode='deterministic', top=20):
+        '''Profile the next solve or step started from the console (or run in a `profiled()` block) in `mode` (see `profiling.Profiler`),
+        and write its results to `path` (see `profiling.Profiler.save()`): the `top` functions with the most time spent in them.'''
+        from profiling import MODES
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', it should be one of {', '.join(MODES)}.")
+        self.next_profile = (path, mode, top)
+
+    @contextlib.contextmanager
+    def profiled(self, title):
+        '''Profiles the `with` block if a profile was requested by `profile_next()` (and the request is used up); otherwise does nothing.
+        Yields the `profiling.Profiler`, or None.'''
+        if self.next_profile is None:
+            yield None
+            return
+        from profiling import Profiler
+        (path, mode, top), self.next_profile = self.next_profile, None
+        profiler = Profiler(mode)
+        try:
+            with profiler:
+                yield profiler
+        finally:
+            report, stacks = profiler.save(path, top, title)
+            print(f"Profile of {title} ({profiler.elapsed:.3f} s) written to {report}, call stacks to {stacks}:")
+            for phase, weight in profiler.by_phase().most_common(5):
+                print(f"    {profiler.seconds(weight):8.4f} s  {phase}")
+
+    def _span(self, name, category):
+        '''A context manager recording a span if the solve is traced; it yields the `dict` of the arguments of the span (None if not).'''
+        if self.tracer is None:
+            return _no_span
+        return self.tracer.span(name, category, {})
+
+    def checkpoint(self):
+        '''Called by the deduction rules between the parts of their work: raises `DeadlineExceeded` if the deadline of the current step has
+        passed.'''
+        if self.deadline is not None:
+            self.deadline.check()
+
+    def status(self):
+        '''The outcome of the last solve: `'solved'`, `'contradiction'` (the puzzle has no solution), `'timed_out'` (the solve reached its
+        deadline) or `'stuck'` (no more cells can be filled with the deduction rules).'''
+        if self.missing == 0:
+            return 'solved'
+        if self.contradictory:
+            return 'contradiction'
+        return 'timed_out' if self.timed_out else 'stuck'
+
+    def _open_deductions(self):
+        '''The `Deduction`s later deductions may refer to: the ones stored in the grids, and the filler deductions not yet used.'''
+        for grid in (self.allowed, self.rowpos, self.colpos, self.secpos):
+            for line in grid:
+                for info in line:
+                    yield from info.values()
+        yield from self.filler_deductions
+
+    def _steps_in_memory(self):
+        '''The `ProofStep`s of `proof` which are part of the proof graph in memory: the archived steps of a loaded session (see
+        `load_session()`) are rebuilt from the file on access, and refer to nothing in the graph.'''
+        return getattr(self.proof, 'appended', self.proof)
+
+    def compact(self):
+        '''Drops the parts of the proof graph which are no longer reachable from the open deductions (see `_open_deductions()`), and are
+        only kept alive by the `ProofStep`s in `proof`: for these, only the `Consequence`s chosen in the proofs are kept (see
+        `tracker.prune_history()`). Runs automatically after fills, see `compact_after`. Returns the number of dropped `Consequence`s.'''
+        with self._span('compact', 'step') as args:
+            dropped = tracker.prune_history(tracker.reachable_deductions(self._open_deductions()), self._steps_in_memory())
+            if args is not None:
+                args['dropped'] = dropped
+        self.compactions += 1
+        self.pruned_consequences += dropped
+        self._graph_growth = 0
+        return dropped
+
+    def memory_stats(self):
+        '''Returns the size of the proof graph kept in memory in a `dict`: the number of `Deduction`s, `Consequence`s and edges reachable
+        from the open deductions or the `proof` (`'graph_deductions'`, `'graph_consequences'`, `'graph_edges'`), how many of the
+        `Deduction`s are reachable from the open deductions (`'live_deductions'`), and the work of `compact()` so far. The archived steps of a
+        loaded session are not counted (see `_steps_in_memory()`).'''
+        live = tracker.reachable_deductions(self._open_deductions())
+        deductions, consequences, edges = tracker.graph_size(live | tracker.reachable_deductions(
+            lemma for step in self._steps_in_memory() for lemma in step.proof))
+        return {
+            'graph_deductions': deductions,
+            'graph_consequences': consequences,
+            'graph_edges': edges,
+            'live_deductions': len(live),
+            'compactions': self.compactions,
+            'pruned_consequences': self.pruned_consequences,
+        }
+
     def is_unique(self):
         '''Checks whether this sudoku has a unique solution. See `check_unicity()`.'''
         return check_unicity(self.board, False)
@@ -478,30 +1143,66 @@ class Sudoku:
         made_deduction |= self.make_deduction(CantBe((row,col),value,'cell'),rule,cells_used,details)
         made_deduction |= self.make_deduction(CantBe((row,col),value,'rowpos'),rule,cells_used,details)
         made_deduction |= self.make_deduction(CantBe((col,row),value,'colpos'),rule,cells_used,details)
-        made_deduction |= self.make_deduction(CantBe((cell_section(row,col),global_to_local(row,col)),value,'secpos'),rule,cells_used,details)
+        made_deduction |= self.make_deduction(CantBe((cell_section(row,col,self.box),global_to_local(row,col,self.box)),value,'secpos',
+            self.box),rule,cells_used,details)
+        if made_deduction and self._events is not None:
+            self._events.append({'event': 'ban', 'rule': rule, 'cell': (row, col), 'value': value})
         # STREAMLINE
         if made_deduction and self.reset_always:
             raise ResetDeductionSearch()
         return made_deduction
 
+    def statistics(self):
+        '''Returns the main statistics of the solve so far (see `print_stats()`) in a `dict`.'''
+        return {
+            'runtime': self.deduction_time+self.k_opt_time+self.fill_time,
+            'deduction_time': self.deduction_time,
+            'k_opt_time': self.k_opt_time,
+            'fill_time': self.fill_time,
+            'failed_solves': self.failed_solves,
+            'deus_ex_sets': self.deus_ex_sets,
+            'steps': len(self.proof),
+            'k_optimized_steps': sum((1 if s.k_opt else 0 for s in self.proof)),
+            'greedy_steps': sum((1 if s.greedy else 0 for s in self.proof)),
+            'max_k': max((step.k for step in self.proof),default=0),
+            'mean_k': 0 if len(self.proof)==0 else sum((step.k for step in self.proof))/len(self.proof),
+            'ip_time': sum((step.ip_time for step in self.proof)),
+            'timed_out_ip_steps': sum((1 if step.timed_out else 0 for step in self.proof)),
+            'cache_hits': sum((step.cache_hits for step in self.proof)),
+            'cache_misses': sum((step.cache_misses for step in self.proof)),
+            'budget_spent': self.budget_spent,
+            'timed_out': self.timed_out,
+            'rule_uses': dict(self.rule_uses),
+            **self.memory_stats(),
+        }
+
     # >>> PRINTING
+    @to_own_sink
     def print_status(self):
         '''Prints a detailed representation of the current state of the puzzle. Each cell contains which numbers can be written there.'''
-        boardio.print_detailed_board(self.board, [[self.allowed[r][c].allowed() for c in range(9)] for r in range(9)])
+        boardio.print_detailed_board(self.board, [[self.allowed[r][c].allowed() for c in range(self.size)] for r in range(self.size)])
 
     def proof_to_string(self, idx, isvalue=False, reference=False):
         '''Converts the data of the ith proof step to a string.'''
-        ret = f"[#{idx}, k={self.proof[idx].k}, k-opt={self.proof[idx].k_opt}, approx={self.proof[idx].approximation}, greedy={self.proof[idx].greedy}]\n"
-        ret += f"  {self.proof[idx].position} is {self.proof[idx].value}, because:\n\t"
-        ret += "\n\t".join(self.proof[idx].to_strings(reference,isvalue))
-        return ret
+        return ''.join(self.iter_proof_lines(idx, idx+1, isvalue, reference))[:-1]
+
+    def iter_proof_lines(self, start=0, end=None, isvalue=False, reference=False):
+        '''Lazily yields the lines (ending with newlines) describing proof steps from #start to #end (default: 0 and last). Only the steps in
+        this range are converted to strings, one lemma at a time.'''
+        if end is None: end = len(self.proof)
+        for idx in range(start, end):
+            step = self.proof[idx]
+            yield f"[#{idx}, k={step.k}, k-opt={step.k_opt}, approx={step.approximation}, greedy={step.greedy}]\n"
+            yield f"  {step.position} is {step.value}, because:\n"
+            for line in step.iter_strings(reference, isvalue):
+                yield "\t"+line+"\n"
 
+    @to_own_sink
     def print_proof(self, start=0, end=None, isvalue=False, reference=False):
         '''Prints proof steps from #start to #end (default: 0 and last) to the specified file, or the console if file is None.'''
-        if end is None: end = len(self.proof)
-        for i in range(start, end):
-            print(self.proof_to_string(i,isvalue,reference))
+        print.writelines(self.iter_proof_lines(start, end, isvalue, reference))
 
+    @to_own_sink
     def print_stats(self):
         print(f"RUNTIME:                   {self.deduction_time+self.k_opt_time+self.fill_time} s")
         print(f"| Deduction time:          {self.deduction_time} s")
@@ -509,6 +1210,9 @@ class Sudoku:
         print(f"| Fill time:               {self.fill_time} s\n")
         print(f"k-opzimization:            {'ON' if self.k_opt else 'OFF'}")
         print(f"ip-time-limit:             {'UNLIMITED' if self.ip_time_limit is None else f'{self.ip_time_limit} s'}")
+        print(f"ip-backend:                {self.ip_backend}")
+        print(f"time-budget:               {'UNLIMITED' if self.time_budget is None else f'{self.time_budget} s'}")
+        print(f"k-cache:                   {'ON' if self.k_cache else 'OFF'}")
         print(f"greedy:                    {'ON' if self.greedy else 'OFF'}")
         print(f"reset-always:              {'ON' if self.reset_always else 'OFF'}")
         print(f"ignore-filled:             {self.ignore_filled}\n")
@@ -523,6 +1227,22 @@ class Sudoku:
         print(f"| Maximal k:               {max((step.k for step in self.proof),default=0)}")
         print(f"| Maximal optimized k:     {max((step.k for step in self.proof if step.k_opt),default=0)}")
         print(f"| Mean k:                  {0 if len(self.proof)==0 else sum((step.k for step in self.proof))/len(self.proof)}")
+        print(f"| IP time:                 {sum((step.ip_time for step in self.proof))} s")
+        print(f"| Timed out IP steps:      {sum((1 if step.timed_out else 0 for step in self.proof))}")
+        hits = sum((step.cache_hits for step in self.proof))
+        misses = sum((step.cache_misses for step in self.proof))
+        print(f"| k-cache hit rate:        {0 if hits+misses==0 else hits/(hits+misses)} ({hits} hits, {misses} misses)")
+        print(f"| Time saved by k-cache:   {sum((step.cache_saved_time for step in self.proof))} s")
+        memory = self.memory_stats()
+        print(f"\nProof graph in memory:     {memory['graph_deductions']} deductions, {memory['graph_consequences']} consequences, "
+            f"{memory['graph_edges']} edges")
+        print(f"| Still usable deductions: {memory['live_deductions']}")
+        print(f"| Compactions:             {memory['compactions']} ({memory['pruned_consequences']} consequences dropped)")
+        if self.budget_spent is not None:
+            print(f"\nTime budget spent:         {self.budget_spent} s of {self.time_budget} s")
+            for i, step in enumerate(self.proof):
+                if step.ip_time_limit is not None:
+                    print(f"| Step #{i:<3} IP time used:  {step.ip_time:.3f} s of {step.ip_time_limit:.3f} s{' (TIMED OUT)' if step.timed_out else ''}")
     
     def playback(self):
         '''Start a session where the user can move backwards and forwards in time and see what the board looked like during the solving process.'''
@@ -531,40 +1251,26 @@ class Sudoku:
             self.print_status()
             print("ERROR: there were no steps made yet. Shutting down playback session...")
             return
-        # >>> Generate cache
-        print("Generating cache...")
-        # get starting board
-        sud = Sudoku(board=self.starting_board)
-        get_allowed = lambda : [ [[(coldict[v+1] is None) for v in range(9)] for coldict in rowarray] for rowarray in sud.allowed]
-        start_allowed = get_allowed()
-        start_board = copy.deepcopy(sud.board)
-        cache = [] # each element is a tuple, with the first element being
-        # [a list of tuples (1 tuple for each lemma), with its first element being
-        #   the current 'allowed' value, and the second the string corresponding to this step, the third is the position
-        #   for the last lemma, the new board is also saved]
-        #   and the second the board before this step
-        last_board = copy.deepcopy(start_board) #temporary
-        for i, step in enumerate(self.proof):
-            cache.append(([], copy.deepcopy(last_board)))
-            for lemma, lemma_string in zip(step.proof, step.to_strings(False, True)):
-                if not isinstance(lemma, Deduction): continue
-                if isinstance(lemma.result, CantBe):
-                    pos = lemma.result.get_pos()
-                    if sud.allowed[pos[0]][pos[1]][lemma.result.value] is None:
-                        sud.ban(*pos,lemma.result.value,'deus_ex',[])
-                        cache[-1][0].append((get_allowed(), lemma_string, pos))
-                else: # isinstance(lemma.result, MustBe):
-                    pos = lemma.result.get_pos()
-                    sud[pos] = lemma.result.value
-                    last_board[pos[0]][pos[1]] = lemma.result.value
-                    cache[-1][0].append((get_allowed(), lemma_string, pos, copy.deepcopy(last_board)))
+        # >>> Prepare the timeline (it is built lazily while moving forward)
+        timeline = Timeline(self.starting_board, self.proof)
+        renderer = boardio.BoardRenderer() # only redraws what changed between key presses
         # Start interactive part
         proofstep = -1
         lemma = 0
-        possibles = lambda allowed: [[[i+1 for i in range(9) if cell[i]] for cell in rowarray] for rowarray in allowed]
-        boardio.print_detailed_board(start_board, possibles(start_allowed))
+        message = ''
         while True:
-            print("<Press 'q' to quit, 'j' to jump to a given proofstep, 'ad' to move between lemmas, and 'ws' to move between proofsteps.>\n\n")
+            # Draw
+            # - special case
+            if proofstep == -1:
+                frame = boardio.detailed_board_frame(*timeline.start_state()) + ["(This is the starting board.)"]
+            # - general case
+            else:
+                step = self.proof[proofstep]
+                board, possibles, pos, lemma_string = timeline.state(proofstep, lemma)
+                frame = [f"[#{proofstep}, k={step.k}, k-opt={step.k_opt}, approx={step.approximation}, greedy={step.greedy}]",
+                    f"{step.position} is {step.value}, because:"] + boardio.detailed_board_frame(board, possibles, pos) + [lemma_string]
+            renderer.draw(frame + [message, "<Press 'q' to quit, 'j' to jump to a given proofstep, 'ad' to move between lemmas, and 'ws' to move between proofsteps.>"])
+            message = ''
             key = boardio.getch()
             # Parse keys
             if key == 'q':
@@ -573,41 +1279,27 @@ class Sudoku:
             elif key == 'j':
                 proofstep = min(len(self.proof)-1, max(0, int(input(f"Jump to proofstep (0-{len(self.proof)-1}): "))))
                 lemma = 0
+                renderer.invalidate() # the input was written to the screen
             elif key == 'a':
-                if proofstep == -1: print("NO LEMMAS HERE")
+                if proofstep == -1: message = "NO LEMMAS HERE"
                 elif lemma > 0: lemma -= 1
-                else: print("FIRST LEMMA REACHED")
+                else: message = "FIRST LEMMA REACHED"
             elif key == 'd':
-                if proofstep == -1: print("NO LEMMAS HERE")
-                elif lemma < len(cache[proofstep][0])-1: lemma += 1
-                else: print("LAST LEMMA REACHED")
+                if proofstep == -1: message = "NO LEMMAS HERE"
+                elif lemma < timeline.lemma_count(proofstep)-1: lemma += 1
+                else: message = "LAST LEMMA REACHED"
             elif key == 'w':
                 if proofstep > -1: 
                     proofstep -= 1
                     lemma = 0
                 else: 
-                    print("FIRST PROOFSTEP REACHED")
+                    message = "FIRST PROOFSTEP REACHED"
             elif key == 's':
                 if proofstep < len(self.proof)-1: 
                     proofstep += 1
                     lemma = 0
                 else: 
-                    print("LAST PROOFSTEP REACHED")
-            # Print
-            # - special case
-            if proofstep == -1:
-                boardio.print_detailed_board(start_board, possibles(start_allowed))
-                print("(This is the starting board.)")
-                continue
-            # - general case
-            step = self.proof[proofstep]
-            print(f"[#{proofstep}, k={step.k}, k-opt={step.k_opt}, approx={step.approximation}, greedy={step.greedy}]")
-            print(f"{step.position} is {step.value}, because:")
-            if lemma < len(cache[proofstep][0]) - 1:
-                boardio.print_detailed_board(cache[proofstep][1],possibles(cache[proofstep][0][lemma][0]),cache[proofstep][0][lemma][2])
-            else:
-                boardio.print_detailed_board(cache[proofstep][0][lemma][3],possibles(cache[proofstep][0][lemma][0]),cache[proofstep][0][lemma][2])
-            print(cache[proofstep][0][lemma][1])
+                    message = "LAST PROOFSTEP REACHED"
 
 
 # >>> SOLVERS
@@ -616,18 +1308,21 @@ def check_unicity(board_to_solve, verbose=False):
     Returns 
     -   `(True, [unique_solution])`, if the solution is unique,
     -   `[solution_no1, solution_no2]` if there are at least two solutions.'''
+    import numpy as np
     b=np.array(board_to_solve)
+    size=len(b)
+    box=math.isqrt(size)
     sols=[]
 
     def nextcell(row,col):
         '''Returns the coordinates of the next cell in reading order. ISN'T CYCLIC, doesn't work for the last cell.'''
-        x=row*9+col+1
-        return (x//9,x%9)
+        x=row*size+col+1
+        return (x//size,x%size)
 
     def dfs(row,col):
         '''Attempts to fill this cell and then recursively all cells after this.\\
         Returns True if at least 2 solutions have been found during the search, and False before that.'''
-        if row==9: # if we filled the entire grid, save this as a solution, and possibly terminate the search.
+        if row==size: # if we filled the entire grid, save this as a solution, and possibly terminate the search.
             sols.append(b.copy())
             if verbose: print(b)
             return len(sols)>1
@@ -635,21 +1330,21 @@ def check_unicity(board_to_solve, verbose=False):
             return dfs(*nextcell(row,col))
 
         # Decide which numbers can be written in this cell without causing a conflict with previously filled cells:
-        possible=[True for i in range(9)]
-        for i in range(9): # discard numbers present in this row
+        possible=[True for i in range(size)]
+        for i in range(size): # discard numbers present in this row
             if b[row][i]!=0:
                 possible[b[row][i]-1]=False
-        for i in range(9): # discard numbers present in this column
+        for i in range(size): # discard numbers present in this column
             if b[i][col]!=0:
                 possible[b[i][col]-1]=False
         # discard numbers present in this section:
-        sec=cell_section(row,col)
-        for i,j in product(range(3), range(3)):
-            tmp=b[local_to_global(sec, i, j)]
+        sec=cell_section(row,col,box)
+        for i,j in product(range(box), range(box)):
+            tmp=b[local_to_global(sec, i, j, box)]
             if tmp!=0:
                 possible[tmp-1]=False
         # fill this cell in all ways possible, and continue recursively to the next cell:       
-        for i in range(9):
+        for i in range(size):
             if possible[i]:
                 b[row][col]=i+1
                 if dfs(*nextcell(row,col)):
@@ -661,12 +1356,21 @@ def check_unicity(board_to_solve, verbose=False):
     return (len(sols) == 1), sols
 
 if __name__ == "__main__":
-    _opts, args = getopt(argv[1:],"hepl:",["link=","editor","passive"])
+    _opts, args = getopt(argv[1:],"hepl:s:b:c:t:",["link=","editor","passive","session=","board=","script=","echo","trace=","profile=",
+        "sampling","record="])
     opts = dict(_opts)
     listoflists = None
     if '-h' in opts:
-        print("python sudoku.py {--link <link>} {--editor}")
+        print("python sudoku.py {--link <link>} {--board <81 digits, or 16/256/625 symbols>} {--editor} {--session <file>} {--passive}"
+            " {--script <file or -> {--echo}} {--trace <file>} {--profile <file> {--sampling}} {--record <file>}")
     for opt, arg in opts.items():
+        if opt == '-b' or opt == '--board': # the puzzle on the command line: no network, nothing else to load
+            try:
+                listoflists = boardio.init_board_from_line(arg)
+            except ValueError as e:
+                print(f"ERROR: {str(e)}")
+                print("Initializing empty board...")
+                listoflists = [[0 for _ in range(9)] for _ in range(9)]
         if opt == '-l' or opt == "--link":
             try:
                 listoflists = boardio.fetch_puzzle(arg)
@@ -678,15 +1382,17 @@ if __name__ == "__main__":
         if opt == '-e' or opt == '--editor':
             print("Starting sudoku editor. Press 'h' for help. Press 'q' to start the solving process.")
             listoflists = boardio.edit_sudoku(listoflists)
-    if listoflists != None:
+    script = opts.get('-c', opts.get('--script')) # a file of commands, or '-' for the standard input
+    echo = '--echo' in opts
+    session = opts.get('-s', opts.get('--session'))
+    passive = ('-p' in opts) or ("--passive" in opts)
+    if session is not None:
+        su = Sudoku.from_session(session)
+    elif listoflists != None:
         su = Sudoku(board=listoflists)
-        if ('-p' in opts) or ("--passive" in opts):
-            su.solve()
-            boardio.print_board(su.board)
-        else:
-            su.interactive_solve()
     else:
-        sud = Sudoku(board=[[0, 0, 8, 0, 0, 0, 6, 0, 3],
+        passive = False
+        su = Sudoku(board=[[0, 0, 8, 0, 0, 0, 6, 0, 3],
             [0, 2, 0, 0, 0, 9, 0, 0, 0],
             [0, 0, 0, 8, 0, 0, 4, 5, 0],
             [8, 5, 6, 0, 7, 0, 0, 0, 0],
@@ -695,7 +1401,28 @@ if __name__ == "__main__":
             [0, 8, 7, 0, 0, 6, 0, 0, 0],
             [0, 0, 0, 3, 0, 0, 0, 8, 0],
             [2, 0, 3, 0, 0, 0, 1, 0, 0]])
-        sud.interactive_solve()
+    trace = opts.get('-t', opts.get('--trace'))
+    if trace is not None: # trace the whole run
+        su.start_trace(trace)
+    if '--record' in opts: # record the commands of the interactive solver
+        su.start_recording(opts['--record'])
+    if '--profile' in opts: # profile the passive solve, or the first solve or step of the interactive solver
+        su.profile_next(opts['--profile'], 'sampling' if '--sampling' in opts else 'deterministic')
+    if passive and session is not None:
+        su.print_stats()
+    elif passive:
+        with su.profiled('solve'):
+            su.solve()
+        boardio.print_board(su.board)
+    elif script == '-':
+        su.interactive_solve(sys.stdin, echo)
+    elif script is not None:
+        with open(script, encoding='utf-8') as file:
+            su.interactive_solve(file, echo)
+    else:
+        su.interactive_solve(None, echo)
+    su.stop_trace()
+    su.stop_recording()
     if False: # TODO: move this to a different file?
         # solve test
         print("--- Testing solve()")
@@ -0,0 +1,107 @@
+# ==========================================================
+#       DELTA-ENCODED HISTORY OF THE BOARD FOR PLAYBACK
+# ==========================================================
+import functools
+import math
+
+from tracker import CantBe, Deduction
+from util import bits, cell_section
+
+@functools.lru_cache(maxsize=None)
+def peers(size):
+    '''`peers(size)[i]`: the indices of the cells in the same row, column or section as cell i (in row-major order) of a `size`×`size`
+    board, including i itself.'''
+    box = math.isqrt(size)
+    return [tuple(j for j in range(size*size) if j//size == i//size or j%size == i%size or
+        cell_section(j//size, j%size, box) == cell_section(i//size, i%size, box)) for i in range(size*size)]
+
+class Timeline:
+    '''Stores how the board and the allowed values changed during the proof, lemma by lemma, for playback. Only the lemmas which change
+    something are stored, as events: `(proofstep, lemma_idx, fill, row, col, value)`, where `fill` tells whether `value` is written into
+    the cell, or only banned from it. A full state is saved as a keyframe before every `keyframe_interval`-th event, so any state can be
+    reconstructed by replaying at most `keyframe_interval` events from the nearest keyframe.\\
+    The timeline is built lazily: proofsteps are only processed when a state in them (or after them) is first requested.\n
+    A state is a `(board, masks)` pair of lists of length 81 (`size*size` on other boards, in row-major order), where `masks[i]` has its bit `v` set if `v` can still
+    be written in cell `i`.'''
+    def __init__(self, starting_board, proof, keyframe_interval=64):
+        self.proof = proof
+        self.keyframe_interval = keyframe_interval
+        self.events = []
+        self.step_start = [] # index of the first event of each processed proofstep
+        self.size = size = len(starting_board)
+        self.peers = peers(size)
+        # the state at the start
+        board = [0]*(size*size)
+        masks = [(1 << size+1) - 2]*(size*size)
+        for r in range(size):
+            for c in range(size):
+                if starting_board[r][c] != 0:
+                    self._fill(board, masks, size*r+c, starting_board[r][c])
+        self.start = (tuple(board), tuple(masks))
+        self.keyframes = [] # keyframes[j] is the state before event j*keyframe_interval
+        self._head = (board, masks) # state after the last processed event
+
+    def _fill(self, board, masks, i, value):
+        board[i] = value
+        bit = ~(1 << value)
+        for j in self.peers[i]:
+            masks[j] &= bit
+        masks[i] = 0
+
+    def _apply(self, board, masks, event):
+        _, _, fill, r, c, value = event
+        if fill:
+            self._fill(board, masks, self.size*r+c, value)
+        else:
+            masks[self.size*r+c] &= ~(1 << value)
+
+    def _extend(self, proofstep):
+        '''Process proofsteps until `proofstep` (inclusive) is processed.'''
+        board, masks = self._head
+        while len(self.step_start) <= proofstep:
+            p = len(self.step_start)
+            self.step_start.append(len(self.events))
+            for i, lemma in enumerate(self.proof[p].proof):
+                if not isinstance(lemma, Deduction):
+                    continue
+                r, c = lemma.result.get_pos()
+                fill = not isinstance(lemma.result, CantBe) # isinstance(lemma.result, MustBe)
+                if not fill and not (masks[self.size*r+c] >> lemma.result.value) & 1: # already banned, nothing changes
+                    continue
+                if len(self.events) % self.keyframe_interval == 0:
+                    self.keyframes.append((tuple(board), tuple(masks)))
+                event = (p, i, fill, r, c, lemma.result.value)
+                self._apply(board, masks, event)
+                self.events.append(event)
+
+    def lemma_count(self, proofstep):
+        '''Returns the number of lemmas in `proofstep` which change the state of the board.'''
+        self._extend(proofstep)
+        end = self.step_start[proofstep+1] if proofstep+1 < len(self.step_start) else len(self.events)
+        return end - self.step_start[proofstep]
+
+    def state(self, proofstep, lemma):
+        '''Returns the state after the `lemma`th event of `proofstep` as a `(board, possibles, position, lemma_string)` tuple, where `board` is
+        a `list` of `list`s, `possibles[r][c]` is a `list` of the values which can be written in `(r, c)`, and `position` is the cell this
+        lemma talks about.'''
+        self._extend(proofstep)
+        e = self.step_start[proofstep] + lemma
+        k = (e+1) // self.keyframe_interval # the keyframe right after this event, if it exists...
+        if k >= len(self.keyframes):
+            k = e // self.keyframe_interval # ...otherwise the one before it
+        board, masks = (list(a) for a in self.keyframes[k])
+        first = k * self.keyframe_interval
+        for event in self.events[first:e+1]:
+            self._apply(board, masks, event)
+        p, i, _, r, c, _ = self.events[e]
+        step = self.proof[p]
+        return self._to_lists(board, masks) + ((r, c), step.render((i, step.proof[i], None)))
+
+    def start_state(self):
+        '''Returns the `(board, possibles)` of the starting board (see `state()`).'''
+        return self._to_lists(*self.start)
+
+    def _to_lists(self, board, masks):
+        size = self.size
+        return ([list(board[size*r:size*r+size]) for r in range(size)],
+            [[bits(masks[size*r+c]) for c in range(size)] for r in range(size)])
@@ -0,0 +1,64 @@
+# ==========================================
+#       TRACING SOLVES
+# ==========================================
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+class Tracer:
+    '''Records where a solve spends its time as spans (named intervals with a category and optional arguments) and counters, and writes
+    them in the Chrome trace-event format, which can be opened in `chrome://tracing` or https://ui.perfetto.dev.\\
+    Spans are recorded with `clock()` at their start and `complete()` at their end (or with the `span()` context manager), so code which
+    is not traced only pays for checking whether there is a tracer at all.'''
+    def __init__(self, path=None):
+        self.path = path # where save() writes the trace by default
+        self.events = []
+        self.counts = Counter()
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+
+    def clock(self):
+        return time.perf_counter()
+
+    def complete(self, name, category, start, args=None):
+        '''Record the span `name` which started at `start` (a value of `clock()`) and ends now.'''
+        end = time.perf_counter()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+            'pid': self.pid, 'tid': threading.get_native_id()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def instant(self, name, category, args=None):
+        '''Record an event without duration, which happens now.'''
+        event = {'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': (time.perf_counter() - self.origin) * 1e6,
+            'pid': self.pid, 'tid': threading.get_native_id()}
+        if args:
+            event['args'] = args
+        self.events.append(event)
+
+    def count(self, name, n=1):
+        '''Increase the counter `name`; the counters are saved with the trace, and shown as a counter track too.'''
+        self.counts[name] += n
+        self.events.append({'name': name, 'ph': 'C', 'ts': (time.perf_counter() - self.origin) * 1e6, 'pid': self.pid,
+            'args': {name: self.counts[name]}})
+
+    @contextlib.contextmanager
+    def span(self, name, category, args=None):
+        '''Record the `with` block as the span `name`. `args` (a `dict`) may still be filled in inside the block.'''
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            self.complete(name, category, start, args)
+
+    def to_json(self):
+        return {'traceEvents': self.events, 'displayTimeUnit': 'ms', 'otherData': {'counts': dict(self.counts)}}
+
+    def save(self, path=None):
+        '''Write the trace to `path` (default: the path given at creation).'''
+        with open(path or self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f)
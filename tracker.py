@@ -4,26 +4,48 @@
 #               PRETTY PRINTING PROOFS
 # =======================================================
 
+import time
+import hashlib
+import json
+from collections import OrderedDict
 from util import local_to_global
-import pulp as pl # type: ignore
+from ipsolver import IPModel, Status, backends
 
 # >>> KNOWLEDGE CLASSES
 class Knowledge:
     '''Contains some information about a cell that can help solve the sudoku. Stores a `value` and a `position`, which signify different things
-    in each subclass. All derived classes must implement a `__str__` method.'''
-    def __init__(self, position, value, coordtype="cell"):
-        '''Initiates a `Knowledge` instance. `position` tells which cell this knowledge talks about. It can be given in multiple coordinate
-        systems. 
+    in each subclass. All derived classes must implement a `__str__` method.\\
+    Instances are immutable and interned: creating the same `(class, coordtype, position, value, box)` twice returns the same object, so
+    storing them costs nothing after the first time, and the hash is only calculated once.'''
+    __slots__ = ('position', 'value', 'coordtype', 'box', '_hash')
+    _interned = {} # (class, coordtype, position, value, box) -> instance; shared by all subclasses
+
+    def __new__(cls, position, value, coordtype="cell", box=3):
+        '''Returns the (interned) `Knowledge` instance with the given data. `position` tells which cell this knowledge talks about. It can be
+        given in multiple coordinate systems. 
         -   `"cell"` means `(0-8,0-8)` tuple,
         -   `"rowpos"` means `(row_idx, col_idx)` tuple,
         -   `"colpos"` means `(col_idx, row_idx)` tuple,
-        -   `"secpos"` means `(sec_idx, (0-3,0-3))` tuple.'''
-        self.position = position
-        self.value = value
-        self.coordtype = coordtype
+        -   `"secpos"` means `(sec_idx, (0-3,0-3))` tuple.\\
+        `box` is the size of the sections of the board (see `util.py`): it is only needed to find the cell of `"secpos"` positions.'''
+        key = (cls, coordtype, position, value, box)
+        self = Knowledge._interned.get(key)
+        if self is None:
+            self = object.__new__(cls)
+            self.position = position
+            self.value = value
+            self.coordtype = coordtype
+            self.box = box
+            self._hash = hash((value, position, coordtype))
+            Knowledge._interned[key] = self
+        return self
+    
+    def __reduce__(self):
+        # unpickling goes through __new__ again, so interning is kept across processes too
+        return (self.__class__, (self.position, self.value, self.coordtype, self.box))
     
     def get_pos(self):
-        '''Returns the position of the cell this object stores information about in the 9×9 grid.'''
+        '''Returns the position of the cell this object stores information about in the grid.'''
         if self.coordtype == "cell":
             return self.position
         elif self.coordtype == "rowpos":
@@ -31,42 +53,56 @@ class Knowledge:
         elif self.coordtype == "colpos":
             return self.position[1], self.position[0]
         elif self.coordtype == "secpos":
-            return local_to_global(self.position[0], *self.position[1])
+            return local_to_global(self.position[0], *self.position[1], self.box)
     
     def __eq__(self, other):
-        return (self.__class__ == other.__class__) and \
+        return (self is other) or ((self.__class__ == other.__class__) and \
             (self.value == other.value) and \
             (self.position == other.position) and \
-            (self.coordtype == other.coordtype)
+            (self.coordtype == other.coordtype) and \
+            (self.box == other.box))
     
     def __hash__(self):
-        return hash((self.value, self.position, self.coordtype))
+        return self._hash
 
 class IsValue(Knowledge):
     '''Says that this cell is already filled with this value'''
+    __slots__ = ()
     def __str__(self):
         return f"{self.get_pos()} is {self.value}"
 
 class MustBe(Knowledge):
     '''Says that this cell should contain this value.'''
+    __slots__ = ()
     def __str__(self):
         return f"{self.get_pos()} must be {self.value}"
 
 class CantBe(Knowledge):
     '''Says that this cell can't contain this value because it is restricted for some reason.'''
+    __slots__ = ()
     def __str__(self):
         return f"{self.get_pos()} can't be {self.value}"
 
 # >>> DEDUCTION CLASSES
 class Consequence:
     '''Stores the reasons for a given deduction. This is a separate class, because a given deduction may have multiple proofs.'''
+    __slots__ = ('rule', 'of', 'details', '_hash')
     def __init__(self, of, rule, details=None):
-        '''Initiates a `Consequence` object. `rule` is a string id of the rule being applied. `of` is a `list` of 
-        `Knowledge` or `Deduction` instances, which imply the result. `details` may store additional info about the deduction
-        (such as which are the two cells we use `<naked pairs>` for).'''
+        '''Initiates a `Consequence` object. `rule` is a string id of the rule being applied. `of` is an iterable of 
+        `Knowledge` or `Deduction` instances, which imply the result: it is stored as a `tuple` without duplicates. `details` may store
+        additional info about the deduction (such as which are the two cells we use `<naked pairs>` for).'''
         self.rule = rule
-        self.of = list(set(of))
+        self.of = tuple(dict.fromkeys(of))
         self.details = details
+        self._hash = hash((rule, self.of))
+    
+    def __getstate__(self):
+        return (self.rule, self.of, self.details)
+    
+    def __setstate__(self, state):
+        # the hash depends on object ids and string hashes, so it is recalculated in the new process
+        self.rule, self.of, self.details = state
+        self._hash = hash((self.rule, self.of))
     
     def __str__(self):
         if self.rule == 'deus_ex':
@@ -103,16 +139,19 @@ class Consequence:
             return 'because UNDEFINED RULE'
     
     def __eq__(self, other):
-        return (self.__class__ == other.__class__) and \
-            (set(self.rule) == set(other.rule)) and \
+        return (self is other) or ((self.__class__ == other.__class__) and \
+            (self._hash == other._hash) and \
+            (self.rule == other.rule) and \
             (self.of == other.of) and \
-            (self.details == other.details)
+            (self.details == other.details))
     
     def __hash__(self):
-        return hash((self.rule, tuple(self.of)))
+        return self._hash
 
 class Deduction:
-    '''Stores a `Knowledge` achieved by deduction with the possible ways to deduce this information.'''
+    '''Stores a `Knowledge` achieved by deduction with the possible ways to deduce this information. Two `Deduction`s are only equal
+    if they are the same object (the default `object` equality and hash), which also stops infinite recursion when hashing.'''
+    __slots__ = ('result', 'consequence_of')
     def __init__(self, consequence_of, result):
         '''Initiates a `Deduction object`. `consequence_of` is a list of `Consequence` instances, `result` is the knowledge deduced.'''
         self.result = result
@@ -130,12 +169,227 @@ class Deduction:
         When `None`, it defaults to the first possible `Consequence`'''
         if chosen_consequence is None: chosen_consequence = self.consequence_of[0]
         return str(self.result)+", "+str(chosen_consequence)
+
+# >>> MEMORY
+def reachable_deductions(roots):
+    '''Returns the `set` of `Deduction`s reachable from `roots` (an iterable of `Knowledge`/`Deduction` instances) through any of their
+    `Consequence`s.'''
+    seen = set()
+    stack = []
+    for root in roots:
+        if isinstance(root, Deduction) and root not in seen:
+            seen.add(root)
+            stack.append(root)
+    while stack:
+        for cons in stack.pop().consequence_of:
+            for info in cons.of:
+                if isinstance(info, Deduction) and info not in seen:
+                    seen.add(info)
+                    stack.append(info)
+    return seen
+
+def graph_size(deductions):
+    '''Returns the number of `Deduction`s, `Consequence`s and edges (references from a `Consequence` to the `Knowledge`/`Deduction` it uses)
+    in the graph of `deductions`, a `set` closed under reachability (see `reachable_deductions()`).'''
+    consequences = edges = 0
+    for ded in deductions:
+        consequences += len(ded.consequence_of)
+        for cons in ded.consequence_of:
+            edges += len(cons.of)
+    return len(deductions), consequences, edges
+
+def prune_history(live, steps):
+    '''Forgets the parts of the proof graph which can not be used anymore: the `Deduction`s which are not in `live` (the `set` of
+    `Deduction`s which later deductions may still refer to) are only kept alive by the `ProofStep`s in `steps`, which only need the
+    `Consequence` they have chosen. So the other `Consequence`s of these are dropped (except a `deus_ex` one in the first place, which is
+    reported by `ProofStep.deus_ex_steps()`), along with everything only they referred to. Returns the number of dropped `Consequence`s.'''
+    chosen = {} # Deduction not in live -> ids of its Consequences chosen by some ProofStep
+    for step in steps:
+        used = [lemma for lemma in step.proof if isinstance(lemma, Deduction)]
+        if len(step.chosen_reasons) > len(used): # resolutions tried while choosing, but not used in the proof
+            step.chosen_reasons = {lemma: step.chosen_reasons[lemma] for lemma in used}
+        for ded, cons in step.chosen_reasons.items():
+            if ded not in live:
+                chosen.setdefault(ded, set()).add(id(cons))
+    dropped = 0
+    for ded, ids in chosen.items():
+        if len(ded.consequence_of) > len(ids):
+            kept = [cons for i, cons in enumerate(ded.consequence_of) if id(cons) in ids or (i == 0 and cons.rule == 'deus_ex')]
+            dropped += len(ded.consequence_of) - len(kept)
+            ded.consequence_of = kept
+    return dropped
+
+class TimeBudget:
+    '''A time limit for a whole solve, which is distributed among the k-optimizations of the `ProofStep`s. Each step gets a share of the
+    remaining time proportional to the size of its graph, compared to the expected size of the graphs of the cells still to be filled. The
+    share is calculated from the time actually left, so whatever an easy step doesn't use is given to the later steps.'''
+    min_step_limit = 0.05 # if less time than this remains for a step, the IP solver is not even started
+
+    def __init__(self, total):
+        '''`total` is the time limit of the whole solve in seconds, starting now.'''
+        self.total = total
+        self.deadline = time.monotonic() + total # (a clock which is not changed by adjustments of the wall clock, like `Deadline`)
+        self.graph_size_sum = 0 # sum of the graph sizes seen so far; used to estimate the sizes of future graphs
+        self.steps = 0
     
-    def __eq__(self, other):
-        return id(self) == id(other)
+    def remaining(self):
+        '''Returns how many seconds are left until the deadline (never negative).'''
+        return max(0.0, self.deadline - time.monotonic())
     
-    def __hash__(self):
-        return hash(id(self)) # len: stop infinite recursion HERE!
+    def step_limit(self, graph_size, remaining_cells):
+        '''Returns the time (in seconds) the IP solver may use for a step whose acyclic graph contains `graph_size` `Deduction`s, if 
+        `remaining_cells` cells (including this one) are still empty.'''
+        self.graph_size_sum += graph_size
+        self.steps += 1
+        expected = graph_size + max(remaining_cells-1, 0) * self.graph_size_sum / self.steps
+        return self.remaining() * (graph_size / expected if expected > 0 else 1.0)
+
+class DeadlineExceeded(Exception):
+    '''Raised by `Deadline.check()` if the deadline has passed or the solve was cancelled.'''
+
+class Deadline:
+    '''A deadline and cancellation token of a solve. The solver checks it between deduction rules and inside their long loops (raising
+    `DeadlineExceeded` there), and k-optimization is never given more time than what is left. `cancel()` may be called from another thread
+    to stop the solve at the next check. `seconds=None` means there is no deadline, only cancellation.'''
+    def __init__(self, seconds=None):
+        self.end = None if seconds is None else time.monotonic() + seconds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self):
+        '''Returns how many seconds are left (never negative), or `None` if there is no deadline.'''
+        if self.cancelled:
+            return 0.0
+        return None if self.end is None else max(0.0, self.end - time.monotonic())
+
+    def expired(self):
+        return self.cancelled or (self.end is not None and time.monotonic() >= self.end)
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded()
+
+class KOptCache:
+    '''An LRU cache of k-optimization results. The keys are structural hashes of the acyclic graph below a filler `Deduction` (see
+    `ProofStep._structural_key()`), the values are `(k, resolution, ip_time)` tuples, where `resolution` maps the keys of the `Deduction`s
+    in the optimal proof to the keys of their chosen `Consequence`s, and `ip_time` is the time it took to find this with the IP solver.
+    Can be saved to and loaded from disk, so results may be reused between sessions.'''
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.entries = OrderedDict() # key -> (k, resolution, ip_time), least recently used first
+    
+    def get(self, key):
+        '''Returns the entry stored for `key`, or `None` if there is none.'''
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+    
+    def put(self, key, k, resolution, ip_time):
+        '''Store a result, and forget the least recently used one if the cache is full.'''
+        self.entries[key] = (k, resolution, ip_time)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+    
+    def clear(self):
+        self.entries.clear()
+    
+    # The file format is JSON: {"format": "kopt-cache", "version": 1, "entries": [[<key>, <k>, {<key>: <key>, ...}, <ip_time>], ...]},
+    # with the keys (16 byte digests) written in hexadecimal, from the least recently used entry to the most recently used one.
+    FORMAT = 'kopt-cache'
+    VERSION = 1
+
+    def save(self, path):
+        '''Save the contents of the cache to the file `path`.'''
+        entries = [[key.hex(), k, {ded.hex(): cons.hex() for ded, cons in resolution.items()}, ip_time]
+            for key, (k, resolution, ip_time) in self.entries.items()]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'format': KOptCache.FORMAT, 'version': KOptCache.VERSION, 'entries': entries}, f, separators=(',', ':'))
+    
+    def load(self, path):
+        '''Add the entries saved in the file `path` to the cache. Raises `ValueError` if the file is not a valid cache file (in which case
+        nothing is added).'''
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+            except ValueError: # not JSON (e.g. a cache saved by an earlier version with pickle), or not even text
+                data = None
+        if not isinstance(data, dict) or data.get('format') != KOptCache.FORMAT or not isinstance(data.get('entries'), list):
+            raise ValueError(f"{path} is not a k-optimization cache file.")
+        if data.get('version') != KOptCache.VERSION:
+            raise ValueError(f"{path} has unsupported cache format version {data.get('version')}.")
+        def digest(text):
+            if not isinstance(text, str) or len(text) != 32:
+                raise ValueError(f"{path} contains an invalid key: {text!r}")
+            return bytes.fromhex(text)
+        entries = []
+        for entry in data['entries']:
+            if not isinstance(entry, list) or len(entry) != 4:
+                raise ValueError(f"{path} contains an invalid entry: {entry!r}")
+            key, k, resolution, ip_time = entry
+            if type(k) is not int or k < 0 or not isinstance(resolution, dict) or type(ip_time) not in (int, float) or ip_time < 0:
+                raise ValueError(f"{path} contains an invalid entry: {entry!r}")
+            entries.append((digest(key), k, {digest(ded): digest(cons) for ded, cons in resolution.items()}, ip_time))
+        for entry in entries:
+            self.put(*entry)
+    
+    def __len__(self):
+        return len(self.entries)
+
+kopt_cache = KOptCache() # shared by all solves, so structures repeating across puzzles are found too
+
+def make_acyclic(deductions, allowed_paths=None):
+    '''Calculate `allowed_paths` for the graph grown from the roots in `deductions`: for each `Deduction` check which `Consequence`s don't
+    lead to cycles, and store them in `allowed_paths[ded]`, a `list`. Only `Deduction`s which can be resolved get an entry, so it serves as
+    a "resolved" set too. Return `(allowed_paths, approximation)`, where `approximation` is `True` if some `Consequence`s had to be dropped
+    because of cycles.\\
+    The graph is walked with an explicit stack instead of recursion, so deep graphs (tens of thousands of nodes) don't hit the recursion
+    limit. A `Deduction` is unresolvable if it is on the current path already; as this depends on the path, failures are not memoized.'''
+    if allowed_paths is None:
+        allowed_paths = {}
+    approximation = False
+    stack = set() # Deductions on the current path
+    for root in deductions:
+        if root in allowed_paths or isinstance(root, Knowledge):
+            continue
+        frames = [[root, 0, 0, []]] # [Deduction, index of Consequence, index in Consequence.of, possibles]
+        stack.add(root)
+        while frames:
+            frame = frames[-1]
+            step, ci, ii, possibles = frame
+            if ci == len(step.consequence_of): # every reasoning was checked: this Deduction is finished
+                frames.pop()
+                stack.remove(step)
+                if len(possibles) > 0:
+                    allowed_paths[step] = possibles
+                if len(frames) == 0:
+                    break
+                frame = frames[-1] # hand the result to the Deduction waiting for it
+                resolved = len(possibles) > 0
+            else:
+                cons = step.consequence_of[ci]
+                if ii == len(cons.of): # all predicates can be peacefully resolved
+                    possibles.append(cons)
+                    frame[1], frame[2] = ci+1, 0
+                    continue
+                info = cons.of[ii]
+                if info in stack:
+                    resolved = False
+                elif info in allowed_paths or isinstance(info, Knowledge):
+                    resolved = True
+                else: # descend
+                    stack.add(info)
+                    frames.append([info, 0, 0, []])
+                    continue
+            if resolved: # go on to the next predicate
+                frame[2] += 1
+            else: # this reasoning leads to a cycle, go on to the next one
+                approximation = True
+                frame[1], frame[2] = frame[1]+1, 0
+    return allowed_paths, approximation
 
 class ProofStep:
     '''Describes the reasoning behind filling a particular cell. Stores a list with the steps of the proof in order.\\
@@ -160,136 +414,238 @@ class ProofStep:
         was not acyclic), then this is `True`.
     `greedy`: `bool`\\
     >   Was this a greedy step? This was a greedy step, if we filled in the first cell we could fill immediately, without looking for other
-    (possibly better) options. This is not calculated here, merely saved in this data structure.'''
-    def __init__(self, deductions, k_opt=False, ip_time_limit=None, greedy_deduction=None):
-        '''Initiates a `ProofStep` instance wrapping a deduction from `deductions`. Accepts a set of deductions, and chooses one to use.\n
+    (possibly better) options. This is not calculated here, merely saved in this data structure.
+    `ip_time_limit`: `float`\\
+    >   The time limit the IP solver was given in this step in seconds (`None` if unlimited or if it wasn't run).
+    `ip_time`: `float`\\
+    >   How much time the IP solver actually used in seconds.
+    `timed_out`: `bool`\\
+    >   Did the IP solver run out of time? In this case the best solution found so far is used, or if there was no time to run the solver
+    at all, the step is made without k-optimization.
+    `cache_hits`, `cache_misses`: `int`\\
+    >   How many filler `Deduction`s were (not) found in the `KOptCache`?
+    `cache_saved_time`: `float`\\
+    >   How much IP solving time was saved by the cache (estimated by the time the cached result took to calculate).'''
+    def __init__(self, deductions, k_opt=False, ip_time_limit=None, greedy_deduction=None, budget=None, remaining_cells=1, cache=None,
+        backend='cbc', deadline=None, tracer=None):
+        '''Initiates a `ProofStep` instance wrapping a deduction from `deductions`, a `dict` used as an ordered set (`Deduction` -> None),
+        and chooses one to use. Ties between equally good deductions are broken by this order.\n
         If `k_opt` is `True`, it attempt to fill the cell which requires the least amount of knowledge. Otherwise it fills the
         first cell. Before k-optimizing, the dependency structure of the proof will be made acyclic: this may set `approximation` to `True`, as
         there's no guarantee that this process doesn't eliminate the best case. `ip_time_limit` is the time limit in seconds for the IP solver 
         used in k-optimization; `None` means unlimited time. If `greedy_deduction` is not `None`, this will be considered a greedy step: 
         `self.k_opt` will be set to `k_opt`, but IP-k-optimization will be skipped and `greedy_decution` will be chosen as the selected
-        `Deduction`.'''
+        `Deduction`. If `budget` (a `TimeBudget`) is given, the time limit will be the share of the budget this step gets (or `ip_time_limit`,
+        if it is smaller); `remaining_cells` is the number of empty cells, which is used for calculating this share. If `cache` (a `KOptCache`)
+        is given, the optimal proofs of filler `Deduction`s are looked up there before building the IP problem, and new optimal results are
+        stored in it. `backend` is the name of the IP solver backend to use (see `ipsolver.backends`). If `deadline` (a `Deadline`) is given,
+        the IP solver is not given more time than what is left until it. If `tracer` (a `tracing.Tracer`) is given, the phases of the
+        construction are recorded as spans.'''
         self.proof_order = {}
         self.proof = []
         self.k = 0
         self.chosen_reasons = {}
         self.approximation = False
+        self.ip_time_limit = None
+        self.ip_time = 0
+        self.timed_out = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_saved_time = 0
         self.greedy = (greedy_deduction is not None)
         old_kopt = k_opt # turn off k_opt, if greedy
         if self.greedy: k_opt = False
         # ^this may be set to True later on!
         chosen_deduction = None # which value of `deductions` will we use?
         if k_opt:
-            allowed_paths = {} # Deduction -> list(Consequence): which Consequences may be used without causing cycles?
-            #   only contain Deductions which can be resolved; serves as a "resolved" set too
-            stack = set()
             # REMOVE CYCLES
-            for ded in deductions:
-                self._make_acyclic(ded, stack, allowed_paths)
+            start = tracer.clock() if tracer is not None else 0
+            allowed_paths, approximation = make_acyclic(deductions) # Deduction -> list(Consequence): which Consequences may be used
+            #   without causing cycles? only contain Deductions which can be resolved; serves as a "resolved" set too
+            if tracer is not None:
+                tracer.complete('make_acyclic', 'proofstep', start, {'deductions': len(allowed_paths)})
+            self.approximation |= approximation
+            # DECIDE TIME LIMIT
+            self.ip_time_limit = ip_time_limit
+            shares = [] # time limits coming from the whole solve
+            if budget is not None:
+                shares.append(budget.step_limit(len(allowed_paths), remaining_cells))
+            if deadline is not None and deadline.remaining() is not None:
+                shares.append(deadline.remaining())
+            if shares:
+                self.ip_time_limit = min(shares) if ip_time_limit is None else min(*shares, ip_time_limit)
+                if self.ip_time_limit < TimeBudget.min_step_limit: # no time left: skip k-optimization
+                    self.timed_out = True
+                    k_opt = False
+        to_cache = None # filler Deduction whose optimal proof should be stored in `cache`
+        if k_opt:
+            # CONSULT CACHE
+            keys = {} # Knowledge/Deduction/Consequence -> structural key; only calculated if there is a cache
+            cached = {} # filler Deduction -> cache entry
+            if cache is not None:
+                start = tracer.clock() if tracer is not None else 0
+                for ded in deductions:
+                    entry = cache.get(self._structural_key(ded, allowed_paths, keys))
+                    if entry is None:
+                        self.cache_misses += 1
+                    else:
+                        self.cache_hits += 1
+                        cached[ded] = entry
+            if len(cached) == len(deductions): # every optimum is known already: no need for the IP solver
+                chosen_deduction = min(cached, key=lambda ded: cached[ded][0])
+                self._choose_resolution_from_cache(chosen_deduction, cached[chosen_deduction][1], allowed_paths, keys)
+                self.cache_saved_time = cached[chosen_deduction][2]
+            if cache is not None and tracer is not None:
+                tracer.complete('cache_lookup', 'proofstep', start, {'hits': self.cache_hits, 'misses': self.cache_misses})
+        if k_opt and chosen_deduction is None:
             # CREATE IP PROBLEM
-            prob = pl.LpProblem(name='k-optimize') # LP problem
-            isvalue_used = [] # list of LpBinary, containing all LpBinary-s corresponding to IsValue instances
-            # final_deductions = {} # filler_deduction -> LpBinary; see below
-            knowledge_used = {} # Knowledge/Deduction -> LpBinary dict, collecting all variables describing knowledge usage
-            reasons_chosen = {} # Deduction -> {Consequence -> LpBinary}
-            # CREATE CONSTRAINTS & VARIABLES
-            final_deductions = {ded: self._add_to_lp_problem(ded,prob,knowledge_used,isvalue_used,reasons_chosen,allowed_paths)
-                for ded in deductions}
+            start = tracer.clock() if tracer is not None else 0
+            model = IPModel() # 0-1 integer program
+            knowledge_used = {} # Knowledge/Deduction -> variable index, collecting all variables describing knowledge usage
+            reasons_chosen = {} # Deduction -> {Consequence -> variable index}
+            # CREATE CONSTRAINTS & VARIABLES (the cost of each IsValue variable is 1, so the objective is k)
+            final_deductions = {ded: self._add_to_ip_model(ded,model,knowledge_used,reasons_chosen,allowed_paths)
+                for ded in deductions if ded not in cached}
+            # > only 1 cell is filled in the optimum, so a cached filler can be a single variable costing its known k
+            cached_used = {ded: model.add_variable(cost=cached[ded][0]) for ded in cached}
             # > fill at least 1 cell
-            prob += (pl.lpSum((v for v in final_deductions.values())) >= 1)
-            # > optimize for minimal k
-            prob += pl.lpSum((v for v in isvalue_used))
+            model.add_constraint([(v, 1) for v in final_deductions.values()] + [(v, 1) for v in cached_used.values()], 1)
+            if tracer is not None:
+                tracer.complete('ip_build', 'proofstep', start, {'variables': len(model.costs), 'constraints': len(model.lower)})
             # SOLVE IP PROBLEM
-            if prob.solve(pl.PULP_CBC_CMD(msg=0,timeLimit=ip_time_limit)) == 1: # if solve failed: revert to bruteforce
+            timestamp = time.time()
+            start = tracer.clock() if tracer is not None else 0
+            status, values = backends[backend](model, self.ip_time_limit)
+            self.ip_time = time.time() - timestamp
+            if tracer is not None:
+                tracer.complete('ip_solve', 'proofstep', start, {'backend': backend, 'status': status, 'time_limit': self.ip_time_limit})
+            if status == Status.FEASIBLE: # ran out of time, but found a solution: use the best one found
+                self.timed_out = True
+                self.approximation = True
+            if status in (Status.OPTIMAL, Status.FEASIBLE): # if no solution was found: revert to bruteforce
                 # CONVERT SOLUTION TO PROOFSTEP
                 for ded in deductions:
-                    if pl.value(knowledge_used[ded]) == 1.0:
-                        self._choose_resolution_by_IP(ded, reasons_chosen, allowed_paths)
+                    if ded in cached:
+                        if values[cached_used[ded]] > 0.5:
+                            self._choose_resolution_from_cache(ded, cached[ded][1], allowed_paths, keys)
+                            self.cache_saved_time = max(0, cached[ded][2] - self.ip_time)
+                            chosen_deduction = ded
+                            break
+                    elif values[knowledge_used[ded]] > 0.5:
+                        self._choose_resolution_by_IP(ded, values, reasons_chosen, allowed_paths)
                         chosen_deduction = ded
+                        if cache is not None and status == Status.OPTIMAL:
+                            to_cache = ded
                         break
             else:
-                print('ERROR: IP solver failed.')
+                self.timed_out = (status == Status.TIMED_OUT) # reported in the stats
+                if not self.timed_out:
+                    print('ERROR: IP solver failed.')
                 k_opt = False
         if not k_opt: # k_opt == False, or k-optimization failed miserably
             self.approximation = True
             chosen_deduction = next(iter(deductions)) if greedy_deduction is None else greedy_deduction
             # REMOVE CYCLES AND REDUNDANCY
+            start = tracer.clock() if tracer is not None else 0
             self._choose_resolution_greedy(chosen_deduction, stack=set(), resolved=set())
+            if tracer is not None:
+                tracer.complete('choose_greedy', 'proofstep', start)
         # CREATE TOPOLOGICAL ORDERING OF PROOF
+        start = tracer.clock() if tracer is not None else 0
         self._topological_ordering(chosen_deduction) # top. order
+        if tracer is not None:
+            tracer.complete('topological_ordering', 'proofstep', start, {'lemmas': len(self.proof), 'k': self.k})
+        if to_cache is not None:
+            cache.put(keys[to_cache], self.k, {keys[ded]: keys[cons] for ded, cons in self.chosen_reasons.items()}, self.ip_time)
         ProofStep._remove_fulfilled_deductions(deductions, chosen_deduction) # remove redundant goals
         self.position = chosen_deduction.result.get_pos() # save core info
         self.value = chosen_deduction.result.value
         self.k_opt = k_opt
         if self.greedy: self.k_opt = old_kopt
     
+    @classmethod
+    def restore(cls, proof, chosen_reasons, **attributes):
+        '''Recreate a saved `ProofStep` without solving anything (see `session.py`). `proof` is the list of lemmas in topological order,
+        `chosen_reasons` maps each `Deduction` in it to its `Consequence`; all other member variables are given in `attributes`.'''
+        step = cls.__new__(cls)
+        step.proof = proof
+        step.proof_order = {lemma: i for i, lemma in enumerate(proof)}
+        step.chosen_reasons = chosen_reasons
+        step.ip_time_limit = None
+        step.ip_time = 0
+        step.timed_out = False
+        step.cache_hits = 0
+        step.cache_misses = 0
+        step.cache_saved_time = 0
+        for name, value in attributes.items():
+            setattr(step, name, value)
+        return step
+
     # >>> __init__ HELPERS (RECURSIONS)
-    def _make_acyclic(self, step, stack, allowed_paths):
-        '''Calculate `allowed_paths`, so for each `Deduction` check which `Consequence`s don't lead to cycles, and store them in
-        `allowed_path[ded]`, a `list`. Return `True` if `step` can be resolved. The main goal of this function is to fill `allowed_paths` and
-        make it possible for the IP solver to solve the problem properly.\\
-        Of course, this function may be used instead of `_chose_resolution_greedy()` for `k_opt==False` too, but it would not eliminate the need
-        for a separate `choose_resolution` function for that case, and would deactivate some speedups implemented in `_chose_resolution_greedy()`
-        too.\n
-        `stack` is a set of the `step`s which depend on this `step`, and are currently being processed in the recursion. `allowed_paths` is a dict
-        that assignes to resolvable `Deduction`s the `Consequences` it can use to resolve itself.'''
-        if step in stack:
-            return False
-        elif step in allowed_paths:
-            return True
-        elif isinstance(step, Knowledge):
-            return True
-        stack.add(step)
-        possibles = []
-        for cons in step.consequence_of: # iterate over all possible reasonings...
-            for info in cons.of: # if all predicates can be peacefully resolved:
-                if not self._make_acyclic(info, stack, allowed_paths):
-                    self.approximation = True
-                    break
-            else:
-                possibles.append(cons)
-        stack.remove(step)
-        if len(possibles) == 0:
-            return False
-        allowed_paths[step] = possibles
-        return True
-    def _add_to_lp_problem(self, step, prob, knowledge_used, isvalue_used, reasons_chosen, allowed_paths):
-        '''Recursively add this `step` and everything it depends on to the LP problem (and save the new variables to the next 3 parameters).
+    def _add_to_ip_model(self, step, model, knowledge_used, reasons_chosen, allowed_paths):
+        '''Recursively add this `step` and everything it depends on to the IP `model` (and save the new variables to the next 2 parameters).
         This means create a variable for it and save its constraints. Returns with `knowledge_used[step]` for convenience reasons.\n
-        `knwoledge_used` is a `dict` that contains the IP variables for each `Knowledge/Deduction`\\
-        `isvalue_used` is a `list` of all IP variables which correspond to `IsValue` instances\\
-        `reasons_chosen` is a `dict(Deduction->dict(Consequence->IP_var))` structure\\
-        `allowed_paths` is a `dict` which tells for each `Deduction` which of its `Consequence`s can be used (calculated by `_make_acyclic()`)'''
+        `knwoledge_used` is a `dict` that contains the indices of the IP variables for each `Knowledge/Deduction`\\
+        `reasons_chosen` is a `dict(Deduction->dict(Consequence->variable_index))` structure\\
+        `allowed_paths` is a `dict` which tells for each `Deduction` which of its `Consequence`s can be used (calculated by `make_acyclic()`)'''
         if step in knowledge_used: # if this has already been visited and converted: return
             return knowledge_used[step]
-        ipvar = pl.LpVariable(name=f'd_{id(step)}',cat=pl.LpBinary)
+        ipvar = model.add_variable(cost=1 if isinstance(step, IsValue) else 0)
         knowledge_used[step] = ipvar # save
-        if isinstance(step, IsValue):
-            isvalue_used.append(ipvar)
         if isinstance(step, Knowledge):
             return ipvar
         # isinstance(step, Deduction)
         cipvars = {}
         for cons in allowed_paths[step]:
-            cipvar = pl.LpVariable(name=f'o_{id(cons)}',cat=pl.LpBinary)
+            cipvar = model.add_variable()
             cipvars[cons] = cipvar
             # > if we want to use a reasoning, we have to fulfill all its criteria
-            prob += (cipvar*(-len(cons.of)) + pl.lpSum((self._add_to_lp_problem(info,prob,knowledge_used,isvalue_used,reasons_chosen,allowed_paths)
-                for info in cons.of)) >= 0)
+            model.add_constraint([(cipvar, -len(cons.of))] + [(self._add_to_ip_model(info,model,knowledge_used,reasons_chosen,allowed_paths), 1)
+                for info in cons.of], 0)
         reasons_chosen[step] = cipvars # save these variables too for later use
         # > if we want to use this deduction, we have to use at least 1 of its reasonings
-        prob += (ipvar*(-1) + pl.lpSum((v for v in cipvars.values())) >= 0)
+        model.add_constraint([(ipvar, -1)] + [(v, 1) for v in cipvars.values()], 0)
         return ipvar
-    def _choose_resolution_by_IP(self, step, reasons_chosen, allowed_paths):
-        '''Convert the IP solution data of the `reasons_chosen` variable to a resolution of `step`'''
+    def _choose_resolution_by_IP(self, step, values, reasons_chosen, allowed_paths):
+        '''Convert the IP solution (`values` of the variables, indexed by `reasons_chosen`) to a resolution of `step`'''
+        if not isinstance(step, Deduction):
+            return
+        elif step in self.chosen_reasons: # if already decided
+            return
+        for cons in allowed_paths[step]:
+            if values[reasons_chosen[step][cons]] > 0.5: # if this is the chosen reasoning for this Deduction
+                for info in cons.of:
+                    self._choose_resolution_by_IP(info, values, reasons_chosen, allowed_paths)
+                self.chosen_reasons[step] = cons
+                return
+    def _structural_key(self, step, allowed_paths, keys):
+        '''Returns a hash describing the acyclic graph (given by `allowed_paths`) below `step`: which `Knowledge` instances it is built
+        from, and the results and rules of the `Deduction`s and `Consequence`s on the way. Graphs with the same structure get the same key,
+        even if they consist of different objects (e.g. in different steps or puzzles). The keys calculated so far (including those of the
+        `Consequence`s) are stored in `keys`.'''
+        if step in keys:
+            return keys[step]
+        if isinstance(step, Knowledge):
+            keys[step] = hashlib.blake2b(f'{step.__class__.__name__} {step.coordtype} {step.position} {step.value}'.encode(),
+                digest_size=16).digest()
+            return keys[step]
+        # isinstance(step, Deduction)
+        for cons in allowed_paths[step]:
+            keys[cons] = hashlib.blake2b(cons.rule.encode() + 
+                b''.join(sorted(self._structural_key(info, allowed_paths, keys) for info in cons.of)), digest_size=16).digest()
+        keys[step] = hashlib.blake2b(self._structural_key(step.result, allowed_paths, keys) +
+            b''.join(sorted(keys[cons] for cons in allowed_paths[step])), digest_size=16).digest()
+        return keys[step]
+    def _choose_resolution_from_cache(self, step, resolution, allowed_paths, keys):
+        '''Convert a `resolution` stored in a `KOptCache` (see there) to a resolution of `step`.'''
         if not isinstance(step, Deduction):
             return
         elif step in self.chosen_reasons: # if already decided
             return
         for cons in allowed_paths[step]:
-            if pl.value(reasons_chosen[step][cons]) == 1.0: # if this is the chosen reasoning for this Deduction
+            if keys[cons] == resolution[keys[step]]: # if this is the chosen reasoning for this Deduction
                 for info in cons.of:
-                    self._choose_resolution_by_IP(info, reasons_chosen, allowed_paths)
+                    self._choose_resolution_from_cache(info, resolution, allowed_paths, keys)
                 self.chosen_reasons[step] = cons
                 return
     def _choose_resolution_greedy(self, step, stack, resolved):
@@ -343,36 +699,31 @@ class ProofStep:
             return lemma.to_string(self.chosen_reasons[lemma])
         else:
             return str(lemma)
+    def records(self, reference=False, include_isvalue=False):
+        '''Yields the steps of this proof in order as `(label, lemma, references)` tuples, without converting anything to strings. `label` is
+        the number of the lemma (counting `IsValue`s too only if `include_isvalue` is `True`), `references` is the list of labels of the lemmas
+        this `Deduction` uses if `reference` is `True`, and `None` otherwise (or for `Knowledge` instances).'''
+        labels = {} # Knowledge/Deduction -> label
+        for i, step in enumerate(self.proof):
+            if not include_isvalue and not isinstance(step, Deduction):
+                continue
+            labels[step] = i if include_isvalue else len(labels)
+            refs = None
+            if reference and isinstance(step, Deduction):
+                refs = [labels[s] for s in self.chosen_reasons[step].of if s in labels]
+            yield labels[step], step, refs
+    def render(self, record):
+        '''Converts a record yielded by `records()` into a string.'''
+        label, lemma, refs = record
+        if refs is None:
+            return f'(L{label}) '+self._to_string(lemma)
+        return f'(L{label}) '+self._to_string(lemma)+" [{0}]".format(', '.join((str(r) for r in refs)))
+    def iter_strings(self, reference=False, include_isvalue=False):
+        '''Lazily yield strings, each representing a step of this proof.'''
+        return (self.render(record) for record in self.records(reference, include_isvalue))
     def to_strings(self, reference=False, include_isvalue=False):
         '''Return a list of strings, each representing a step of this proof.'''
-        if not reference and not include_isvalue:
-            i = 0
-            ret = []
-            for step in self.proof:
-                if isinstance(step, Deduction):
-                    ret.append(f'(L{i}) '+self._to_string(step))
-                    i += 1
-            return ret
-        elif not reference and include_isvalue:
-            return [f'(L{i}) '+self._to_string(step) for i, step in enumerate(self.proof)]
-        elif reference and not include_isvalue:
-            d = {}
-            ret = []
-            i = 0
-            for step in self.proof:
-                if isinstance(step, Deduction):
-                    d[step] = len(ret)
-                    ret.append(f'(L{i}) '+self._to_string(step)+" [{0}]".format(', '.join((str(d[s]) for s in self.chosen_reasons[step].of if isinstance(s, Deduction)))))
-                    i += 1
-            return ret
-        else:
-            ret = []
-            for i, step in enumerate(self.proof):
-                if isinstance(step, Deduction):
-                    ret.append(f'(L{i}) '+self._to_string(step)+" [{0}]".format(', '.join((str(self.proof_order[s]) for s in self.chosen_reasons[step].of))))
-                else: # isinstance(step, IsValue)
-                    ret.append(f'(L{i}) '+self._to_string(step))
-            return ret
+        return list(self.iter_strings(reference, include_isvalue))
     
     # >>> GETTERS
     def cells(self):
@@ -400,5 +751,6 @@ class ProofStep:
         for d in deductions:
             if d.result.get_pos() == p:
                 to_remove.append(d)
-        deductions.difference_update(to_remove) # -= is risky!!!
+        for d in to_remove:
+            del deductions[d]
 
@@ -1,15 +1,29 @@
 # >>> HELPERS
-def cell_section(i,j):
-    '''the 0-9 id of the 3×3 section containing this cell given in the 9×9 grid'''
-    return ((i)//3)*3+j//3
+# The board is made of `box`×`box` sections, so it has `box*box` rows and columns (9×9 for the default `box=3`).
+def cell_section(i,j,box=3):
+    '''the id of the `box`×`box` section containing this cell given in the grid (0-8 on a 9×9 board)'''
+    return ((i)//box)*box+j//box
 
-def local_to_global(sec,i,j):
+def local_to_global(sec,i,j,box=3):
     '''global coordinates of local i,j in sector sec'''
-    return (sec//3*3+i,sec%3*3+j)
+    return (sec//box*box+i,sec%box*box+j)
 
-def global_to_local(i,j):
-    '''coordinates of a cell given in the 9×9 grid, inside its 3×3 section'''
-    return (i%3,j%3)
+def global_to_local(i,j,box=3):
+    '''coordinates of a cell given in the grid, inside its `box`×`box` section'''
+    return (i%box,j%box)
+
+def bits(mask):
+    '''The list of the set bits of `mask` in increasing order: the values of a candidate bitset (see `Sudoku.candidates`).'''
+    values = []
+    while mask:
+        low = mask & -mask
+        values.append(low.bit_length()-1)
+        mask ^= low
+    return values
+
+def popcount(mask):
+    '''The number of set bits of `mask` (`int.bit_count()` only exists since Python 3.10).'''
+    return bin(mask).count('1')
 
 class diclen:
     '''A dictionary which counts how many 'None's it contains. No new keys may be added after creation, and no key can be assigned None
@@ -28,6 +42,13 @@ class diclen:
     def __len__(self):
         return self.size
 
+    def copy(self):
+        '''Return a shallow copy. Much faster than creating a new `diclen` with the same keys, so empty boards are built by copying.'''
+        new = diclen.__new__(diclen)
+        new.d = self.d.copy()
+        new.size = self.size
+        return new
+
     def __setitem__(self, key, value):
         old = self.d[key]
         self.d[key] = value